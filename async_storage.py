@@ -0,0 +1,85 @@
+"""Awaitable wrappers around :mod:`storage`.
+
+Every storage call is blocking SQLite I/O, so handlers must not run it on the
+event loop. The functions here run the synchronous versions on a bounded
+thread pool and return their result once it is ready.
+"""
+
+import asyncio
+import functools
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+
+import catalog_import
+import metrics
+import reports
+import similarity
+import storage
+from cache import MISSING
+
+DB_WORKERS = int(os.getenv("DB_WORKERS", "4"))
+
+_executor = ThreadPoolExecutor(max_workers=DB_WORKERS, thread_name_prefix="db")
+
+
+async def run_sync(func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, functools.partial(func, *args, **kwargs))
+
+
+def _wrap(func: Callable[..., Any]) -> Callable[..., Any]:
+    @functools.wraps(func)
+    async def wrapper(*args: Any, **kwargs: Any) -> Any:
+        with metrics.storage_seconds.time(func.__name__):
+            return await run_sync(func, *args, **kwargs)
+
+    return wrapper
+
+
+def shutdown() -> None:
+    _executor.shutdown(wait=True)
+
+
+init_db = _wrap(storage.init_db)
+
+
+async def get_user(user_id: int):
+    # A cache hit needs no SQLite I/O, so skip the thread hop.
+    cached = storage.user_cache.get(user_id)
+    if cached is not MISSING:
+        return cached
+    return await run_sync(storage.load_user, user_id)
+
+
+upsert_user = _wrap(storage.upsert_user)
+update_user_role = _wrap(storage.update_user_role)
+update_user_lang = _wrap(storage.update_user_lang)
+create_client = _wrap(storage.create_client)
+search_clients = _wrap(storage.search_clients)
+get_client = _wrap(storage.get_client)
+update_client_ready_lier = _wrap(storage.update_client_ready_lier)
+update_client_processed = _wrap(storage.update_client_processed)
+update_client_remainder = _wrap(storage.update_client_remainder)
+add_pickup_log = _wrap(storage.add_pickup_log)
+record_pickup = _wrap(storage.record_pickup)
+list_pickup_clients = _wrap(storage.list_pickup_clients)
+search_products = _wrap(storage.search_products)
+search_stands = _wrap(storage.search_stands)
+rebuild_search_indexes = _wrap(storage.rebuild_search_indexes)
+list_photos = _wrap(storage.list_photos)
+set_photo_file_ids = _wrap(storage.set_photo_file_ids)
+similar_items = _wrap(similarity.similar_items)
+import_catalog_file = _wrap(catalog_import.import_file)
+load_conversation_data = _wrap(storage.load_conversation_data)
+save_conversation_data = _wrap(storage.save_conversation_data)
+delete_conversation_data = _wrap(storage.delete_conversation_data)
+list_planning = _wrap(storage.list_planning)
+add_planning = _wrap(storage.add_planning)
+update_planning = _wrap(storage.update_planning)
+delete_planning = _wrap(storage.delete_planning)
+add_hours = _wrap(storage.add_hours)
+sum_hours_by_user = _wrap(storage.sum_hours_by_user)
+rebuild_hours_rollups = _wrap(storage.rebuild_hours_rollups)
+team_hours = _wrap(storage.team_hours)
+write_team_report_csv = _wrap(reports.write_team_report_csv)
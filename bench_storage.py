@@ -0,0 +1,358 @@
+"""Storage latency benchmarks.
+
+Run against a throwaway database, never the bot's own::
+
+    python bench_storage.py concurrent --readers 8 --seconds 10
+    python bench_storage.py suite --scales 10000 100000 1000000 --output baseline.json
+    python bench_storage.py suite --compare baseline.json
+    python bench_storage.py similarity --items 30000
+
+``suite`` fills a fresh database per scale with :mod:`datagen` and times
+every storage function on it. ``--compare`` exits non-zero when a latency
+(``--metric``, p50 by default: it is the most stable between runs) got
+slower than the baseline by more than ``--tolerance``. ``similarity`` times
+the in-memory trigram search for "похожие варианты" and exits non-zero when
+its median exceeds ``--max-p50-ms``.
+"""
+
+import argparse
+import datetime
+import itertools
+import json
+import platform
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Callable
+
+import datagen
+import storage
+from similarity import TrigramIndex
+
+# Calls that rebuild a whole index or table; timed with fewer iterations.
+HEAVY_CASES = {"upsert_catalog_items", "rebuild_search_indexes", "rebuild_hours_rollups"}
+# Calls returning how many rows they touched rather than an id.
+COUNT_RESULTS = {"record_pickup", "add_planning", "update_planning", "delete_planning", "iter_team_hours"}
+# Differences below this are noise, whatever the ratio.
+NOISE_FLOOR_MS = 0.05
+
+
+def percentile(samples: list[float], pct: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def summarize(name: str, samples: list[float]) -> str:
+    ms = [s * 1000 for s in samples]
+    return (
+        f"{name:<26} n={len(ms):<7} "
+        f"p50={percentile(ms, 50):.3f}ms p95={percentile(ms, 95):.3f}ms "
+        f"p99={percentile(ms, 99):.3f}ms mean={statistics.fmean(ms) if ms else 0:.3f}ms"
+    )
+
+
+def seed_minimal(users: int, clients: int) -> None:
+    storage.init_db()
+    for user_id in range(1, users + 1):
+        storage.upsert_user(user_id, f"user{user_id}", "OUTBOUND", "ru")
+    for i in range(clients):
+        storage.create_client(
+            {
+                "name": f"client {i}",
+                "city": random.choice(["Antwerpen", "Gent", "Lier", "Brussel"]),
+                "missing_product": "tiles",
+                "remainder": "1 box" if i % 3 == 0 else "",
+                "date": "2026-01-01",
+                "responsible": "bench",
+            }
+        )
+
+
+def bench_concurrent(readers: int, seconds: float, users: int, clients: int) -> dict[str, list[float]]:
+    """Readers hammer load_user/search_clients while one writer adds hours.
+
+    ``load_user`` bypasses the profile cache and the search terms are long
+    enough to reach FTS, so both time real SQLite reads.
+    """
+    timings: dict[str, list[float]] = {"load_user": [], "search_clients": [], "add_hours": []}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + seconds
+
+    def record(name: str, started: float) -> None:
+        elapsed = time.perf_counter() - started
+        with lock:
+            timings[name].append(elapsed)
+
+    def reader() -> None:
+        rnd = random.Random()
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            storage.load_user(rnd.randint(1, users))
+            record("load_user", started)
+            started = time.perf_counter()
+            storage.search_clients(f"client {rnd.randrange(clients)}")
+            record("search_clients", started)
+
+    def writer() -> None:
+        rnd = random.Random()
+        while time.perf_counter() < deadline:
+            started = time.perf_counter()
+            storage.add_hours(rnd.randint(1, users), "2026-01-05", "08:00", "16:30", 30, 8.0)
+            record("add_hours", started)
+
+    threads = [threading.Thread(target=reader) for _ in range(readers)]
+    threads.append(threading.Thread(target=writer))
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return timings
+
+
+def bench_similarity(items: int, queries: int) -> list[float]:
+    """Time trigram lookups of misspelled names in a catalog of ``items`` rows."""
+    rows = datagen.catalog_rows(items)
+    index = TrigramIndex()
+    for key, row in enumerate(rows):
+        index.add(key, row)
+    timings = []
+    for query in datagen.search_queries(rows, queries):
+        started = time.perf_counter()
+        index.search(query)
+        timings.append(time.perf_counter() - started)
+    return timings
+
+
+def suite_cases(rnd: random.Random) -> dict[str, Callable[[], object]]:
+    """One call per storage function, with arguments drawn from the seeded data."""
+    conn = storage.get_conn()
+    names = [row[0] for row in conn.execute("SELECT name FROM users ORDER BY user_id")]
+    clients = conn.execute("SELECT max(id) FROM clients").fetchone()[0]
+    products = conn.execute("SELECT max(id) FROM products").fetchone()[0]
+    planning = conn.execute("SELECT max(id) FROM planning_warehouse").fetchone()[0]
+    sequence = itertools.count()
+
+    def user_id() -> int:
+        return rnd.randint(1, len(names))
+
+    def week() -> tuple[str, str]:
+        start = datetime.date.fromisoformat(datagen.random_date(rnd))
+        return start.isoformat(), (start + datetime.timedelta(days=6)).isoformat()
+
+    def month() -> tuple[str, str]:
+        start = datetime.date.fromisoformat(datagen.random_date(rnd)).replace(day=1)
+        return start.isoformat(), (start + datetime.timedelta(days=30)).isoformat()
+
+    def client() -> dict:
+        city, postcode = rnd.choice(datagen.CITIES)
+        return {
+            "name": rnd.choice(datagen.LAST_NAMES),
+            "city": f"{city} {postcode}",
+            "missing_product": rnd.choice(datagen.MISSING_PRODUCTS),
+            "remainder": rnd.choice(datagen.REMAINDERS),
+            "date": datagen.random_date(rnd),
+            "responsible": rnd.choice(names),
+        }
+
+    def product(article: str) -> dict:
+        sort, name = rnd.choice(datagen.PRODUCT_SORTS), rnd.choice(datagen.PRODUCT_NAMES)
+        return {"sort": sort, "name": name, "article": article}
+
+    first_page = storage.search_clients(datagen.LAST_NAMES[0])
+    return {
+        "get_user": lambda: storage.get_user(user_id()),
+        "load_user": lambda: storage.load_user(user_id()),
+        "upsert_user": lambda: storage.upsert_user(
+            (uid := user_id()), names[uid - 1], rnd.choice(datagen.ROLES), rnd.choice(datagen.LANGS)
+        ),
+        "update_user_role": lambda: storage.update_user_role(user_id(), rnd.choice(datagen.ROLES)),
+        "update_user_lang": lambda: storage.update_user_lang(user_id(), rnd.choice(datagen.LANGS)),
+        "create_client": lambda: storage.create_client(client()),
+        "search_clients": lambda: storage.search_clients(rnd.choice(datagen.LAST_NAMES)),
+        "search_clients_city": lambda: storage.search_clients(rnd.choice(datagen.CITIES)[0]),
+        "search_clients_next": lambda: storage.search_clients(datagen.LAST_NAMES[0], after=first_page.next_cursor),
+        "get_client": lambda: storage.get_client(rnd.randint(1, clients)),
+        "update_client_ready_lier": lambda: storage.update_client_ready_lier(
+            rnd.randint(1, clients), datagen.random_date(rnd), rnd.choice(names)
+        ),
+        "update_client_processed": lambda: storage.update_client_processed(
+            rnd.randint(1, clients), f"{datagen.random_date(rnd)} 10:00", rnd.choice(names)
+        ),
+        "update_client_remainder": lambda: storage.update_client_remainder(
+            rnd.randint(1, clients), rnd.choice(datagen.REMAINDERS)
+        ),
+        "add_pickup_log": lambda: storage.add_pickup_log(
+            rnd.randint(1, clients), datagen.random_date(rnd), "all", "", rnd.choice(names)
+        ),
+        "record_pickup": lambda: storage.record_pickup(
+            rnd.sample(range(1, clients + 1), 3), datagen.random_date(rnd), "all", "", rnd.choice(names)
+        ),
+        "list_pickup_clients": lambda: storage.list_pickup_clients(),
+        "search_products": lambda: storage.search_products(rnd.choice(datagen.PRODUCT_NAMES)),
+        "search_stands": lambda: storage.search_stands(rnd.choice(datagen.PRODUCT_NAMES)),
+        "list_catalog_items": lambda: storage.list_catalog_items("products", rnd.sample(range(1, products + 1), 10)),
+        "upsert_catalog_items": lambda: storage.upsert_catalog_items(
+            "products",
+            [product(f"B{n}") for n in itertools.islice(sequence, 100)],
+        ),
+        "add_photos": lambda: storage.add_photos(
+            "products", [(f"A{(n := rnd.randrange(products)):07d}", f"/photos/{n}-{next(sequence)}.jpg")]
+        ),
+        "list_photos": lambda: storage.list_photos("products", rnd.sample(range(1, products + 1), 10)),
+        "set_photo_file_ids": lambda: storage.set_photo_file_ids([(f"file-{next(sequence)}", rnd.randint(1, 100))]),
+        "catalog_change_seq": storage.catalog_change_seq,
+        "catalog_changes_since": lambda: storage.catalog_changes_since(max(0, storage.catalog_change_seq() - 100)),
+        "prune_catalog_changes": lambda: storage.prune_catalog_changes(0),
+        "save_conversation_data": lambda: storage.save_conversation_data(
+            [("user", user_id(), json.dumps({"state": "client_search"}))]
+        ),
+        "load_conversation_data": lambda: storage.load_conversation_data("user", user_id()),
+        "delete_conversation_data": lambda: storage.delete_conversation_data("user", user_id()),
+        "list_planning_outbound": lambda: storage.list_planning("planning_outbound", *week()),
+        "list_planning_warehouse": lambda: storage.list_planning("planning_warehouse", *week()),
+        "add_planning": lambda: storage.add_planning(
+            "planning_warehouse", [(datagen.random_date(rnd), rnd.choice(names), rnd.choice(datagen.PLANS))] * 7
+        ),
+        "update_planning": lambda: storage.update_planning(
+            "planning_warehouse", [(rnd.randint(1, planning), datagen.random_date(rnd), rnd.choice(names), "changed")]
+        ),
+        "delete_planning": lambda: storage.delete_planning("planning_outbound", [rnd.randint(1, planning)]),
+        "add_hours": lambda: storage.add_hours(user_id(), datagen.random_date(rnd), "08:00", "16:30", 30, 8.0),
+        "sum_hours_by_user": lambda: storage.sum_hours_by_user(rnd.choice(names), *month()),
+        "team_hours": lambda: storage.team_hours(*week()),
+        "iter_team_hours": lambda: sum(1 for _ in storage.iter_team_hours(*month())),
+        "rebuild_search_indexes": storage.rebuild_search_indexes,
+        "rebuild_hours_rollups": storage.rebuild_hours_rollups,
+    }
+
+
+def result_rows(name: str, result: object) -> int:
+    """Rows a call returned or wrote, for rows/sec."""
+    if isinstance(result, storage.Page):
+        return len(result.rows)
+    if isinstance(result, storage.ImportCounts):
+        return result.inserted + result.updated
+    if isinstance(result, list):
+        return len(result)
+    if name in COUNT_RESULTS:
+        return result
+    return 1
+
+
+def bench_suite(rows: int, iterations: int, seed: int) -> dict[str, dict[str, float]]:
+    datagen.generate(rows, seed)
+    rnd = random.Random(seed)
+    results: dict[str, dict[str, float]] = {}
+    for name, call in suite_cases(rnd).items():
+        count = max(3, iterations // 50) if name in HEAVY_CASES else iterations
+        call()  # warm up caches and prepared statements
+        samples: list[float] = []
+        total_rows = 0
+        for _ in range(count):
+            started = time.perf_counter()
+            result = call()
+            samples.append(time.perf_counter() - started)
+            total_rows += result_rows(name, result)
+        ms = [s * 1000 for s in samples]
+        results[name] = {
+            "n": count,
+            "p50_ms": percentile(ms, 50),
+            "p95_ms": percentile(ms, 95),
+            "p99_ms": percentile(ms, 99),
+            "rows_per_sec": total_rows / sum(samples) if sum(samples) else 0.0,
+        }
+        print(f"{summarize(name, samples)} rows/s={results[name]['rows_per_sec']:.0f}")
+    return results
+
+
+def compare(baseline: dict, current: dict, metric: str, tolerance: float) -> int:
+    """Print regressions of ``metric`` against ``baseline``; returns how many there are."""
+    regressions = 0
+    for scale, cases in current["scales"].items():
+        for name, result in cases.items():
+            before = baseline.get("scales", {}).get(scale, {}).get(name)
+            if before is None:
+                continue
+            old, new = before[metric], result[metric]
+            if new > old * (1 + tolerance) and new - old > NOISE_FLOOR_MS:
+                regressions += 1
+                print(f"REGRESSION {scale:>8} {name:<26} {metric[:3]} {old:.3f}ms -> {new:.3f}ms ({new / old - 1:+.0%})")
+    return regressions
+
+
+def run_suite(args: argparse.Namespace, tmp: Path) -> int:
+    report = {
+        "created": datetime.datetime.now().isoformat(timespec="seconds"),
+        "seed": args.seed,
+        "iterations": args.iterations,
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "scales": {},
+    }
+    for rows in args.scales:
+        print(f"== {rows} rows")
+        storage.DB_PATH = tmp / f"bench-{rows}.db"
+        report["scales"][str(rows)] = bench_suite(rows, args.iterations, args.seed)
+        storage.close_all()
+        for path in tmp.glob(f"bench-{rows}.db*"):
+            path.unlink()
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2))
+    if args.compare:
+        regressions = compare(json.loads(args.compare.read_text()), report, args.metric, args.tolerance)
+        print(f"{regressions} regression(s) against {args.compare}")
+        return 1 if regressions else 0
+    return 0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+    concurrent = sub.add_parser("concurrent", help="mixed readers/writer latency")
+    concurrent.add_argument("--readers", type=int, default=4)
+    concurrent.add_argument("--seconds", type=float, default=5.0)
+    concurrent.add_argument("--users", type=int, default=200)
+    concurrent.add_argument("--clients", type=int, default=5000)
+    suite = sub.add_parser("suite", help="time every storage function at several data sizes")
+    suite.add_argument("--scales", type=int, nargs="+", default=[10_000, 100_000])
+    suite.add_argument("--iterations", type=int, default=200)
+    suite.add_argument("--seed", type=int, default=42)
+    suite.add_argument("--output", type=Path, help="write results as a JSON baseline")
+    suite.add_argument("--compare", type=Path, help="baseline JSON to check against")
+    suite.add_argument("--metric", choices=["p50_ms", "p95_ms", "p99_ms"], default="p50_ms")
+    suite.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown (0.25 = 25%%)")
+    similar = sub.add_parser("similarity", help="time the in-memory trigram search")
+    similar.add_argument("--items", type=int, default=30_000)
+    similar.add_argument("--queries", type=int, default=300)
+    similar.add_argument("--max-p50-ms", type=float, default=1.0)
+    args = parser.parse_args()
+
+    if args.command == "similarity":
+        timings = bench_similarity(args.items, args.queries)
+        print(summarize("trigram_search", timings))
+        sys.exit(1 if statistics.median(timings) * 1000 > args.max_p50_ms else 0)
+
+    status = 0
+    with tempfile.TemporaryDirectory() as tmp:
+        storage.DB_PATH = Path(tmp) / "bench.db"
+        if args.command == "concurrent":
+            seed_minimal(args.users, args.clients)
+            timings = bench_concurrent(args.readers, args.seconds, args.users, args.clients)
+            for name, samples in timings.items():
+                print(summarize(name, samples))
+        elif args.command == "suite":
+            status = run_suite(args, Path(tmp))
+        storage.close_all()
+    sys.exit(status)
+
+
+if __name__ == "__main__":
+    main()
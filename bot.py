@@ -1,32 +1,64 @@
+import contextlib
+import functools
 import logging
 import os
-from datetime import datetime, timedelta
-from typing import Optional
-
-from telegram import KeyboardButton, ReplyKeyboardMarkup, Update
-from telegram.ext import Application, CommandHandler, ContextTypes, MessageHandler, filters
-
-from storage import (
+import tempfile
+from datetime import date, datetime, timedelta
+from pathlib import Path
+from typing import Callable, Optional
+
+from telegram import (
+    InlineKeyboardButton,
+    InlineKeyboardMarkup,
+    InputMediaPhoto,
+    KeyboardButton,
+    ReplyKeyboardMarkup,
+    Update,
+)
+from telegram.error import TelegramError
+from telegram.ext import Application, CallbackQueryHandler, CommandHandler, ContextTypes, MessageHandler, filters
+from telegram.request import BaseRequest
+
+import async_storage
+import metrics
+import monitoring
+import slowlog
+import storage
+from catalog_import import ImportFormatError
+from similarity import catalog_index
+from dispatch import ActionRegistry, Flow, FlowRegistry
+from ordering import PerUserUpdateProcessor
+from outbox import outbox
+from persistence import SQLitePersistence
+from async_storage import (
     add_hours,
-    add_pickup_log,
+    add_planning,
     create_client,
+    delete_planning,
     get_client,
     get_user,
-    init_db,
+    import_catalog_file,
     list_pickup_clients,
+    list_photos,
     list_planning,
+    record_pickup,
     search_clients,
     search_products,
     search_stands,
+    set_photo_file_ids,
+    similar_items,
     sum_hours_by_user,
+    team_hours,
     update_client_processed,
     update_client_ready_lier,
-    update_client_remainder,
+    update_planning,
     update_user_lang,
     update_user_role,
     upsert_user,
+    write_team_report_csv,
 )
-from translations import LANGUAGES, t
+from translations import LANGUAGES, on_reload, t
+from webhook import run_webhook, webhook_secret
 
 logging.basicConfig(level=logging.INFO)
 
@@ -41,6 +73,9 @@ ROLE_ADMIN = "ADMIN"
 STATE_AWAIT_NAME = "await_name"
 STATE_LANG = "lang"
 STATE_CLIENT_ADD = "client_add"
+STATE_CLIENT_ADD_CITY = "client_city"
+STATE_CLIENT_ADD_PRODUCT = "client_product"
+STATE_CLIENT_ADD_REMAINDER_CHOICE = "client_remainder_choice"
 STATE_CLIENT_ADD_REMAINDER = "client_add_remainder"
 STATE_CLIENT_ADD_DATE = "client_add_date"
 STATE_CLIENT_ADD_CONFIRM = "client_add_confirm"
@@ -67,10 +102,32 @@ STATE_ADMIN_ROLE_SET = "admin_role_set"
 STATE_ADMIN_PERF_USER = "admin_perf_user"
 STATE_ADMIN_PERF_PERIOD = "admin_perf_period"
 STATE_ADMIN_PERF_DATE = "admin_perf_date"
+STATE_TEAM_REPORT_PERIOD = "team_report_period"
+STATE_TEAM_REPORT_DATE = "team_report_date"
+STATE_ADMIN_PLANNING_TYPE = "admin_planning_type"
+STATE_ADMIN_PLANNING_ACTION = "admin_planning_action"
+STATE_ADMIN_PLANNING_ADD = "admin_planning_add"
+STATE_ADMIN_PLANNING_EDIT = "admin_planning_edit"
+STATE_ADMIN_PLANNING_DELETE = "admin_planning_delete"
+STATE_CATALOG_IMPORT_TABLE = "catalog_import_table"
+STATE_CATALOG_IMPORT_FILE = "catalog_import_file"
 STATE_PRODUCTS_SEARCH = "products_search"
 STATE_STANDS_SEARCH = "stands_search"
 
 
+def keyboard(builder: Callable[..., ReplyKeyboardMarkup]) -> Callable[..., ReplyKeyboardMarkup]:
+    """Memoize a keyboard builder by its (role, lang) arguments.
+
+    Markups are immutable once built, so one instance per argument set is
+    shared by every reply. Cached markups are dropped when translations are
+    reloaded.
+    """
+    cached = functools.lru_cache(maxsize=256)(builder)
+    on_reload(cached.cache_clear)
+    return cached
+
+
+@keyboard
 def main_menu(role: str, lang: str) -> ReplyKeyboardMarkup:
     rows = []
     if role in {ROLE_GUEST, ROLE_OUTBOUND, ROLE_WAREHOUSE, ROLE_MANAGER, ROLE_BOSS, ROLE_ADMIN}:
@@ -87,6 +144,7 @@ def main_menu(role: str, lang: str) -> ReplyKeyboardMarkup:
     return ReplyKeyboardMarkup(rows, resize_keyboard=True)
 
 
+@keyboard
 def clients_menu(role: str, lang: str) -> ReplyKeyboardMarkup:
     rows = []
     if role in {ROLE_OUTBOUND, ROLE_BOSS, ROLE_ADMIN}:
@@ -102,6 +160,7 @@ def clients_menu(role: str, lang: str) -> ReplyKeyboardMarkup:
     return ReplyKeyboardMarkup(rows, resize_keyboard=True)
 
 
+@keyboard
 def planning_menu(lang: str) -> ReplyKeyboardMarkup:
     rows = [
         [t(lang, "planning_outbound"), t(lang, "planning_warehouse")],
@@ -110,6 +169,7 @@ def planning_menu(lang: str) -> ReplyKeyboardMarkup:
     return ReplyKeyboardMarkup(rows, resize_keyboard=True)
 
 
+@keyboard
 def period_menu(lang: str) -> ReplyKeyboardMarkup:
     rows = [
         [t(lang, "period_today"), t(lang, "period_tomorrow")],
@@ -120,6 +180,7 @@ def period_menu(lang: str) -> ReplyKeyboardMarkup:
     return ReplyKeyboardMarkup(rows, resize_keyboard=True)
 
 
+@keyboard
 def break_menu(lang: str) -> ReplyKeyboardMarkup:
     return ReplyKeyboardMarkup(
         [[t(lang, "hours_break_yes"), t(lang, "hours_break_no")], [t(lang, "menu_back")]],
@@ -127,15 +188,69 @@ def break_menu(lang: str) -> ReplyKeyboardMarkup:
     )
 
 
+@keyboard
 def admin_menu(lang: str) -> ReplyKeyboardMarkup:
     rows = [
         [t(lang, "admin_roles")],
         [t(lang, "admin_performance")],
+        [t(lang, "admin_team_report")],
+        [t(lang, "admin_planning")],
+        [t(lang, "admin_catalog_import")],
+        [t(lang, "admin_slow_queries")],
         [t(lang, "menu_back")],
     ]
     return ReplyKeyboardMarkup(rows, resize_keyboard=True)
 
 
+@keyboard
+def remainder_menu(lang: str) -> ReplyKeyboardMarkup:
+    return ReplyKeyboardMarkup(
+        [[t(lang, "clients_remainder_none"), t(lang, "clients_remainder_enter")]],
+        resize_keyboard=True,
+    )
+
+
+@keyboard
+def confirm_menu(lang: str) -> ReplyKeyboardMarkup:
+    return ReplyKeyboardMarkup(
+        [[t(lang, "confirm_save"), t(lang, "confirm_edit"), t(lang, "confirm_cancel")]],
+        resize_keyboard=True,
+    )
+
+
+@keyboard
+def catalog_table_menu(lang: str) -> ReplyKeyboardMarkup:
+    return ReplyKeyboardMarkup(
+        [[t(lang, "menu_products"), t(lang, "menu_stands")], [t(lang, "menu_back")]],
+        resize_keyboard=True,
+    )
+
+
+@keyboard
+def planning_edit_menu(lang: str) -> ReplyKeyboardMarkup:
+    return ReplyKeyboardMarkup(
+        [[t(lang, "planning_add"), t(lang, "planning_edit")], [t(lang, "planning_delete")], [t(lang, "menu_back")]],
+        resize_keyboard=True,
+    )
+
+
+@keyboard
+def pickup_query_menu(lang: str) -> ReplyKeyboardMarkup:
+    return ReplyKeyboardMarkup(
+        [[t(lang, "clients_menu_list_pickup")], [t(lang, "menu_back")]],
+        resize_keyboard=True,
+    )
+
+
+@keyboard
+def pickup_action_menu(lang: str) -> ReplyKeyboardMarkup:
+    return ReplyKeyboardMarkup(
+        [[t(lang, "pickup_all"), t(lang, "pickup_left")]],
+        resize_keyboard=True,
+    )
+
+
+@keyboard
 def lang_menu() -> ReplyKeyboardMarkup:
     rows = [[KeyboardButton(code.upper())] for code in LANGUAGES]
     rows.append([KeyboardButton(t("ru", "menu_back"))])
@@ -156,10 +271,224 @@ def parse_time(text: str) -> Optional[str]:
         return None
 
 
+def parse_ids(text: str) -> Optional[list[int]]:
+    """Ids separated by spaces or commas, in order and without repeats."""
+    values = text.replace(",", " ").split()
+    if not values or not all(value.isdigit() for value in values):
+        return None
+    return list(dict.fromkeys(int(value) for value in values))
+
+
+def parse_planning_lines(table: str, text: str, with_id: bool = False) -> tuple[list[tuple], list[int]]:
+    """Parse one ``date; ...; plan`` entry per line, optionally led by an id.
+
+    Returns the entries (date as ISO) and the numbers of the invalid lines.
+    """
+    fields = storage.PLANNING_FIELDS[table]
+    size = len(fields) + with_id
+    entries: list[tuple] = []
+    errors: list[int] = []
+    for number, line in enumerate(text.splitlines(), 1):
+        if not line.strip():
+            continue
+        # The plan is the last field, so it may contain ';' itself.
+        values = [value.strip() for value in line.split(";", size - 1)]
+        if with_id and values[0].isdigit():
+            values[0] = int(values[0])
+        elif with_id:
+            values = []
+        date_index = 1 if with_id else 0
+        if len(values) != size or not all(values) or not (parsed := parse_date(values[date_index])):
+            errors.append(number)
+            continue
+        values[date_index] = parsed
+        entries.append(tuple(values))
+    return entries, errors
+
+
 def format_client_row(row) -> str:
     return f"{row['id']} | {row['name']} | {row['city']} | {row['remainder'] or '-'}"
 
 
+def format_product_row(row) -> str:
+    return f"{row['id']} | {row['sort']} | {row['name']} | {row['article']}"
+
+
+def format_stand_row(row) -> str:
+    return f"{row['id']} | {row['stand_name']} | {row['size']} | {row['article']} | {row['tiles_text']}"
+
+
+def format_planning_row(row) -> str:
+    target = row["client"] if "client" in row.keys() else row["shift_names"]
+    return f"{row['date']} | {target} | {row['plan_text']}"
+
+
+def period_range(lang: str, text: str) -> Optional[tuple[date, date]]:
+    """Date range for a period_menu button, or None for other text."""
+    today = datetime.now().date()
+    if text == t(lang, "period_today"):
+        return today, today
+    if text == t(lang, "period_tomorrow"):
+        tomorrow = today + timedelta(days=1)
+        return tomorrow, tomorrow
+    if text == t(lang, "period_week"):
+        start = today - timedelta(days=today.weekday())
+        return start, start + timedelta(days=6)
+    if text == t(lang, "period_month"):
+        start = today.replace(day=1)
+        next_month = (start + timedelta(days=32)).replace(day=1)
+        return start, next_month - timedelta(days=1)
+    return None
+
+
+# Paged result lists: kind -> (fetch one page, row formatter, template key).
+PAGE_SOURCES = {
+    "clients": (lambda query, after: search_clients(query, after), format_client_row, "clients_search_results"),
+    "products": (lambda query, after: search_products(query, after), format_product_row, "search_results"),
+    "stands": (lambda query, after: search_stands(query, after), format_stand_row, "search_results"),
+    "pickup": (lambda query, after: list_pickup_clients(after), format_client_row, None),
+}
+MAX_PAGERS = 20
+
+
+def render_page(lang: str, kind: str, rows) -> str:
+    _, formatter, template_key = PAGE_SOURCES[kind]
+    results = "\n".join(formatter(row) for row in rows)
+    return t(lang, template_key).format(results=results) if template_key else results
+
+
+def pager_markup(pager_id: str, number: int, has_next: bool) -> Optional[InlineKeyboardMarkup]:
+    buttons = []
+    if number > 0:
+        buttons.append(InlineKeyboardButton("◀️", callback_data=f"page:{pager_id}:{number - 1}"))
+    if has_next:
+        buttons.append(InlineKeyboardButton("▶️", callback_data=f"page:{pager_id}:{number + 1}"))
+    return InlineKeyboardMarkup([buttons]) if buttons else None
+
+
+async def reply(update: Update, text: str, reply_markup=None) -> None:
+    """Answer the user through the outbox (chunking, ordering, rate limits)."""
+
+    async def send(chunk: str, markup) -> None:
+        await update.message.reply_text(chunk, reply_markup=markup)
+
+    await outbox.send(update.effective_chat.id, send, text, reply_markup)
+
+
+async def reply_document(update: Update, path: Path, filename: str) -> None:
+    async def send() -> None:
+        # Reopened per attempt so a retry uploads the whole file again.
+        with path.open("rb") as handle:
+            await update.message.reply_document(document=handle, filename=filename)
+
+    await outbox.submit(update.effective_chat.id, send)
+
+
+MEDIA_GROUP_SIZE = 10
+MAX_RESULT_PHOTOS = int(os.getenv("MAX_RESULT_PHOTOS", "20"))
+
+
+async def reply_photos(update: Update, table: str, rows, formatter: Callable) -> None:
+    """Send the photos of ``rows`` as albums of up to ten.
+
+    A photo known only by its local path is uploaded once; the ``file_id``
+    Telegram returns is stored and reused for every later send.
+    """
+    captions = {row["id"]: formatter(row) for row in rows}
+    order = {item_id: index for index, item_id in enumerate(captions)}
+    photos = [
+        photo
+        for photo in await list_photos(table, list(captions))
+        if photo["file_id"] or (photo["path"] and os.path.exists(photo["path"]))
+    ]
+    # Keep the items in the order they were listed in the text reply.
+    photos.sort(key=lambda photo: order[photo["item_id"]])
+    photos = photos[:MAX_RESULT_PHOTOS]
+    for start in range(0, len(photos), MEDIA_GROUP_SIZE):
+        batch = photos[start : start + MEDIA_GROUP_SIZE]
+        sent: list = []
+
+        async def send(batch=batch, sent=sent) -> None:
+            # Files are reopened per attempt so a retry uploads them again.
+            with contextlib.ExitStack() as files:
+                media = []
+                for index, photo in enumerate(batch):
+                    first = index == 0 or batch[index - 1]["item_id"] != photo["item_id"]
+                    source = photo["file_id"] or files.enter_context(open(photo["path"], "rb"))
+                    media.append(InputMediaPhoto(source, caption=captions[photo["item_id"]] if first else None))
+                if len(media) == 1:
+                    # Telegram rejects media groups of a single item.
+                    sent[:] = [await update.message.reply_photo(media[0].media, caption=media[0].caption)]
+                else:
+                    sent[:] = await update.message.reply_media_group(media)
+
+        try:
+            await outbox.submit(update.effective_chat.id, send)
+        except TelegramError:
+            # Photos are extras to the text reply that has already gone out.
+            logging.exception("Failed to send %s photos", table)
+            return
+        uploaded = [
+            (message.photo[-1].file_id, photo["id"])
+            for photo, message in zip(batch, sent)
+            if not photo["file_id"] and message.photo
+        ]
+        if uploaded:
+            await set_photo_file_ids(uploaded)
+
+
+async def reply_page(
+    update: Update, context: ContextTypes.DEFAULT_TYPE, lang: str, kind: str, query: str, page
+) -> None:
+    """Send the first page; keep the query and page cursors for the pager.
+
+    Pagers live in chat_data (flows clear user_data when they finish) and
+    only the most recent MAX_PAGERS per chat are kept.
+    """
+    markup = None
+    if page.next_cursor is not None:
+        pager_id = str(context.chat_data.get("pager_seq", 0) + 1)
+        context.chat_data["pager_seq"] = int(pager_id)
+        pagers = context.chat_data.setdefault("pagers", {})
+        pagers[pager_id] = {"kind": kind, "query": query, "cursors": [None, page.next_cursor]}
+        while len(pagers) > MAX_PAGERS:
+            pagers.pop(next(iter(pagers)))
+        markup = pager_markup(pager_id, 0, True)
+    await reply(update, render_page(lang, kind, page.rows), reply_markup=markup)
+
+
+async def query_too_short(update: Update, lang: str, text: str) -> bool:
+    """Ask for a longer query; search needs ``storage.FTS_MIN_QUERY`` characters."""
+    if len(text) >= storage.FTS_MIN_QUERY:
+        return False
+    await reply(update, t(lang, "search_too_short").format(count=storage.FTS_MIN_QUERY))
+    return True
+
+
+async def turn_page(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    callback = update.callback_query
+    _, pager_id, number = callback.data.split(":")
+    number = int(number)
+    user = await get_user(update.effective_user.id)
+    lang = user["lang"] if user else "ru"
+    pager = context.chat_data.get("pagers", {}).get(pager_id)
+    chat_id = update.effective_chat.id
+    if pager is None or number >= len(pager["cursors"]):
+        await outbox.submit(chat_id, functools.partial(callback.answer, t(lang, "page_expired")))
+        return
+    fetch, _, _ = PAGE_SOURCES[pager["kind"]]
+    page = await fetch(pager["query"], pager["cursors"][number])
+    if page.next_cursor is not None and number + 1 == len(pager["cursors"]):
+        pager["cursors"].append(page.next_cursor)
+    edit = functools.partial(
+        callback.edit_message_text,
+        render_page(lang, pager["kind"], page.rows),
+        reply_markup=pager_markup(pager_id, number, page.next_cursor is not None),
+    )
+    # Page flips are the most frequent edit; pace and retry them like replies.
+    await outbox.submit(chat_id, edit, callback.answer)
+
+
 def start_text(lang: str, user_id: int) -> str:
     return "\n".join(
         [
@@ -172,606 +501,972 @@ def start_text(lang: str, user_id: int) -> str:
 
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     user_id = update.effective_user.id
-    user = get_user(user_id)
+    user = await get_user(user_id)
     lang = user["lang"] if user else "ru"
-    await update.message.reply_text(start_text(lang, user_id))
+    await reply(update, start_text(lang, user_id))
     if not user:
         context.user_data["state"] = STATE_AWAIT_NAME
-        await update.message.reply_text(t(lang, "ask_name"))
+        await reply(update, t(lang, "ask_name"))
         return
-    await update.message.reply_text(
+    await reply(
+        update,
         t(lang, "name_saved").format(name=user["name"]),
         reply_markup=main_menu(user["role"], lang),
     )
 
 
-async def handle_text(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    init_db()
-    text = update.message.text.strip()
-    user_id = update.effective_user.id
-    user = get_user(user_id)
-    lang = user["lang"] if user else "ru"
-    state = context.user_data.get("state")
+actions = ActionRegistry()
 
-    if text == t(lang, "menu_back"):
-        context.user_data.clear()
-        if user:
-            await update.message.reply_text(
-                t(lang, "saved"),
-                reply_markup=main_menu(user["role"], lang),
-            )
-        return
 
-    if state == STATE_AWAIT_NAME:
-        name = text
-        upsert_user(user_id, name, ROLE_GUEST, "ru")
-        await update.message.reply_text(
-            t("ru", "name_saved").format(name=name),
-            reply_markup=main_menu(ROLE_GUEST, "ru"),
-        )
-        context.user_data.clear()
+@actions.action("menu_language")
+async def show_language(update: Update, context: ContextTypes.DEFAULT_TYPE, text: str, user, lang: str) -> None:
+    context.user_data["state"] = STATE_LANG
+    await reply(update, t(lang, "lang_prompt"), reply_markup=lang_menu())
+
+
+@actions.action("menu_clients")
+async def show_clients(update: Update, context: ContextTypes.DEFAULT_TYPE, text: str, user, lang: str) -> None:
+    await reply(update, t(lang, "menu_clients"), reply_markup=clients_menu(user["role"], lang))
+
+
+@actions.action("clients_menu_add")
+async def begin_client_add(update: Update, context: ContextTypes.DEFAULT_TYPE, text: str, user, lang: str) -> None:
+    context.user_data["state"] = STATE_CLIENT_ADD
+    await reply(update, t(lang, "clients_enter_name"))
+
+
+@actions.action("clients_menu_search")
+async def begin_client_search(update: Update, context: ContextTypes.DEFAULT_TYPE, text: str, user, lang: str) -> None:
+    context.user_data["state"] = STATE_CLIENT_SEARCH
+    await reply(update, t(lang, "clients_search_prompt"))
+
+
+@actions.action("clients_menu_ready_lier")
+async def begin_ready_lier(update: Update, context: ContextTypes.DEFAULT_TYPE, text: str, user, lang: str) -> None:
+    context.user_data["state"] = STATE_CLIENT_STATUS_LIER
+    await reply(update, t(lang, "clients_search_prompt"))
+
+
+@actions.action("clients_menu_processed")
+async def begin_processed(update: Update, context: ContextTypes.DEFAULT_TYPE, text: str, user, lang: str) -> None:
+    context.user_data["state"] = STATE_CLIENT_STATUS_PROCESSED
+    await reply(update, t(lang, "clients_search_prompt"))
+
+
+@actions.action("clients_menu_list_pickup")
+async def show_pickup_list(update: Update, context: ContextTypes.DEFAULT_TYPE, text: str, user, lang: str) -> None:
+    page = await list_pickup_clients()
+    if not page.rows:
+        await reply(update, t(lang, "pickup_list_empty"))
+    else:
+        await reply_page(update, context, lang, "pickup", "", page)
+
+
+@actions.action("menu_pickup")
+async def begin_pickup(update: Update, context: ContextTypes.DEFAULT_TYPE, text: str, user, lang: str) -> None:
+    context.user_data["state"] = STATE_PICKUP_QUERY
+    await reply(update, t(lang, "pickup_query"), reply_markup=pickup_query_menu(lang))
+
+
+@actions.action("menu_planning")
+async def begin_planning(update: Update, context: ContextTypes.DEFAULT_TYPE, text: str, user, lang: str) -> None:
+    context.user_data["state"] = STATE_PLANNING_TYPE
+    await reply(update, t(lang, "planning_type_prompt"), reply_markup=planning_menu(lang))
+
+
+@actions.action("menu_hours")
+async def begin_hours(update: Update, context: ContextTypes.DEFAULT_TYPE, text: str, user, lang: str) -> None:
+    context.user_data["state"] = STATE_HOURS_DATE
+    await reply(update, t(lang, "hours_date"))
+
+
+@actions.action("menu_admin")
+async def show_admin(update: Update, context: ContextTypes.DEFAULT_TYPE, text: str, user, lang: str) -> None:
+    if user["role"] not in {ROLE_BOSS, ROLE_ADMIN}:
+        await reply(update, t(lang, "unknown"))
         return
+    await reply(update, t(lang, "menu_admin"), reply_markup=admin_menu(lang))
 
-    if state == STATE_LANG:
-        lang_choice = text.lower()
-        if lang_choice in LANGUAGES:
-            update_user_lang(user_id, lang_choice)
-            user = get_user(user_id)
-            await update.message.reply_text(
-                t(lang_choice, "lang_saved"),
-                reply_markup=main_menu(user["role"], lang_choice),
-            )
-            context.user_data.clear()
-            return
-        await update.message.reply_text(t(lang, "lang_prompt"), reply_markup=lang_menu())
+
+@actions.action("admin_roles")
+async def begin_admin_roles(update: Update, context: ContextTypes.DEFAULT_TYPE, text: str, user, lang: str) -> None:
+    context.user_data["state"] = STATE_ADMIN_ROLE_USER
+    await reply(update, t(lang, "admin_role_user"))
+
+
+@actions.action("admin_performance")
+async def begin_admin_performance(update: Update, context: ContextTypes.DEFAULT_TYPE, text: str, user, lang: str) -> None:
+    context.user_data["state"] = STATE_ADMIN_PERF_USER
+    await reply(update, t(lang, "admin_performance_user"))
+
+
+@actions.action("admin_team_report")
+async def begin_team_report(update: Update, context: ContextTypes.DEFAULT_TYPE, text: str, user, lang: str) -> None:
+    if user["role"] not in {ROLE_BOSS, ROLE_ADMIN}:
+        await reply(update, t(lang, "unknown"))
         return
+    context.user_data["state"] = STATE_TEAM_REPORT_PERIOD
+    await reply(update, t(lang, "admin_performance_period"), reply_markup=period_menu(lang))
 
-    if not user:
-        await update.message.reply_text(t(lang, "ask_name"))
-        context.user_data["state"] = STATE_AWAIT_NAME
+
+@actions.action("admin_planning")
+async def begin_admin_planning(update: Update, context: ContextTypes.DEFAULT_TYPE, text: str, user, lang: str) -> None:
+    if user["role"] not in {ROLE_BOSS, ROLE_ADMIN}:
+        await reply(update, t(lang, "unknown"))
         return
+    context.user_data["state"] = STATE_ADMIN_PLANNING_TYPE
+    await reply(update, t(lang, "planning_type_prompt"), reply_markup=planning_menu(lang))
 
-    if state == STATE_CLIENT_ADD:
-        context.user_data["client_name"] = text
-        context.user_data["state"] = "client_city"
-        await update.message.reply_text(t(lang, "clients_enter_city"))
-        return
-    if state == "client_city":
-        context.user_data["client_city"] = text
-        context.user_data["state"] = "client_product"
-        await update.message.reply_text(t(lang, "clients_enter_product"))
-        return
-    if state == "client_product":
-        context.user_data["client_product"] = text
-        context.user_data["state"] = "client_remainder_choice"
-        await update.message.reply_text(
-            t(lang, "clients_remainder_prompt"),
-            reply_markup=ReplyKeyboardMarkup(
-                [[t(lang, "clients_remainder_none"), t(lang, "clients_remainder_enter")]],
-                resize_keyboard=True,
-            ),
-        )
+
+@actions.action("admin_catalog_import")
+async def begin_catalog_import(update: Update, context: ContextTypes.DEFAULT_TYPE, text: str, user, lang: str) -> None:
+    if user["role"] not in {ROLE_BOSS, ROLE_ADMIN}:
+        await reply(update, t(lang, "unknown"))
         return
-    if state == "client_remainder_choice":
-        if text == t(lang, "clients_remainder_none"):
-            context.user_data["client_remainder"] = ""
-            context.user_data["state"] = STATE_CLIENT_ADD_DATE
-            await update.message.reply_text(t(lang, "clients_enter_date"))
-            return
-        if text == t(lang, "clients_remainder_enter"):
-            context.user_data["state"] = STATE_CLIENT_ADD_REMAINDER
-            await update.message.reply_text(t(lang, "clients_enter_remainder"))
-            return
-        await update.message.reply_text(t(lang, "clients_remainder_prompt"))
+    context.user_data["state"] = STATE_CATALOG_IMPORT_TABLE
+    await reply(update, t(lang, "catalog_import_table"), reply_markup=catalog_table_menu(lang))
+
+
+@actions.action("admin_slow_queries")
+async def show_slow_queries(update: Update, context: ContextTypes.DEFAULT_TYPE, text: str, user, lang: str) -> None:
+    if user["role"] not in {ROLE_BOSS, ROLE_ADMIN}:
+        await reply(update, t(lang, "unknown"))
         return
-    if state == STATE_CLIENT_ADD_REMAINDER:
-        context.user_data["client_remainder"] = text
-        context.user_data["state"] = STATE_CLIENT_ADD_DATE
-        await update.message.reply_text(t(lang, "clients_enter_date"))
+    params = {"minutes": round(slowlog.SLOW_QUERY_WINDOW / 60), "threshold": f"{slowlog.SLOW_QUERY_MS:g}"}
+    statements = slowlog.top()
+    if not statements:
+        await reply(update, t(lang, "slow_queries_empty").format(**params), reply_markup=admin_menu(lang))
         return
-    if state == STATE_CLIENT_ADD_DATE:
-        parsed = parse_date(text)
-        if not parsed:
-            await update.message.reply_text(t(lang, "clients_enter_date"))
-            return
-        context.user_data["client_date"] = parsed
-        summary = "\n".join(
-            [
-                f"{t(lang, 'clients_enter_name')} {context.user_data['client_name']}",
-                f"{t(lang, 'clients_enter_city')} {context.user_data['client_city']}",
-                f"{t(lang, 'clients_enter_product')} {context.user_data['client_product']}",
-                f"{t(lang, 'clients_remainder_prompt')} {context.user_data.get('client_remainder') or '-'}",
-                f"{t(lang, 'clients_enter_date')} {text}",
-            ]
-        )
-        context.user_data["state"] = STATE_CLIENT_ADD_CONFIRM
-        await update.message.reply_text(
-            t(lang, "clients_confirm").format(summary=summary),
-            reply_markup=ReplyKeyboardMarkup(
-                [[t(lang, "confirm_save"), t(lang, "confirm_edit"), t(lang, "confirm_cancel")]],
-                resize_keyboard=True,
-            ),
+    blocks = [t(lang, "slow_queries_header").format(**params)]
+    blocks += [slowlog.format_statement(index, item) for index, item in enumerate(statements, 1)]
+    await reply(update, "\n\n".join(blocks), reply_markup=admin_menu(lang))
+
+
+@actions.action("menu_products")
+async def begin_products_search(update: Update, context: ContextTypes.DEFAULT_TYPE, text: str, user, lang: str) -> None:
+    context.user_data["state"] = STATE_PRODUCTS_SEARCH
+    await reply(update, t(lang, "products_search"))
+
+
+@actions.action("menu_stands")
+async def begin_stands_search(update: Update, context: ContextTypes.DEFAULT_TYPE, text: str, user, lang: str) -> None:
+    context.user_data["state"] = STATE_STANDS_SEARCH
+    await reply(update, t(lang, "stands_search"))
+
+
+onboarding = Flow("onboarding", requires_user=False)
+language = Flow("language", requires_user=False)
+client_add = Flow("client_add")
+client_search = Flow("client_search")
+client_lier = Flow("client_lier")
+client_processed = Flow("client_processed")
+pickup = Flow("pickup")
+planning = Flow("planning")
+hours_entry = Flow("hours")
+admin_roles = Flow("admin_roles")
+admin_performance = Flow("admin_performance")
+team_report = Flow("team_report")
+admin_planning = Flow("admin_planning")
+catalog_upload = Flow("catalog_import")
+catalog_search = Flow("catalog_search")
+
+
+@onboarding.state(STATE_AWAIT_NAME)
+async def save_name(update: Update, context: ContextTypes.DEFAULT_TYPE, text: str, user, lang: str) -> None:
+    name = text
+    await upsert_user(update.effective_user.id, name, ROLE_GUEST, "ru")
+    await reply(
+        update,
+        t("ru", "name_saved").format(name=name),
+        reply_markup=main_menu(ROLE_GUEST, "ru"),
+    )
+    context.user_data.clear()
+
+
+@language.state(STATE_LANG)
+async def choose_language(update: Update, context: ContextTypes.DEFAULT_TYPE, text: str, user, lang: str) -> None:
+    lang_choice = text.lower()
+    if lang_choice in LANGUAGES:
+        user_id = update.effective_user.id
+        await update_user_lang(user_id, lang_choice)
+        user = await get_user(user_id)
+        await reply(
+            update,
+            t(lang_choice, "lang_saved"),
+            reply_markup=main_menu(user["role"], lang_choice),
         )
+        context.user_data.clear()
         return
-    if state == STATE_CLIENT_ADD_CONFIRM:
-        if text == t(lang, "confirm_save"):
-            data = {
-                "name": context.user_data["client_name"],
-                "city": context.user_data["client_city"],
-                "missing_product": context.user_data["client_product"],
-                "remainder": context.user_data.get("client_remainder"),
-                "date": context.user_data["client_date"],
-                "responsible": user["name"],
-            }
-            create_client(data)
-            await update.message.reply_text(
-                t(lang, "saved"),
-                reply_markup=clients_menu(user["role"], lang),
-            )
-            context.user_data.clear()
-            return
-        if text == t(lang, "confirm_edit"):
-            context.user_data.clear()
-            context.user_data["state"] = STATE_CLIENT_ADD
-            await update.message.reply_text(t(lang, "clients_enter_name"))
-            return
-        if text == t(lang, "confirm_cancel"):
-            await update.message.reply_text(
-                t(lang, "cancelled"),
-                reply_markup=clients_menu(user["role"], lang),
-            )
-            context.user_data.clear()
-            return
-        await update.message.reply_text(t(lang, "clients_confirm"))
+    await reply(update, t(lang, "lang_prompt"), reply_markup=lang_menu())
+
+
+@client_add.state(STATE_CLIENT_ADD)
+async def client_add_name(update: Update, context: ContextTypes.DEFAULT_TYPE, text: str, user, lang: str) -> None:
+    context.user_data["client_name"] = text
+    context.user_data["state"] = STATE_CLIENT_ADD_CITY
+    await reply(update, t(lang, "clients_enter_city"))
+
+
+@client_add.state(STATE_CLIENT_ADD_CITY)
+async def client_add_city(update: Update, context: ContextTypes.DEFAULT_TYPE, text: str, user, lang: str) -> None:
+    context.user_data["client_city"] = text
+    context.user_data["state"] = STATE_CLIENT_ADD_PRODUCT
+    await reply(update, t(lang, "clients_enter_product"))
+
+
+@client_add.state(STATE_CLIENT_ADD_PRODUCT)
+async def client_add_product(update: Update, context: ContextTypes.DEFAULT_TYPE, text: str, user, lang: str) -> None:
+    context.user_data["client_product"] = text
+    context.user_data["state"] = STATE_CLIENT_ADD_REMAINDER_CHOICE
+    await reply(
+        update,
+        t(lang, "clients_remainder_prompt"),
+        reply_markup=remainder_menu(lang),
+    )
+
+
+@client_add.state(STATE_CLIENT_ADD_REMAINDER_CHOICE)
+async def client_add_remainder_choice(update: Update, context: ContextTypes.DEFAULT_TYPE, text: str, user, lang: str) -> None:
+    if text == t(lang, "clients_remainder_none"):
+        context.user_data["client_remainder"] = ""
+        context.user_data["state"] = STATE_CLIENT_ADD_DATE
+        await reply(update, t(lang, "clients_enter_date"))
+        return
+    if text == t(lang, "clients_remainder_enter"):
+        context.user_data["state"] = STATE_CLIENT_ADD_REMAINDER
+        await reply(update, t(lang, "clients_enter_remainder"))
         return
+    await reply(update, t(lang, "clients_remainder_prompt"))
 
-    if state == STATE_CLIENT_SEARCH:
-        rows = search_clients(text)
-        if not rows:
-            await update.message.reply_text(t(lang, "clients_search_none"))
-            context.user_data.clear()
-            return
-        results = "\n".join(format_client_row(row) for row in rows)
-        await update.message.reply_text(t(lang, "clients_search_results").format(results=results))
-        context.user_data.clear()
+
+@client_add.state(STATE_CLIENT_ADD_REMAINDER)
+async def client_add_remainder(update: Update, context: ContextTypes.DEFAULT_TYPE, text: str, user, lang: str) -> None:
+    context.user_data["client_remainder"] = text
+    context.user_data["state"] = STATE_CLIENT_ADD_DATE
+    await reply(update, t(lang, "clients_enter_date"))
+
+
+@client_add.state(STATE_CLIENT_ADD_DATE)
+async def client_add_date(update: Update, context: ContextTypes.DEFAULT_TYPE, text: str, user, lang: str) -> None:
+    parsed = parse_date(text)
+    if not parsed:
+        await reply(update, t(lang, "clients_enter_date"))
         return
+    context.user_data["client_date"] = parsed
+    summary = "\n".join(
+        [
+            f"{t(lang, 'clients_enter_name')} {context.user_data['client_name']}",
+            f"{t(lang, 'clients_enter_city')} {context.user_data['client_city']}",
+            f"{t(lang, 'clients_enter_product')} {context.user_data['client_product']}",
+            f"{t(lang, 'clients_remainder_prompt')} {context.user_data.get('client_remainder') or '-'}",
+            f"{t(lang, 'clients_enter_date')} {text}",
+        ]
+    )
+    context.user_data["state"] = STATE_CLIENT_ADD_CONFIRM
+    await reply(
+        update,
+        t(lang, "clients_confirm").format(summary=summary),
+        reply_markup=confirm_menu(lang),
+    )
 
-    if state == STATE_CLIENT_STATUS_LIER:
-        rows = search_clients(text)
-        if not rows:
-            await update.message.reply_text(t(lang, "clients_search_none"))
-            context.user_data.clear()
-            return
-        results = "\n".join(format_client_row(row) for row in rows)
-        context.user_data["client_candidates"] = {row["id"] for row in rows}
-        context.user_data["state"] = STATE_CLIENT_STATUS_LIER_DATE
-        await update.message.reply_text(t(lang, "clients_search_results").format(results=results))
-        return
-
-    if state == STATE_CLIENT_STATUS_LIER_DATE:
-        if "client_id" not in context.user_data:
-            try:
-                client_id = int(text)
-            except ValueError:
-                await update.message.reply_text(t(lang, "clients_search_results").format(results=""))
-                return
-            context.user_data["client_id"] = client_id
-            await update.message.reply_text(t(lang, "clients_ready_date"))
-            return
-        parsed = parse_date(text)
-        if not parsed:
-            await update.message.reply_text(t(lang, "clients_ready_date"))
-            return
-        update_client_ready_lier(context.user_data["client_id"], parsed, user["name"])
-        await update.message.reply_text(
+
+@client_add.state(STATE_CLIENT_ADD_CONFIRM)
+async def client_add_confirm(update: Update, context: ContextTypes.DEFAULT_TYPE, text: str, user, lang: str) -> None:
+    if text == t(lang, "confirm_save"):
+        data = {
+            "name": context.user_data["client_name"],
+            "city": context.user_data["client_city"],
+            "missing_product": context.user_data["client_product"],
+            "remainder": context.user_data.get("client_remainder"),
+            "date": context.user_data["client_date"],
+            "responsible": user["name"],
+        }
+        await create_client(data)
+        await reply(
+            update,
             t(lang, "saved"),
             reply_markup=clients_menu(user["role"], lang),
         )
         context.user_data.clear()
         return
-
-    if state == STATE_CLIENT_STATUS_PROCESSED:
-        rows = search_clients(text)
-        if not rows:
-            await update.message.reply_text(t(lang, "clients_search_none"))
-            context.user_data.clear()
-            return
-        results = "\n".join(format_client_row(row) for row in rows)
-        context.user_data["state"] = STATE_CLIENT_STATUS_PROCESSED_DATE
-        await update.message.reply_text(t(lang, "clients_search_results").format(results=results))
-        return
-
-    if state == STATE_CLIENT_STATUS_PROCESSED_DATE:
-        if "client_id" not in context.user_data:
-            try:
-                context.user_data["client_id"] = int(text)
-            except ValueError:
-                await update.message.reply_text(t(lang, "clients_search_results").format(results=""))
-                return
-            await update.message.reply_text(t(lang, "clients_processed_date"))
-            return
-        parsed = parse_date(text)
-        if not parsed:
-            await update.message.reply_text(t(lang, "clients_processed_date"))
-            return
-        context.user_data["processed_date"] = parsed
-        context.user_data["state"] = STATE_CLIENT_STATUS_PROCESSED_TIME
-        await update.message.reply_text(t(lang, "clients_processed_time"))
+    if text == t(lang, "confirm_edit"):
+        context.user_data.clear()
+        context.user_data["state"] = STATE_CLIENT_ADD
+        await reply(update, t(lang, "clients_enter_name"))
         return
-
-    if state == STATE_CLIENT_STATUS_PROCESSED_TIME:
-        parsed = parse_time(text)
-        if not parsed:
-            await update.message.reply_text(t(lang, "clients_processed_time"))
-            return
-        dt = f"{context.user_data['processed_date']} {parsed}"
-        update_client_processed(context.user_data["client_id"], dt, user["name"])
-        await update.message.reply_text(
-            t(lang, "saved"),
+    if text == t(lang, "confirm_cancel"):
+        await reply(
+            update,
+            t(lang, "cancelled"),
             reply_markup=clients_menu(user["role"], lang),
         )
         context.user_data.clear()
         return
+    await reply(update, t(lang, "clients_confirm"))
 
-    if state == STATE_PICKUP_QUERY:
-        rows = search_clients(text)
-        if not rows:
-            await update.message.reply_text(t(lang, "clients_search_none"))
-            context.user_data.clear()
-            return
-        results = "\n".join(format_client_row(row) for row in rows)
-        context.user_data["state"] = STATE_PICKUP_ID
-        await update.message.reply_text(t(lang, "clients_search_results").format(results=results))
+
+@client_search.state(STATE_CLIENT_SEARCH)
+async def client_search_results(update: Update, context: ContextTypes.DEFAULT_TYPE, text: str, user, lang: str) -> None:
+    if await query_too_short(update, lang, text):
+        return
+    page = await search_clients(text)
+    if not page.rows:
+        await reply(update, t(lang, "clients_search_none"))
+        context.user_data.clear()
         return
+    await reply_page(update, context, lang, "clients", text, page)
+    context.user_data.clear()
 
-    if state == STATE_PICKUP_ID:
+
+@client_lier.state(STATE_CLIENT_STATUS_LIER)
+async def client_lier_search(update: Update, context: ContextTypes.DEFAULT_TYPE, text: str, user, lang: str) -> None:
+    if await query_too_short(update, lang, text):
+        return
+    page = await search_clients(text)
+    if not page.rows:
+        await reply(update, t(lang, "clients_search_none"))
+        context.user_data.clear()
+        return
+    context.user_data["client_candidates"] = {row["id"] for row in page.rows}
+    context.user_data["state"] = STATE_CLIENT_STATUS_LIER_DATE
+    await reply_page(update, context, lang, "clients", text, page)
+
+
+@client_lier.state(STATE_CLIENT_STATUS_LIER_DATE)
+async def client_lier_date(update: Update, context: ContextTypes.DEFAULT_TYPE, text: str, user, lang: str) -> None:
+    if "client_id" not in context.user_data:
         try:
             client_id = int(text)
         except ValueError:
-            await update.message.reply_text(t(lang, "pickup_choose"))
+            await reply(update, t(lang, "clients_search_results").format(results=""))
             return
         context.user_data["client_id"] = client_id
-        context.user_data["state"] = STATE_PICKUP_ACTION
-        await update.message.reply_text(
-            t(lang, "pickup_choose"),
-            reply_markup=ReplyKeyboardMarkup(
-                [[t(lang, "pickup_all"), t(lang, "pickup_left")]],
-                resize_keyboard=True,
-            ),
-        )
+        await reply(update, t(lang, "clients_ready_date"))
         return
+    parsed = parse_date(text)
+    if not parsed:
+        await reply(update, t(lang, "clients_ready_date"))
+        return
+    await update_client_ready_lier(context.user_data["client_id"], parsed, user["name"])
+    await reply(
+        update,
+        t(lang, "saved"),
+        reply_markup=clients_menu(user["role"], lang),
+    )
+    context.user_data.clear()
 
-    if state == STATE_PICKUP_ACTION:
-        if text == t(lang, "pickup_all"):
-            context.user_data["pickup_action"] = "all"
-            context.user_data["pickup_remainder"] = ""
-            context.user_data["state"] = STATE_PICKUP_DATE
-            await update.message.reply_text(t(lang, "pickup_date"))
-            return
-        if text == t(lang, "pickup_left"):
-            context.user_data["pickup_action"] = "left"
-            context.user_data["state"] = STATE_PICKUP_REMAINDER
-            await update.message.reply_text(t(lang, "pickup_left_prompt"))
+
+@client_processed.state(STATE_CLIENT_STATUS_PROCESSED)
+async def client_processed_search(update: Update, context: ContextTypes.DEFAULT_TYPE, text: str, user, lang: str) -> None:
+    if await query_too_short(update, lang, text):
+        return
+    page = await search_clients(text)
+    if not page.rows:
+        await reply(update, t(lang, "clients_search_none"))
+        context.user_data.clear()
+        return
+    context.user_data["state"] = STATE_CLIENT_STATUS_PROCESSED_DATE
+    await reply_page(update, context, lang, "clients", text, page)
+
+
+@client_processed.state(STATE_CLIENT_STATUS_PROCESSED_DATE)
+async def client_processed_date(update: Update, context: ContextTypes.DEFAULT_TYPE, text: str, user, lang: str) -> None:
+    if "client_id" not in context.user_data:
+        try:
+            context.user_data["client_id"] = int(text)
+        except ValueError:
+            await reply(update, t(lang, "clients_search_results").format(results=""))
             return
-        await update.message.reply_text(t(lang, "pickup_choose"))
+        await reply(update, t(lang, "clients_processed_date"))
+        return
+    parsed = parse_date(text)
+    if not parsed:
+        await reply(update, t(lang, "clients_processed_date"))
         return
+    context.user_data["processed_date"] = parsed
+    context.user_data["state"] = STATE_CLIENT_STATUS_PROCESSED_TIME
+    await reply(update, t(lang, "clients_processed_time"))
 
-    if state == STATE_PICKUP_REMAINDER:
-        context.user_data["pickup_remainder"] = text
-        context.user_data["state"] = STATE_PICKUP_DATE
-        await update.message.reply_text(t(lang, "pickup_date"))
+
+@client_processed.state(STATE_CLIENT_STATUS_PROCESSED_TIME)
+async def client_processed_time(update: Update, context: ContextTypes.DEFAULT_TYPE, text: str, user, lang: str) -> None:
+    parsed = parse_time(text)
+    if not parsed:
+        await reply(update, t(lang, "clients_processed_time"))
         return
+    dt = f"{context.user_data['processed_date']} {parsed}"
+    await update_client_processed(context.user_data["client_id"], dt, user["name"])
+    await reply(
+        update,
+        t(lang, "saved"),
+        reply_markup=clients_menu(user["role"], lang),
+    )
+    context.user_data.clear()
 
-    if state == STATE_PICKUP_DATE:
-        parsed = parse_date(text)
-        if not parsed:
-            await update.message.reply_text(t(lang, "pickup_date"))
-            return
-        remainder = context.user_data.get("pickup_remainder")
-        client_id = context.user_data["client_id"]
-        if context.user_data.get("pickup_action") == "all":
-            update_client_remainder(client_id, "")
-        else:
-            update_client_remainder(client_id, remainder)
-        add_pickup_log(client_id, parsed, context.user_data.get("pickup_action", ""), remainder, user["name"])
-        await update.message.reply_text(
-            t(lang, "saved"),
-            reply_markup=main_menu(user["role"], lang),
-        )
+
+@pickup.state(STATE_PICKUP_QUERY)
+async def pickup_search(update: Update, context: ContextTypes.DEFAULT_TYPE, text: str, user, lang: str) -> None:
+    if text == t(lang, "clients_menu_list_pickup"):
+        kind, query, page = "pickup", "", await list_pickup_clients()
+    elif await query_too_short(update, lang, text):
+        return
+    else:
+        kind, query, page = "clients", text, await search_clients(text)
+    if not page.rows:
+        await reply(update, t(lang, "pickup_list_empty" if kind == "pickup" else "clients_search_none"))
         context.user_data.clear()
         return
+    context.user_data["state"] = STATE_PICKUP_ID
+    await reply_page(update, context, lang, kind, query, page)
 
-    if state == STATE_PLANNING_TYPE:
-        if text in {t(lang, "planning_outbound"), t(lang, "planning_warehouse")}:
-            context.user_data["planning_type"] = (
-                "planning_outbound" if text == t(lang, "planning_outbound") else "planning_warehouse"
-            )
-            context.user_data["state"] = STATE_PLANNING_PERIOD
-            await update.message.reply_text(t(lang, "planning_period_prompt"), reply_markup=period_menu(lang))
-            return
-        await update.message.reply_text(t(lang, "planning_type_prompt"), reply_markup=planning_menu(lang))
-        return
-
-    if state == STATE_PLANNING_PERIOD:
-        period = None
-        today = datetime.now().date()
-        if text == t(lang, "period_today"):
-            period = (today, today)
-        elif text == t(lang, "period_tomorrow"):
-            tomorrow = today + timedelta(days=1)
-            period = (tomorrow, tomorrow)
-        elif text == t(lang, "period_week"):
-            start = today - timedelta(days=today.weekday())
-            end = start + timedelta(days=6)
-            period = (start, end)
-        elif text == t(lang, "period_month"):
-            start = today.replace(day=1)
-            next_month = (start + timedelta(days=32)).replace(day=1)
-            end = next_month - timedelta(days=1)
-            period = (start, end)
-        elif text == t(lang, "period_date"):
-            context.user_data["state"] = STATE_PLANNING_DATE
-            await update.message.reply_text(t(lang, "planning_date_prompt"))
-            return
-        if period:
-            table = context.user_data.get("planning_type", "planning_outbound")
-            rows = list_planning(table, period[0].isoformat(), period[1].isoformat())
-            if not rows:
-                await update.message.reply_text(t(lang, "planning_empty"))
-            else:
-                results = "\n".join(
-                    f"{row['date']} | {row.get('client', row.get('shift_names'))} | {row['plan_text']}"
-                    for row in rows
-                )
-                await update.message.reply_text(results)
-            context.user_data.clear()
-            return
-        await update.message.reply_text(t(lang, "planning_period_prompt"), reply_markup=period_menu(lang))
+
+@pickup.state(STATE_PICKUP_ID)
+async def pickup_choose_client(update: Update, context: ContextTypes.DEFAULT_TYPE, text: str, user, lang: str) -> None:
+    client_ids = parse_ids(text)
+    if not client_ids:
+        await reply(update, t(lang, "pickup_choose"))
         return
+    # Several ids record one route's pickups together.
+    context.user_data["client_ids"] = client_ids
+    context.user_data["state"] = STATE_PICKUP_ACTION
+    await reply(
+        update,
+        t(lang, "pickup_choose"),
+        reply_markup=pickup_action_menu(lang),
+    )
 
-    if state == STATE_PLANNING_DATE:
-        parsed = parse_date(text)
-        if not parsed:
-            await update.message.reply_text(t(lang, "planning_date_prompt"))
-            return
-        table = context.user_data.get("planning_type", "planning_outbound")
-        rows = list_planning(table, parsed, parsed)
-        if not rows:
-            await update.message.reply_text(t(lang, "planning_empty"))
-        else:
-            results = "\n".join(
-                f"{row['date']} | {row.get('client', row.get('shift_names'))} | {row['plan_text']}"
-                for row in rows
-            )
-            await update.message.reply_text(results)
-        context.user_data.clear()
+
+@pickup.state(STATE_PICKUP_ACTION)
+async def pickup_choose_action(update: Update, context: ContextTypes.DEFAULT_TYPE, text: str, user, lang: str) -> None:
+    if text == t(lang, "pickup_all"):
+        context.user_data["pickup_action"] = "all"
+        context.user_data["pickup_remainder"] = ""
+        context.user_data["state"] = STATE_PICKUP_DATE
+        await reply(update, t(lang, "pickup_date"))
+        return
+    if text == t(lang, "pickup_left"):
+        context.user_data["pickup_action"] = "left"
+        context.user_data["state"] = STATE_PICKUP_REMAINDER
+        await reply(update, t(lang, "pickup_left_prompt"))
         return
+    await reply(update, t(lang, "pickup_choose"))
 
-    if state == STATE_HOURS_DATE:
-        parsed = parse_date(text)
-        if not parsed:
-            await update.message.reply_text(t(lang, "hours_date"))
-            return
-        context.user_data["hours_date"] = parsed
-        context.user_data["state"] = STATE_HOURS_START
-        await update.message.reply_text(t(lang, "hours_start"))
+
+@pickup.state(STATE_PICKUP_REMAINDER)
+async def pickup_remainder(update: Update, context: ContextTypes.DEFAULT_TYPE, text: str, user, lang: str) -> None:
+    context.user_data["pickup_remainder"] = text
+    context.user_data["state"] = STATE_PICKUP_DATE
+    await reply(update, t(lang, "pickup_date"))
+
+
+@pickup.state(STATE_PICKUP_DATE)
+async def pickup_date(update: Update, context: ContextTypes.DEFAULT_TYPE, text: str, user, lang: str) -> None:
+    parsed = parse_date(text)
+    if not parsed:
+        await reply(update, t(lang, "pickup_date"))
+        return
+    client_ids = context.user_data["client_ids"]
+    count = await record_pickup(
+        client_ids,
+        parsed,
+        context.user_data.get("pickup_action", ""),
+        context.user_data.get("pickup_remainder"),
+        user["name"],
+    )
+    if count < len(client_ids):
+        # Ids deleted since they were entered are skipped by record_pickup.
+        text = t(lang, "pickup_partial").format(count=count, total=len(client_ids))
+    elif len(client_ids) == 1:
+        text = t(lang, "saved")
+    else:
+        text = t(lang, "pickup_saved").format(count=count)
+    await reply(update, text, reply_markup=main_menu(user["role"], lang))
+    context.user_data.clear()
+
+
+async def reply_planning(update: Update, context: ContextTypes.DEFAULT_TYPE, lang: str, start: str, end: str) -> None:
+    table = context.user_data.get("planning_type", "planning_outbound")
+    rows = await list_planning(table, start, end)
+    if not rows:
+        await reply(update, t(lang, "planning_empty"))
+    else:
+        await reply(update, "\n".join(format_planning_row(row) for row in rows))
+    context.user_data.clear()
+
+
+@planning.state(STATE_PLANNING_TYPE)
+async def planning_type(update: Update, context: ContextTypes.DEFAULT_TYPE, text: str, user, lang: str) -> None:
+    if text in {t(lang, "planning_outbound"), t(lang, "planning_warehouse")}:
+        context.user_data["planning_type"] = (
+            "planning_outbound" if text == t(lang, "planning_outbound") else "planning_warehouse"
+        )
+        context.user_data["state"] = STATE_PLANNING_PERIOD
+        await reply(update, t(lang, "planning_period_prompt"), reply_markup=period_menu(lang))
         return
+    await reply(update, t(lang, "planning_type_prompt"), reply_markup=planning_menu(lang))
 
-    if state == STATE_HOURS_START:
-        parsed = parse_time(text)
-        if not parsed:
-            await update.message.reply_text(t(lang, "hours_start"))
-            return
-        context.user_data["hours_start"] = parsed
-        context.user_data["state"] = STATE_HOURS_END
-        await update.message.reply_text(t(lang, "hours_end"))
+
+@planning.state(STATE_PLANNING_PERIOD)
+async def planning_period(update: Update, context: ContextTypes.DEFAULT_TYPE, text: str, user, lang: str) -> None:
+    if text == t(lang, "period_date"):
+        context.user_data["state"] = STATE_PLANNING_DATE
+        await reply(update, t(lang, "planning_date_prompt"))
+        return
+    period = period_range(lang, text)
+    if period:
+        await reply_planning(update, context, lang, period[0].isoformat(), period[1].isoformat())
         return
+    await reply(update, t(lang, "planning_period_prompt"), reply_markup=period_menu(lang))
 
-    if state == STATE_HOURS_END:
-        parsed = parse_time(text)
-        if not parsed:
-            await update.message.reply_text(t(lang, "hours_end"))
-            return
-        context.user_data["hours_end"] = parsed
-        context.user_data["state"] = STATE_HOURS_BREAK
-        await update.message.reply_text(t(lang, "hours_break"), reply_markup=break_menu(lang))
+
+@planning.state(STATE_PLANNING_DATE)
+async def planning_date(update: Update, context: ContextTypes.DEFAULT_TYPE, text: str, user, lang: str) -> None:
+    parsed = parse_date(text)
+    if not parsed:
+        await reply(update, t(lang, "planning_date_prompt"))
         return
+    await reply_planning(update, context, lang, parsed, parsed)
 
-    if state == STATE_HOURS_BREAK:
-        if text not in {t(lang, "hours_break_yes"), t(lang, "hours_break_no")}:
-            await update.message.reply_text(t(lang, "hours_break"), reply_markup=break_menu(lang))
-            return
-        break_minutes = 30 if text == t(lang, "hours_break_yes") else 0
-        start_dt = datetime.strptime(context.user_data["hours_start"], "%H:%M")
-        end_dt = datetime.strptime(context.user_data["hours_end"], "%H:%M")
-        hours = (end_dt - start_dt).total_seconds() / 3600 - (break_minutes / 60)
-        add_hours(user_id, context.user_data["hours_date"], context.user_data["hours_start"], context.user_data["hours_end"], break_minutes, hours)
-        await update.message.reply_text(
-            t(lang, "hours_saved").format(hours=hours),
-            reply_markup=main_menu(user["role"], lang),
-        )
-        context.user_data.clear()
+
+@hours_entry.state(STATE_HOURS_DATE)
+async def hours_date(update: Update, context: ContextTypes.DEFAULT_TYPE, text: str, user, lang: str) -> None:
+    parsed = parse_date(text)
+    if not parsed:
+        await reply(update, t(lang, "hours_date"))
         return
+    context.user_data["hours_date"] = parsed
+    context.user_data["state"] = STATE_HOURS_START
+    await reply(update, t(lang, "hours_start"))
 
-    if state == STATE_ADMIN_ROLE_USER:
-        try:
-            context.user_data["target_user_id"] = int(text)
-        except ValueError:
-            await update.message.reply_text(t(lang, "admin_role_user"))
-            return
-        context.user_data["state"] = STATE_ADMIN_ROLE_SET
-        await update.message.reply_text(t(lang, "admin_role_set"))
+
+@hours_entry.state(STATE_HOURS_START)
+async def hours_start(update: Update, context: ContextTypes.DEFAULT_TYPE, text: str, user, lang: str) -> None:
+    parsed = parse_time(text)
+    if not parsed:
+        await reply(update, t(lang, "hours_start"))
         return
+    context.user_data["hours_start"] = parsed
+    context.user_data["state"] = STATE_HOURS_END
+    await reply(update, t(lang, "hours_end"))
 
-    if state == STATE_ADMIN_ROLE_SET:
-        role = text.strip().upper()
-        if role not in {ROLE_GUEST, ROLE_OUTBOUND, ROLE_WAREHOUSE, ROLE_MANAGER, ROLE_BOSS, ROLE_ADMIN}:
-            await update.message.reply_text(t(lang, "admin_role_set"))
-            return
-        update_user_role(context.user_data["target_user_id"], role)
-        await update.message.reply_text(t(lang, "admin_role_done"), reply_markup=admin_menu(lang))
-        context.user_data.clear()
+
+@hours_entry.state(STATE_HOURS_END)
+async def hours_end(update: Update, context: ContextTypes.DEFAULT_TYPE, text: str, user, lang: str) -> None:
+    parsed = parse_time(text)
+    if not parsed:
+        await reply(update, t(lang, "hours_end"))
         return
+    context.user_data["hours_end"] = parsed
+    context.user_data["state"] = STATE_HOURS_BREAK
+    await reply(update, t(lang, "hours_break"), reply_markup=break_menu(lang))
 
-    if state == STATE_ADMIN_PERF_USER:
-        context.user_data["perf_user"] = text.strip()
-        context.user_data["state"] = STATE_ADMIN_PERF_PERIOD
-        await update.message.reply_text(t(lang, "admin_performance_period"), reply_markup=period_menu(lang))
-        return
-
-    if state == STATE_ADMIN_PERF_PERIOD:
-        today = datetime.now().date()
-        if text == t(lang, "period_today"):
-            start = end = today
-        elif text == t(lang, "period_tomorrow"):
-            start = end = today + timedelta(days=1)
-        elif text == t(lang, "period_week"):
-            start = today - timedelta(days=today.weekday())
-            end = start + timedelta(days=6)
-        elif text == t(lang, "period_month"):
-            start = today.replace(day=1)
-            next_month = (start + timedelta(days=32)).replace(day=1)
-            end = next_month - timedelta(days=1)
-        elif text == t(lang, "period_date"):
-            context.user_data["state"] = STATE_ADMIN_PERF_DATE
-            await update.message.reply_text(t(lang, "admin_performance_date"))
-            return
-        else:
-            await update.message.reply_text(t(lang, "admin_performance_period"))
-            return
-        total = sum_hours_by_user(context.user_data["perf_user"], start.isoformat(), end.isoformat())
-        await update.message.reply_text(
-            t(lang, "admin_performance_result").format(hours=total),
-            reply_markup=admin_menu(lang),
-        )
-        context.user_data.clear()
+
+@hours_entry.state(STATE_HOURS_BREAK)
+async def hours_break(update: Update, context: ContextTypes.DEFAULT_TYPE, text: str, user, lang: str) -> None:
+    if text not in {t(lang, "hours_break_yes"), t(lang, "hours_break_no")}:
+        await reply(update, t(lang, "hours_break"), reply_markup=break_menu(lang))
         return
+    break_minutes = 30 if text == t(lang, "hours_break_yes") else 0
+    start_dt = datetime.strptime(context.user_data["hours_start"], "%H:%M")
+    end_dt = datetime.strptime(context.user_data["hours_end"], "%H:%M")
+    hours = (end_dt - start_dt).total_seconds() / 3600 - (break_minutes / 60)
+    await add_hours(
+        update.effective_user.id,
+        context.user_data["hours_date"],
+        context.user_data["hours_start"],
+        context.user_data["hours_end"],
+        break_minutes,
+        hours,
+    )
+    await reply(
+        update,
+        t(lang, "hours_saved").format(hours=hours),
+        reply_markup=main_menu(user["role"], lang),
+    )
+    context.user_data.clear()
 
-    if state == STATE_ADMIN_PERF_DATE:
-        parsed = parse_date(text)
-        if not parsed:
-            await update.message.reply_text(t(lang, "admin_performance_date"))
-            return
-        total = sum_hours_by_user(context.user_data["perf_user"], parsed, parsed)
-        await update.message.reply_text(
-            t(lang, "admin_performance_result").format(hours=total),
-            reply_markup=admin_menu(lang),
-        )
-        context.user_data.clear()
+
+@admin_roles.state(STATE_ADMIN_ROLE_USER)
+async def admin_role_user(update: Update, context: ContextTypes.DEFAULT_TYPE, text: str, user, lang: str) -> None:
+    try:
+        context.user_data["target_user_id"] = int(text)
+    except ValueError:
+        await reply(update, t(lang, "admin_role_user"))
         return
+    context.user_data["state"] = STATE_ADMIN_ROLE_SET
+    await reply(update, t(lang, "admin_role_set"))
 
-    if state == STATE_PRODUCTS_SEARCH:
-        rows = search_products(text)
-        if not rows:
-            await update.message.reply_text(t(lang, "clients_search_none"))
-        else:
-            results = "\n".join(f"{row['id']} | {row['sort']} | {row['name']} | {row['article']}" for row in rows)
-            await update.message.reply_text(t(lang, "search_results").format(results=results))
-        context.user_data.clear()
+
+@admin_roles.state(STATE_ADMIN_ROLE_SET)
+async def admin_role_set(update: Update, context: ContextTypes.DEFAULT_TYPE, text: str, user, lang: str) -> None:
+    role = text.strip().upper()
+    if role not in {ROLE_GUEST, ROLE_OUTBOUND, ROLE_WAREHOUSE, ROLE_MANAGER, ROLE_BOSS, ROLE_ADMIN}:
+        await reply(update, t(lang, "admin_role_set"))
         return
+    await update_user_role(context.user_data["target_user_id"], role)
+    await reply(update, t(lang, "admin_role_done"), reply_markup=admin_menu(lang))
+    context.user_data.clear()
 
-    if state == STATE_STANDS_SEARCH:
-        rows = search_stands(text)
-        if not rows:
-            await update.message.reply_text(t(lang, "clients_search_none"))
-        else:
-            results = "\n".join(
-                f"{row['id']} | {row['stand_name']} | {row['size']} | {row['article']} | {row['tiles_text']}"
-                for row in rows
-            )
-            await update.message.reply_text(t(lang, "search_results").format(results=results))
-        context.user_data.clear()
+
+async def reply_performance(update: Update, context: ContextTypes.DEFAULT_TYPE, lang: str, start: str, end: str) -> None:
+    total = await sum_hours_by_user(context.user_data["perf_user"], start, end)
+    await reply(
+        update,
+        t(lang, "admin_performance_result").format(hours=total.hours, overtime=total.overtime),
+        reply_markup=admin_menu(lang),
+    )
+    context.user_data.clear()
+
+
+@admin_performance.state(STATE_ADMIN_PERF_USER)
+async def admin_perf_user(update: Update, context: ContextTypes.DEFAULT_TYPE, text: str, user, lang: str) -> None:
+    context.user_data["perf_user"] = text.strip()
+    context.user_data["state"] = STATE_ADMIN_PERF_PERIOD
+    await reply(update, t(lang, "admin_performance_period"), reply_markup=period_menu(lang))
+
+
+@admin_performance.state(STATE_ADMIN_PERF_PERIOD)
+async def admin_perf_period(update: Update, context: ContextTypes.DEFAULT_TYPE, text: str, user, lang: str) -> None:
+    if text == t(lang, "period_date"):
+        context.user_data["state"] = STATE_ADMIN_PERF_DATE
+        await reply(update, t(lang, "admin_performance_date"))
+        return
+    period = period_range(lang, text)
+    if not period:
+        await reply(update, t(lang, "admin_performance_period"))
         return
+    await reply_performance(update, context, lang, period[0].isoformat(), period[1].isoformat())
 
-    if text == t(lang, "menu_language"):
-        context.user_data["state"] = STATE_LANG
-        await update.message.reply_text(t(lang, "lang_prompt"), reply_markup=lang_menu())
+
+@admin_performance.state(STATE_ADMIN_PERF_DATE)
+async def admin_perf_date(update: Update, context: ContextTypes.DEFAULT_TYPE, text: str, user, lang: str) -> None:
+    parsed = parse_date(text)
+    if not parsed:
+        await reply(update, t(lang, "admin_performance_date"))
         return
+    await reply_performance(update, context, lang, parsed, parsed)
+
 
-    if text == t(lang, "menu_clients"):
-        await update.message.reply_text(t(lang, "menu_clients"), reply_markup=clients_menu(user["role"], lang))
+async def reply_team_report(update: Update, context: ContextTypes.DEFAULT_TYPE, lang: str, start: str, end: str) -> None:
+    context.user_data.clear()
+    rows = await team_hours(start, end)
+    if not rows:
+        await reply(update, t(lang, "team_report_empty"), reply_markup=admin_menu(lang))
         return
+    table = "\n".join(f"{row['name']} | {row['hours']:.2f} | {row['days']} | {row['overtime']:.2f}" for row in rows)
+    await reply(
+        update,
+        t(lang, "team_report_result").format(start=start, end=end, rows=table),
+        reply_markup=admin_menu(lang),
+    )
+    path = await write_team_report_csv(start, end)
+    try:
+        await reply_document(update, path, f"team-report-{start}-{end}.csv")
+    finally:
+        path.unlink(missing_ok=True)
 
-    if text == t(lang, "clients_menu_add"):
-        context.user_data["state"] = STATE_CLIENT_ADD
-        await update.message.reply_text(t(lang, "clients_enter_name"))
+
+@team_report.state(STATE_TEAM_REPORT_PERIOD)
+async def team_report_period(update: Update, context: ContextTypes.DEFAULT_TYPE, text: str, user, lang: str) -> None:
+    if text == t(lang, "period_date"):
+        context.user_data["state"] = STATE_TEAM_REPORT_DATE
+        await reply(update, t(lang, "admin_performance_date"))
+        return
+    period = period_range(lang, text)
+    if not period:
+        await reply(update, t(lang, "admin_performance_period"))
         return
+    await reply_team_report(update, context, lang, period[0].isoformat(), period[1].isoformat())
+
 
-    if text == t(lang, "clients_menu_search"):
-        context.user_data["state"] = STATE_CLIENT_SEARCH
-        await update.message.reply_text(t(lang, "clients_search_prompt"))
+@team_report.state(STATE_TEAM_REPORT_DATE)
+async def team_report_date(update: Update, context: ContextTypes.DEFAULT_TYPE, text: str, user, lang: str) -> None:
+    parsed = parse_date(text)
+    if not parsed:
+        await reply(update, t(lang, "admin_performance_date"))
         return
+    await reply_team_report(update, context, lang, parsed, parsed)
+
+
+PLANNING_EDIT_DAYS = 14
 
-    if text == t(lang, "clients_menu_ready_lier"):
-        context.user_data["state"] = STATE_CLIENT_STATUS_LIER
-        await update.message.reply_text(t(lang, "clients_search_prompt"))
+
+def planning_format(lang: str, table: str) -> str:
+    return t(lang, "planning_format_outbound" if table == "planning_outbound" else "planning_format_warehouse")
+
+
+@admin_planning.state(STATE_ADMIN_PLANNING_TYPE)
+async def admin_planning_type(update: Update, context: ContextTypes.DEFAULT_TYPE, text: str, user, lang: str) -> None:
+    tables = {t(lang, "planning_outbound"): "planning_outbound", t(lang, "planning_warehouse"): "planning_warehouse"}
+    if text not in tables:
+        await reply(update, t(lang, "planning_type_prompt"), reply_markup=planning_menu(lang))
         return
+    context.user_data["planning_type"] = tables[text]
+    context.user_data["state"] = STATE_ADMIN_PLANNING_ACTION
+    await reply(update, t(lang, "planning_edit_action"), reply_markup=planning_edit_menu(lang))
 
-    if text == t(lang, "clients_menu_processed"):
-        context.user_data["state"] = STATE_CLIENT_STATUS_PROCESSED
-        await update.message.reply_text(t(lang, "clients_search_prompt"))
+
+@admin_planning.state(STATE_ADMIN_PLANNING_ACTION)
+async def admin_planning_action(update: Update, context: ContextTypes.DEFAULT_TYPE, text: str, user, lang: str) -> None:
+    table = context.user_data["planning_type"]
+    if text == t(lang, "planning_add"):
+        context.user_data["state"] = STATE_ADMIN_PLANNING_ADD
+        await reply(update, t(lang, "planning_add_prompt").format(format=planning_format(lang, table)))
+        return
+    if text not in {t(lang, "planning_edit"), t(lang, "planning_delete")}:
+        await reply(update, t(lang, "planning_edit_action"), reply_markup=planning_edit_menu(lang))
         return
+    # Show upcoming entries with their ids to pick from.
+    today = datetime.now().date()
+    rows = await list_planning(table, today.isoformat(), (today + timedelta(days=PLANNING_EDIT_DAYS - 1)).isoformat())
+    if rows:
+        await reply(update, "\n".join(f"{row['id']} | {format_planning_row(row)}" for row in rows))
+    else:
+        await reply(update, t(lang, "planning_empty"))
+    if text == t(lang, "planning_edit"):
+        context.user_data["state"] = STATE_ADMIN_PLANNING_EDIT
+        await reply(update, t(lang, "planning_edit_prompt").format(format=planning_format(lang, table)))
+    else:
+        context.user_data["state"] = STATE_ADMIN_PLANNING_DELETE
+        await reply(update, t(lang, "planning_delete_prompt"))
+
+
+@admin_planning.state(STATE_ADMIN_PLANNING_ADD, STATE_ADMIN_PLANNING_EDIT)
+async def admin_planning_entries(update: Update, context: ContextTypes.DEFAULT_TYPE, text: str, user, lang: str) -> None:
+    table = context.user_data["planning_type"]
+    editing = context.user_data["state"] == STATE_ADMIN_PLANNING_EDIT
+    entries, errors = parse_planning_lines(table, text, with_id=editing)
+    if errors or not entries:
+        # Nothing is saved unless every line is valid.
+        lines = ", ".join(map(str, errors or [1]))
+        await reply(update, t(lang, "planning_invalid_lines").format(lines=lines, format=planning_format(lang, table)))
+        return
+    if editing:
+        count = await update_planning(table, entries)
+        done = t(lang, "planning_updated")
+    else:
+        count = await add_planning(table, entries)
+        done = t(lang, "planning_added")
+    context.user_data.clear()
+    await reply(update, done.format(count=count), reply_markup=admin_menu(lang))
+
+
+@admin_planning.state(STATE_ADMIN_PLANNING_DELETE)
+async def admin_planning_delete(update: Update, context: ContextTypes.DEFAULT_TYPE, text: str, user, lang: str) -> None:
+    ids = parse_ids(text)
+    if not ids:
+        await reply(update, t(lang, "planning_delete_prompt"))
+        return
+    count = await delete_planning(context.user_data["planning_type"], ids)
+    context.user_data.clear()
+    await reply(update, t(lang, "planning_deleted").format(count=count), reply_markup=admin_menu(lang))
 
-    if text == t(lang, "clients_menu_list_pickup"):
-        rows = list_pickup_clients()
-        if not rows:
-            await update.message.reply_text(t(lang, "pickup_list_empty"))
-        else:
-            results = "\n".join(format_client_row(row) for row in rows)
-            await update.message.reply_text(results)
+
+@catalog_upload.state(STATE_CATALOG_IMPORT_TABLE)
+async def catalog_import_table(update: Update, context: ContextTypes.DEFAULT_TYPE, text: str, user, lang: str) -> None:
+    tables = {t(lang, "menu_products"): "products", t(lang, "menu_stands"): "stands"}
+    if text not in tables:
+        await reply(update, t(lang, "catalog_import_table"), reply_markup=catalog_table_menu(lang))
         return
+    context.user_data["import_table"] = tables[text]
+    context.user_data["state"] = STATE_CATALOG_IMPORT_FILE
+    columns = ", ".join(storage.CATALOG_FIELDS[tables[text]])
+    await reply(update, t(lang, "catalog_import_file").format(columns=columns))
 
-    if text == t(lang, "menu_pickup"):
-        context.user_data["state"] = STATE_PICKUP_QUERY
-        await update.message.reply_text(t(lang, "pickup_query"))
+
+@catalog_upload.state(STATE_CATALOG_IMPORT_FILE)
+async def catalog_import_waiting(update: Update, context: ContextTypes.DEFAULT_TYPE, text: str, user, lang: str) -> None:
+    columns = ", ".join(storage.CATALOG_FIELDS[context.user_data["import_table"]])
+    await reply(update, t(lang, "catalog_import_file").format(columns=columns))
+
+
+async def handle_document(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    user = await get_user(update.effective_user.id)
+    lang = user["lang"] if user else "ru"
+    if (
+        user is None
+        or user["role"] not in {ROLE_BOSS, ROLE_ADMIN}
+        or context.user_data.get("state") != STATE_CATALOG_IMPORT_FILE
+    ):
+        await reply(update, t(lang, "unknown"))
+        return
+    table = context.user_data["import_table"]
+    document = update.message.document
+    fd, name = tempfile.mkstemp(suffix=Path(document.file_name or "").suffix.lower())
+    os.close(fd)
+    path = Path(name)
+    try:
+        telegram_file = await document.get_file()
+        await telegram_file.download_to_drive(path)
+        counts = await import_catalog_file(path, table)
+    except ImportFormatError as exc:
+        error = t(lang, exc.key).format(**exc.params)
+        await reply(update, t(lang, "catalog_import_error").format(error=error))
         return
+    finally:
+        path.unlink(missing_ok=True)
+    context.user_data.clear()
+    await reply(
+        update,
+        t(lang, "catalog_import_done").format(**counts._asdict()),
+        reply_markup=admin_menu(lang),
+    )
+
 
-    if text == t(lang, "menu_planning"):
-        context.user_data["state"] = STATE_PLANNING_TYPE
-        await update.message.reply_text(t(lang, "planning_type_prompt"), reply_markup=planning_menu(lang))
+@catalog_search.state(STATE_PRODUCTS_SEARCH)
+async def products_search(update: Update, context: ContextTypes.DEFAULT_TYPE, text: str, user, lang: str) -> None:
+    if await query_too_short(update, lang, text):
         return
+    page = await search_products(text)
+    if page.rows:
+        await reply_page(update, context, lang, "products", text, page)
+        await reply_photos(update, "products", page.rows, format_product_row)
+    else:
+        similar = await similar_items("products", text)
+        if similar:
+            results = "\n".join(format_product_row(row) for row in similar)
+            await reply(update, t(lang, "similar_results").format(results=results))
+            await reply_photos(update, "products", similar, format_product_row)
+        else:
+            await reply(update, t(lang, "clients_search_none"))
+    context.user_data.clear()
+
 
-    if text == t(lang, "menu_hours"):
-        context.user_data["state"] = STATE_HOURS_DATE
-        await update.message.reply_text(t(lang, "hours_date"))
+@catalog_search.state(STATE_STANDS_SEARCH)
+async def stands_search(update: Update, context: ContextTypes.DEFAULT_TYPE, text: str, user, lang: str) -> None:
+    if await query_too_short(update, lang, text):
         return
+    page = await search_stands(text)
+    if page.rows:
+        await reply_page(update, context, lang, "stands", text, page)
+        await reply_photos(update, "stands", page.rows, format_stand_row)
+    else:
+        similar = await similar_items("stands", text)
+        if similar:
+            results = "\n".join(format_stand_row(row) for row in similar)
+            await reply(update, t(lang, "similar_results").format(results=results))
+            await reply_photos(update, "stands", similar, format_stand_row)
+        else:
+            await reply(update, t(lang, "clients_search_none"))
+    context.user_data.clear()
+
+
+flows = FlowRegistry()
+flows.add(
+    onboarding,
+    language,
+    client_add,
+    client_search,
+    client_lier,
+    client_processed,
+    pickup,
+    planning,
+    hours_entry,
+    admin_roles,
+    admin_performance,
+    team_report,
+    admin_planning,
+    catalog_upload,
+    catalog_search,
+)
+
+
+async def handle_text(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    text = update.message.text.strip()
+    user_id = update.effective_user.id
+    user = await get_user(user_id)
+    lang = user["lang"] if user else "ru"
+    state = context.user_data.get("state")
 
-    if text == t(lang, "menu_admin") and user["role"] in {ROLE_BOSS, ROLE_ADMIN}:
-        await update.message.reply_text(t(lang, "menu_admin"), reply_markup=admin_menu(lang))
+    if text == t(lang, "menu_back"):
+        context.user_data.clear()
+        if user:
+            await reply(
+                update,
+                t(lang, "saved"),
+                reply_markup=main_menu(user["role"], lang),
+            )
         return
 
-    if text == t(lang, "admin_roles"):
-        context.user_data["state"] = STATE_ADMIN_ROLE_USER
-        await update.message.reply_text(t(lang, "admin_role_user"))
+    flow, handler = flows.resolve(state)
+    if flow is not None and not flow.requires_user:
+        await handler(update, context, text, user, lang)
         return
 
-    if text == t(lang, "admin_performance"):
-        context.user_data["state"] = STATE_ADMIN_PERF_USER
-        await update.message.reply_text(t(lang, "admin_performance_user"))
+    if not user:
+        await reply(update, t(lang, "ask_name"))
+        context.user_data["state"] = STATE_AWAIT_NAME
         return
 
-    if text == t(lang, "menu_products"):
-        context.user_data["state"] = STATE_PRODUCTS_SEARCH
-        await update.message.reply_text(t(lang, "products_search"))
+    if handler is not None:
+        await handler(update, context, text, user, lang)
         return
 
-    if text == t(lang, "menu_stands"):
-        context.user_data["state"] = STATE_STANDS_SEARCH
-        await update.message.reply_text(t(lang, "stands_search"))
+    handler = actions.resolve(lang, text)
+    if handler is not None:
+        await handler(update, context, text, user, lang)
         return
 
-    await update.message.reply_text(t(lang, "unknown"))
+    await reply(update, t(lang, "unknown"))
+
+
+async def on_startup(app: Application) -> None:
+    server = monitoring.build_server()
+    if server is not None:
+        await server.start()
+        app.bot_data["metrics_server"] = server
+
+
+async def on_error(update: object, context: ContextTypes.DEFAULT_TYPE) -> None:
+    metrics.errors.inc("update" if isinstance(update, Update) else "other")
+    logging.error("Error while handling an update", exc_info=context.error)
+
+
+async def on_shutdown(app: Application) -> None:
+    server = app.bot_data.pop("metrics_server", None)
+    if server is not None:
+        await server.stop()
+    logging.info("User cache stats: %s", storage.user_cache.stats())
+    logging.info("Outbox stats: %s", outbox.stats())
+    async_storage.shutdown()
+    storage.close_all()
+
+
+def build_application(token: str, request: Optional[BaseRequest] = None) -> Application:
+    builder = (
+        Application.builder()
+        .token(token)
+        .concurrent_updates(PerUserUpdateProcessor())
+        .persistence(SQLitePersistence())
+        .post_init(on_startup)
+        .post_shutdown(on_shutdown)
+    )
+    if request is not None:
+        builder = builder.request(request).get_updates_request(request)
+    app = builder.build()
+    app.add_handler(CommandHandler("start", start))
+    app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_text))
+    app.add_handler(MessageHandler(filters.Document.ALL, handle_document))
+    app.add_handler(CallbackQueryHandler(turn_page, pattern=r"^page:"))
+    app.add_error_handler(on_error)
+    return app
 
 
 def run() -> None:
     token = os.getenv("BOT_TOKEN")
     if not token:
         raise RuntimeError("BOT_TOKEN is required")
-    init_db()
-    app = Application.builder().token(token).build()
-    app.add_handler(CommandHandler("start", start))
-    app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, handle_text))
-    app.run_polling()
+    mode = os.getenv("BOT_MODE", "polling")
+    if mode not in ("polling", "webhook"):
+        raise RuntimeError(f"Unknown BOT_MODE: {mode}")
+    secret = webhook_secret() if mode == "webhook" else None
+    storage.init_db()
+    catalog_index.load()
+    app = build_application(token)
+    if mode == "webhook":
+        run_webhook(app, secret)
+    else:
+        app.run_polling()
 
 
 if __name__ == "__main__":
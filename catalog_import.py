@@ -0,0 +1,100 @@
+"""Bulk import of products and stands from CSV or XLSX files.
+
+The first row is a header naming the table's columns (``sort``, ``name``,
+``article`` for products; ``stand_name``, ``size``, ``article``,
+``tiles_text`` for stands). Rows are read lazily and handed to
+:func:`storage.upsert_catalog_items`, which matches them by article.
+
+XLSX support needs the optional ``openpyxl`` package.
+
+Every problem with the file itself is raised as :class:`ImportFormatError`,
+including ones found mid-import: the import transaction is rolled back.
+"""
+
+import csv
+import itertools
+import zipfile
+import zlib
+from pathlib import Path
+from typing import Iterator
+
+import storage
+
+
+class ImportFormatError(ValueError):
+    """An unreadable file; ``key`` and ``params`` give the translated message."""
+
+    def __init__(self, key: str, message: str, **params: str) -> None:
+        super().__init__(message)
+        self.key = key
+        self.params = params
+
+
+def _csv_rows(path: Path) -> Iterator[list[str]]:
+    try:
+        with path.open(newline="", encoding="utf-8-sig") as handle:
+            sample = handle.read(4096)
+            handle.seek(0)
+            try:
+                dialect = csv.Sniffer().sniff(sample, delimiters=",;\t")
+            except csv.Error:
+                dialect = csv.excel
+            yield from csv.reader(handle, dialect)
+    except UnicodeDecodeError:
+        raise ImportFormatError("catalog_error_encoding", "file must be UTF-8 CSV") from None
+    except csv.Error as exc:
+        raise ImportFormatError("catalog_error_csv", f"malformed CSV: {exc}", error=str(exc)) from None
+
+
+def _xlsx_rows(path: Path) -> Iterator[list[str]]:
+    try:
+        import openpyxl
+        from openpyxl.utils.exceptions import InvalidFileException
+    except ImportError:
+        raise ImportFormatError(
+            "catalog_error_openpyxl", "XLSX import needs openpyxl (pip install openpyxl); upload CSV instead"
+        ) from None
+    try:
+        workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+        try:
+            for values in workbook.active.iter_rows(values_only=True):
+                yield ["" if value is None else str(value) for value in values]
+        finally:
+            workbook.close()
+    # A renamed or truncated file fails in zipfile, or on a missing or
+    # corrupt workbook part.
+    except (zipfile.BadZipFile, zlib.error, EOFError, KeyError, InvalidFileException):
+        raise ImportFormatError("catalog_error_xlsx", "not a valid .xlsx file") from None
+
+
+def read_items(path: Path, table: str) -> Iterator[dict[str, str]]:
+    """Yield one dict per data row, keyed by the table's column names."""
+    suffix = path.suffix.lower()
+    if suffix == ".csv":
+        rows = _csv_rows(path)
+    elif suffix == ".xlsx":
+        rows = _xlsx_rows(path)
+    else:
+        kind = suffix or path.name
+        raise ImportFormatError("catalog_error_type", f"Unsupported file type: {kind}", kind=kind)
+    header = [name.strip().lower() for name in next(rows, [])]
+    missing = [field for field in storage.CATALOG_FIELDS[table] if field not in header]
+    if missing:
+        columns = ", ".join(missing)
+        raise ImportFormatError("catalog_error_columns", f"Missing columns: {columns}", columns=columns)
+    for values in rows:
+        if any(value.strip() for value in values):
+            yield dict(zip(header, values))
+
+
+def import_file(path: Path, table: str) -> storage.ImportCounts:
+    """Import ``path`` into ``table``; blocking, call from a DB thread."""
+    if table not in storage.CATALOG_FIELDS:
+        raise ValueError("Invalid catalog table")
+    items = read_items(path, table)
+    # Read the header before the import transaction starts, so format errors
+    # do not touch the database.
+    first = next(items, None)
+    if first is None:
+        return storage.ImportCounts(0, 0, 0)
+    return storage.upsert_catalog_items(table, itertools.chain([first], items))
@@ -0,0 +1,201 @@
+"""Verify that no storage query needs a full table scan.
+
+Seeds a throwaway database with ``--rows`` rows per table, calls every
+storage function with a SQL trace callback attached, and runs
+``EXPLAIN QUERY PLAN`` on each captured statement. Exits non-zero if a plan
+contains a ``SCAN`` of a base table that is not covered by an index::
+
+    python check_query_plans.py --rows 100000
+"""
+
+import argparse
+import random
+import re
+import sys
+import tempfile
+from pathlib import Path
+from typing import Callable
+
+import slowlog
+import storage
+
+PLANNED_PREFIXES = ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH")
+
+
+def seed(rows: int) -> None:
+    rnd = random.Random(42)
+    conn = storage.get_conn()
+    with conn:
+        conn.executemany(
+            "INSERT INTO users (user_id, name, role, lang) VALUES (?, ?, 'OUTBOUND', 'ru')",
+            ((i, f"user{i}") for i in range(1, rows + 1)),
+        )
+        conn.executemany(
+            """
+            INSERT INTO clients (name, city, missing_product, remainder, date, responsible)
+            VALUES (?, ?, 'tiles', ?, '2026-01-01', 'seed')
+            """,
+            ((f"client {i}", f"city {i % 500}", "box" if i % 50 == 0 else "") for i in range(rows)),
+        )
+        conn.executemany(
+            "INSERT INTO pickup_logs (client_id, date, action, remainder, responsible) VALUES (?, '2026-01-02', 'all', '', 'seed')",
+            ((rnd.randint(1, rows),) for _ in range(rows)),
+        )
+        conn.executemany(
+            "INSERT INTO products (sort, name, article) VALUES ('tile', ?, ?)",
+            ((f"product {i}", f"A{i:06d}") for i in range(rows)),
+        )
+        conn.executemany(
+            "INSERT INTO stands (stand_name, size, article, tiles_text) VALUES (?, '1x2', ?, 'mix')",
+            ((f"stand {i}", f"S{i:06d}") for i in range(rows)),
+        )
+        for table, extra in (("planning_outbound", "client, city_index"), ("planning_warehouse", "shift_names")):
+            placeholders = ", ".join("'x'" for _ in extra.split(","))
+            conn.executemany(
+                f"INSERT INTO {table} (date, {extra}, plan_text) VALUES (?, {placeholders}, 'plan')",
+                ((f"2026-{1 + i % 12:02d}-{1 + i % 28:02d}",) for i in range(rows)),
+            )
+        conn.executemany(
+            "INSERT INTO hours (user_id, date, start_time, end_time, break_minutes, hours) VALUES (?, ?, '08:00', '16:30', 30, 8.0)",
+            ((rnd.randint(1, rows), f"2026-{1 + i % 12:02d}-{1 + i % 28:02d}") for i in range(rows)),
+        )
+    storage.rebuild_hours_rollups()
+    conn.execute("ANALYZE")
+
+
+def storage_calls() -> dict[str, Callable[[], object]]:
+    return {
+        "get_user": lambda: storage.get_user(7),
+        "upsert_user": lambda: storage.upsert_user(7, "user7", "OUTBOUND", "ru"),
+        "update_user_role": lambda: storage.update_user_role(7, "BOSS"),
+        "update_user_lang": lambda: storage.update_user_lang(7, "nl"),
+        "create_client": lambda: storage.create_client(
+            {
+                "name": "new",
+                "city": "Lier",
+                "missing_product": "tiles",
+                "remainder": "",
+                "date": "2026-02-01",
+                "responsible": "check",
+            }
+        ),
+        "search_clients": lambda: storage.search_clients("client 12"),
+        "search_clients_next": lambda: storage.search_clients("client 12", after=[-1.0, 500]),
+        # First page, no cursor: a short query must not fall back to a table scan.
+        "search_clients_short": lambda: storage.search_clients("cl"),
+        "get_client": lambda: storage.get_client(12),
+        "update_client_ready_lier": lambda: storage.update_client_ready_lier(12, "2026-02-01", "check"),
+        "update_client_processed": lambda: storage.update_client_processed(12, "2026-02-01 10:00", "check"),
+        "update_client_remainder": lambda: storage.update_client_remainder(12, "box"),
+        "add_pickup_log": lambda: storage.add_pickup_log(12, "2026-02-01", "all", "", "check"),
+        "record_pickup": lambda: storage.record_pickup([12, 13], "2026-02-01", "all", "", "check"),
+        "list_pickup_clients": lambda: storage.list_pickup_clients(),
+        "list_pickup_clients_next": lambda: storage.list_pickup_clients(after=[50_000]),
+        "search_products": lambda: storage.search_products("product 12"),
+        "search_stands": lambda: storage.search_stands("stand 12"),
+        "upsert_catalog_items": lambda: storage.upsert_catalog_items(
+            "products", [{"sort": "tile", "name": "imported", "article": "A000012"}]
+        ),
+        "list_catalog_items": lambda: storage.list_catalog_items("products", [1, 2, 3]),
+        "catalog_changes_since": lambda: storage.catalog_changes_since(10),
+        "add_photos": lambda: storage.add_photos("products", [("A000012", "/photos/A000012.jpg")]),
+        "list_photos": lambda: storage.list_photos("products", [12, 13]),
+        "set_photo_file_ids": lambda: storage.set_photo_file_ids([("file-12", 1)]),
+        "save_conversation_data": lambda: storage.save_conversation_data([("user", 7, "{}")]),
+        "load_conversation_data": lambda: storage.load_conversation_data("user", 7),
+        "delete_conversation_data": lambda: storage.delete_conversation_data("user", 7),
+        "list_planning_outbound": lambda: storage.list_planning("planning_outbound", "2026-03-01", "2026-03-07"),
+        "list_planning_warehouse": lambda: storage.list_planning("planning_warehouse", "2026-03-01", "2026-03-07"),
+        "add_planning": lambda: storage.add_planning("planning_outbound", [("2026-03-02", "client", "Lier 2500", "plan")]),
+        "update_planning": lambda: storage.update_planning(
+            "planning_warehouse", [(12, "2026-03-02", "shift", "plan")]
+        ),
+        "delete_planning": lambda: storage.delete_planning("planning_outbound", [12, 13]),
+        "add_hours": lambda: storage.add_hours(7, "2026-02-01", "08:00", "16:30", 30, 8.0),
+        "sum_hours_by_user": lambda: storage.sum_hours_by_user("user7", "2026-01-01", "2026-12-31"),
+        "team_hours": lambda: storage.team_hours("2026-03-01", "2026-03-31"),
+        "sum_hours_by_user_day": lambda: storage.sum_hours_by_user("user7", "2026-03-01", "2026-03-01"),
+    }
+
+
+# Table references: ``FROM clients``, ``JOIN clients AS c``, ``, clients c``.
+_TABLE_REF = re.compile(r"(?:\bFROM|\bJOIN|,)\s+(\w+)(?:\s+(?:AS\s+)?(\w+))?", re.IGNORECASE)
+
+
+def table_names(sql: str, tables: set[str]) -> set[str]:
+    """``tables`` plus the aliases ``sql`` gives them; plans name a scan by its alias."""
+    names = set(tables)
+    for table, alias in _TABLE_REF.findall(sql):
+        if table in tables and alias:
+            names.add(alias)
+    return names
+
+
+def full_scans(plan: list[str], tables: set[str], sql: str = "") -> list[str]:
+    """Plan lines scanning a base table; scans of CTEs and subqueries are fine."""
+    names = table_names(sql, tables)
+    scans = []
+    for line in plan:
+        words = line.split()
+        # Older SQLite says ``SCAN TABLE clients AS c``, newer ``SCAN c``.
+        if words[:2] == ["SCAN", "TABLE"]:
+            del words[1]
+        if (
+            words[0] == "SCAN"
+            and len(words) > 1
+            and words[1] in names
+            and "USING INDEX" not in line
+            and "USING COVERING INDEX" not in line
+            and "VIRTUAL TABLE" not in line
+        ):
+            scans.append(line)
+    return scans
+
+
+def check() -> int:
+    conn = storage.get_conn()
+    tables = {row["name"] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+    captured: list[str] = []
+    conn.set_trace_callback(captured.append)
+    failures = 0
+    try:
+        for name, call in storage_calls().items():
+            captured.clear()
+            call()
+            statements = [sql for sql in captured if sql.lstrip().upper().startswith(PLANNED_PREFIXES)]
+            conn.set_trace_callback(None)
+            if not statements:
+                print(f"{name:<26} no statements")
+            for sql in statements:
+                plan = [row["detail"] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}")]
+                status = "FULL SCAN" if full_scans(plan, tables, sql) else "ok"
+                if status != "ok":
+                    failures += 1
+                print(f"{name:<26} {status}")
+                for line in plan:
+                    print(f"    {line}")
+            conn.set_trace_callback(captured.append)
+    finally:
+        conn.set_trace_callback(None)
+    return failures
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        storage.DB_PATH = Path(tmp) / "plans.db"
+        storage.init_db()
+        with slowlog.paused():
+            seed(args.rows)
+        failures = check()
+        storage.close_all()
+    if failures:
+        print(f"{failures} statement(s) scan a full table", file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,225 @@
+"""Seeded synthetic data for benchmarks.
+
+Fills a fresh database with the ``init_db`` schema with clients, pickup
+logs, catalog, planning and hours in the bot's four languages. The same
+``--rows`` and ``--seed`` always give the same data. It refuses to touch an
+existing file, so it cannot be pointed at the bot's own database::
+
+    python datagen.py /tmp/bench.db --rows 100000
+
+:func:`catalog_rows` and :func:`search_queries` make an in-memory catalog
+with many distinct names, for the trigram search.
+"""
+
+import argparse
+import datetime
+import random
+import string
+import sys
+from pathlib import Path
+from typing import Iterator
+
+import migrations
+import slowlog
+import storage
+
+FIRST_NAMES = (
+    # ru
+    "Алексей", "Мария", "Дмитрий", "Ольга", "Сергей", "Наталья",
+    # nl
+    "Jan", "Lotte", "Pieter", "Sanne", "Wouter", "Els",
+    # fr
+    "Jean", "Camille", "Luc", "Sophie", "Thierry", "Élodie",
+    # en
+    "James", "Emma", "Oliver", "Grace",
+)  # fmt: skip
+LAST_NAMES = (
+    "Иванов", "Смирнова", "Кузнецов", "Peeters", "Janssens", "Maes", "Jacobs", "Mertens",
+    "Willems", "Claes", "Dubois", "Lambert", "Dupont", "Martin", "Lefèvre", "Smith", "Brown",
+)  # fmt: skip
+COMPANY_SUFFIXES = ("", "", "", " BV", " NV", " SRL", " & Zonen", " ООО")
+CITIES = (
+    ("Antwerpen", "2000"), ("Lier", "2500"), ("Mechelen", "2800"), ("Gent", "9000"),
+    ("Brugge", "8000"), ("Leuven", "3000"), ("Hasselt", "3500"), ("Brussel", "1000"),
+    ("Liège", "4000"), ("Namur", "5000"), ("Charleroi", "6000"), ("Mons", "7000"),
+)  # fmt: skip
+PRODUCT_SORTS = (
+    "Keramiek", "Natuursteen", "Céramique", "Grès cérame", "Керамогранит", "Porcelain", "Terrazzo",
+)  # fmt: skip
+PRODUCT_NAMES = (
+    "Marmo Bianco", "Pietra Grigia", "Beton Antraciet", "Bois de chêne", "Ardoise noire",
+    "Травертин", "Оникс", "Calacatta", "Slate Grey", "Sahara Beige", "Vloertegel", "Wandtegel",
+)  # fmt: skip
+SIZES = ("30x60", "60x60", "60x120", "20x120", "80x80", "120x120", "10x20")
+MISSING_PRODUCTS = ("plinten", "voegmiddel", "lijm", "carreaux", "плитка", "profielen", "tiles")
+REMAINDERS = ("1 doos", "2 pallets", "3 boîtes", "половина паллеты", "plinten 4 m")
+PLANS = (
+    "levering 2 pallets", "ophalen stalen", "livraison showroom", "монтаж стенда",
+    "pick up samples", "inventaris", "laden vrachtwagen", "réception marchandises",
+)  # fmt: skip
+ROLES = ("OUTBOUND", "WAREHOUSE", "MANAGER", "BOSS")
+LANGS = ("ru", "nl", "fr", "en")
+
+START_DATE = datetime.date(2025, 1, 6)
+# Roughly one user per this many rows; each has a history of hours entries.
+ROWS_PER_USER = 100
+
+
+def random_date(rnd: random.Random, days: int = 730) -> str:
+    return (START_DATE + datetime.timedelta(days=rnd.randrange(days))).isoformat()
+
+
+def _person(rnd: random.Random) -> str:
+    return f"{rnd.choice(FIRST_NAMES)} {rnd.choice(LAST_NAMES)}"
+
+
+def _clients(rnd: random.Random, rows: int, users: list[str]) -> Iterator[tuple]:
+    for _ in range(rows):
+        city, postcode = rnd.choice(CITIES)
+        yield (
+            f"{rnd.choice(LAST_NAMES)}{rnd.choice(COMPANY_SUFFIXES)}",
+            f"{city} {postcode}",
+            rnd.choice(MISSING_PRODUCTS),
+            rnd.choice(REMAINDERS) if rnd.random() < 0.05 else "",
+            random_date(rnd),
+            rnd.choice(users),
+        )
+
+
+def _hours(rnd: random.Random, rows: int, user_ids: list[int]) -> Iterator[tuple]:
+    per_user = max(1, rows // len(user_ids))
+    for user_id in user_ids:
+        day = START_DATE
+        for _ in range(per_user):
+            start = rnd.choice(("07:00", "07:30", "08:00", "08:30"))
+            hours = rnd.choice((7.5, 8.0, 8.0, 8.5, 9.0, 10.0))
+            end_minutes = int(start[:2]) * 60 + int(start[3:]) + int(hours * 60) + 30
+            yield user_id, day.isoformat(), start, f"{end_minutes // 60:02d}:{end_minutes % 60:02d}", 30, hours
+            # Working days only.
+            day += datetime.timedelta(days=3 if day.weekday() == 4 else 1)
+
+
+def catalog_rows(items: int, seed: int = 1) -> list[tuple[str, str, str]]:
+    """``(sort, name, article)`` rows: three made-up words plus a size, unique articles."""
+    rnd = random.Random(seed)
+    vocab = [
+        "".join(rnd.choice("bcdfghklmnprstvz") + rnd.choice("aeiou") for _ in range(rnd.randint(2, 4)))
+        for _ in range(800)
+    ]
+    return [
+        (
+            rnd.choice(PRODUCT_SORTS),
+            " ".join(rnd.sample(vocab, 3)) + f" {rnd.choice(SIZES)}",
+            f"{rnd.choice(string.ascii_uppercase)}{rnd.choice(string.ascii_uppercase)}{number}",
+        )
+        for number in rnd.sample(range(10_000, 1_000_000), items)
+    ]
+
+
+def search_queries(rows: list[tuple[str, ...]], count: int, seed: int = 7) -> list[str]:
+    """Field values of ``rows`` with a typo and/or cut to their first words."""
+    rnd = random.Random(seed)
+    queries = []
+    for _ in range(count):
+        query = rnd.choice(rnd.choice(rows))
+        if rnd.random() < 0.5 and len(query) > 3:
+            at = rnd.randrange(len(query))
+            query = query[:at] + rnd.choice("aeioux") + query[at + 1 :]
+        if rnd.random() < 0.5:
+            query = " ".join(query.split()[: rnd.randint(1, 3)])
+        queries.append(query)
+    return queries
+
+
+def generate(rows: int, seed: int = 42) -> dict[str, int]:
+    """Create the schema in ``storage.DB_PATH`` and fill it; returns rows per table."""
+    rnd = random.Random(seed)
+    storage.init_db()
+    user_ids = list(range(1, max(10, rows // ROWS_PER_USER) + 1))
+    users = [(user_id, _person(rnd), rnd.choice(ROLES), rnd.choice(LANGS)) for user_id in user_ids]
+    names = [name for _, name, _, _ in users]
+    with slowlog.paused():
+        conn = storage.get_conn()
+        with conn:
+            # Like a bulk catalog import: no FTS triggers per row, one rebuild.
+            for table in migrations.SEARCH_COLUMNS:
+                for suffix in migrations.FTS_TRIGGER_SUFFIXES:
+                    conn.execute(f"DROP TRIGGER IF EXISTS {table}_fts_{suffix}")
+            conn.executemany("INSERT INTO users (user_id, name, role, lang) VALUES (?, ?, ?, ?)", users)
+            conn.executemany(
+                """
+                INSERT INTO clients (name, city, missing_product, remainder, date, responsible)
+                VALUES (?, ?, ?, ?, ?, ?)
+                """,
+                _clients(rnd, rows, names),
+            )
+            conn.executemany(
+                "INSERT INTO pickup_logs (client_id, date, action, remainder, responsible) VALUES (?, ?, ?, ?, ?)",
+                (
+                    (rnd.randint(1, rows), random_date(rnd), rnd.choice(("all", "left")), "", rnd.choice(names))
+                    for _ in range(rows // 2)
+                ),
+            )
+            conn.executemany(
+                "INSERT INTO products (sort, name, article) VALUES (?, ?, ?)",
+                (
+                    (rnd.choice(PRODUCT_SORTS), f"{rnd.choice(PRODUCT_NAMES)} {rnd.choice(SIZES)}", f"A{i:07d}")
+                    for i in range(rows)
+                ),
+            )
+            conn.executemany(
+                "INSERT INTO stands (stand_name, size, article, tiles_text) VALUES (?, ?, ?, ?)",
+                (
+                    (
+                        f"Stand {rnd.choice(PRODUCT_NAMES)}",
+                        rnd.choice(("1x2", "2x2", "1x1")),
+                        f"S{i:07d}",
+                        ", ".join(rnd.sample(PRODUCT_NAMES, 3)),
+                    )
+                    for i in range(rows)
+                ),
+            )
+            conn.executemany(
+                "INSERT INTO planning_outbound (date, client, city_index, plan_text) VALUES (?, ?, ?, ?)",
+                (
+                    (random_date(rnd), rnd.choice(LAST_NAMES), " ".join(rnd.choice(CITIES)), rnd.choice(PLANS))
+                    for _ in range(rows)
+                ),
+            )
+            conn.executemany(
+                "INSERT INTO planning_warehouse (date, shift_names, plan_text) VALUES (?, ?, ?)",
+                ((random_date(rnd), ", ".join(rnd.sample(names, 2)), rnd.choice(PLANS)) for _ in range(rows)),
+            )
+            conn.executemany(
+                """
+                INSERT INTO hours (user_id, date, start_time, end_time, break_minutes, hours)
+                VALUES (?, ?, ?, ?, ?, ?)
+                """,
+                _hours(rnd, rows, user_ids),
+            )
+            for table, columns in migrations.SEARCH_COLUMNS.items():
+                conn.execute(f"INSERT INTO {table}_fts({table}_fts) VALUES ('rebuild')")
+                for trigger in migrations.fts_triggers(table, columns):
+                    conn.execute(trigger)
+        storage.rebuild_hours_rollups()
+        conn.execute("ANALYZE")
+    tables = ("users", "clients", "pickup_logs", "products", "stands", "planning_outbound", "planning_warehouse")
+    return {table: conn.execute(f"SELECT count(*) FROM {table}").fetchone()[0] for table in (*tables, "hours")}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path", type=Path, help="database file to create")
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+    if args.path.exists():
+        sys.exit(f"{args.path} already exists; datagen only creates new databases")
+    storage.DB_PATH = args.path
+    for table, count in generate(args.rows, args.seed).items():
+        print(f"{table:<20} {count}")
+    storage.close_all()
+
+
+if __name__ == "__main__":
+    main()
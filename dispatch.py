@@ -0,0 +1,103 @@
+"""Handler registries for handle_text.
+
+Menu buttons are registered against translation keys. Pressing one is
+resolved by a single dict lookup in a reverse index built from
+``translations.TRANSLATIONS``, whatever the number of buttons.
+
+Multi-step conversations are ``Flow`` objects that own their states. A
+``FlowRegistry`` maps every state to its handler, so routing a message by
+``context.user_data["state"]`` is one lookup however many flows exist.
+
+Registered handlers are timed into :data:`metrics.handler_seconds`, labelled
+by state or by the button's translation key.
+"""
+
+import functools
+import time
+from typing import Any, Awaitable, Callable, Optional
+
+import metrics
+from translations import ReverseIndex, on_reload
+
+# (update, context, text, user, lang)
+Handler = Callable[[Any, Any, str, Any, str], Awaitable[None]]
+
+
+def timed(label: str, handler: Handler) -> Handler:
+    @functools.wraps(handler)
+    async def wrapper(*args: Any) -> None:
+        started = time.perf_counter()
+        try:
+            await handler(*args)
+        except Exception:
+            metrics.handler_errors.inc(label)
+            raise
+        finally:
+            metrics.handler_seconds.observe(label, time.perf_counter() - started)
+
+    return wrapper
+
+
+class ActionRegistry:
+    def __init__(self) -> None:
+        self._handlers: dict[str, Handler] = {}
+        self._index: Optional[ReverseIndex] = None
+        on_reload(self._reset)
+
+    def _reset(self) -> None:
+        self._index = None
+
+    def action(self, key: str) -> Callable[[Handler], Handler]:
+        """Register the decorated coroutine for the button ``t(lang, key)``."""
+
+        def decorator(handler: Handler) -> Handler:
+            if key in self._handlers:
+                raise ValueError(f"Action {key!r} is already registered")
+            self._handlers[key] = timed(key, handler)
+            self._reset()
+            return handler
+
+        return decorator
+
+    def resolve(self, lang: str, text: str) -> Optional[Handler]:
+        if self._index is None:
+            self._index = ReverseIndex(self._handlers)
+        key = self._index.lookup(lang, text)
+        return self._handlers.get(key) if key is not None else None
+
+
+class Flow:
+    def __init__(self, name: str, requires_user: bool = True) -> None:
+        self.name = name
+        self.requires_user = requires_user
+        self.handlers: dict[str, Handler] = {}
+
+    def state(self, *states: str) -> Callable[[Handler], Handler]:
+        """Register the decorated coroutine as the handler for ``states``."""
+
+        def decorator(handler: Handler) -> Handler:
+            for state in states:
+                if state in self.handlers:
+                    raise ValueError(f"State {state!r} is already handled in flow {self.name!r}")
+                self.handlers[state] = timed(state, handler)
+            return handler
+
+        return decorator
+
+
+class FlowRegistry:
+    def __init__(self) -> None:
+        self._routes: dict[str, tuple[Flow, Handler]] = {}
+
+    def add(self, *flows: Flow) -> None:
+        for flow in flows:
+            for state, handler in flow.handlers.items():
+                if state in self._routes:
+                    other = self._routes[state][0].name
+                    raise ValueError(f"State {state!r} is claimed by flows {other!r} and {flow.name!r}")
+                self._routes[state] = (flow, handler)
+
+    def resolve(self, state: Optional[str]) -> tuple[Optional[Flow], Optional[Handler]]:
+        if state is None:
+            return None, None
+        return self._routes.get(state, (None, None))
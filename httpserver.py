@@ -0,0 +1,166 @@
+"""Minimal asyncio HTTP/1.1 server for the webhook and service endpoints.
+
+Only what Telegram and a monitoring scraper need: fixed routes by method and
+path, ``Content-Length`` bodies, keep-alive. No chunked uploads, no TLS
+(terminate TLS in a reverse proxy). Idle keep-alive connections are closed
+after ``IDLE_TIMEOUT`` and a request must arrive in full within
+``REQUEST_TIMEOUT``, so slow clients cannot hold connections open.
+"""
+
+import asyncio
+import logging
+from typing import Awaitable, Callable, NamedTuple, Optional
+
+logger = logging.getLogger(__name__)
+
+MAX_BODY = 1 << 20
+MAX_HEADERS = 100
+IDLE_TIMEOUT = 30.0
+REQUEST_TIMEOUT = 10.0
+
+_REASONS = {
+    200: "OK",
+    400: "Bad Request",
+    403: "Forbidden",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    408: "Request Timeout",
+    413: "Payload Too Large",
+    500: "Internal Server Error",
+    503: "Service Unavailable",
+}
+
+
+class Request(NamedTuple):
+    method: str
+    path: str
+    query: str
+    headers: dict[str, str]
+    body: bytes
+
+
+class Response(NamedTuple):
+    status: int = 200
+    body: bytes = b""
+    content_type: str = "text/plain; charset=utf-8"
+
+
+RouteHandler = Callable[[Request], Awaitable[Response]]
+
+
+class HTTPServer:
+    def __init__(
+        self, host: str, port: int, idle_timeout: float = IDLE_TIMEOUT, request_timeout: float = REQUEST_TIMEOUT
+    ) -> None:
+        self.host = host
+        self.port = port
+        self.idle_timeout = idle_timeout
+        self.request_timeout = request_timeout
+        self._routes: dict[tuple[str, str], RouteHandler] = {}
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._connections: set[asyncio.Task] = set()
+
+    def route(self, method: str, path: str, handler: RouteHandler) -> None:
+        self._routes[(method.upper(), path)] = handler
+
+    @property
+    def sockets(self) -> list:
+        return list(self._server.sockets) if self._server else []
+
+    async def start(self) -> None:
+        self._server = await asyncio.start_server(self._serve, self.host, self.port)
+        logger.info("HTTP server listening on %s:%s", self.host, self.port)
+
+    async def stop(self) -> None:
+        if self._server is None:
+            return
+        self._server.close()
+        await self._server.wait_closed()
+        for task in list(self._connections):
+            task.cancel()
+        await asyncio.gather(*self._connections, return_exceptions=True)
+        self._server = None
+
+    async def _serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        task = asyncio.current_task()
+        self._connections.add(task)
+        try:
+            while True:
+                request = await self._read_request(reader)
+                if request is None:
+                    break
+                if isinstance(request, Response):
+                    await self._write(writer, request, keep_alive=False)
+                    break
+                response = await self._dispatch(request)
+                keep_alive = request.headers.get("connection", "").lower() != "close"
+                await self._write(writer, response, keep_alive)
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self._connections.discard(task)
+            writer.close()
+
+    async def _read_request(self, reader: asyncio.StreamReader):
+        """Return a Request, an error Response, or None on a closed or idle connection."""
+        line = b""
+        try:
+            line = await asyncio.wait_for(reader.readline(), self.idle_timeout)
+            if not line:
+                return None
+            return await asyncio.wait_for(self._read_rest(reader, line), self.request_timeout)
+        except asyncio.TimeoutError:
+            return Response(408, b"") if line else None
+        except ValueError:
+            # readline() past the stream reader's line limit.
+            return Response(400, b"line too long")
+
+    @staticmethod
+    async def _read_rest(reader: asyncio.StreamReader, line: bytes):
+        try:
+            method, target, _ = line.decode("latin-1").split(" ", 2)
+        except ValueError:
+            return Response(400, b"bad request line")
+        headers: dict[str, str] = {}
+        while True:
+            line = await reader.readline()
+            if line in (b"\r\n", b"\n", b""):
+                break
+            if len(headers) >= MAX_HEADERS:
+                return Response(400, b"too many headers")
+            name, _, value = line.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        length = headers.get("content-length", "0")
+        # int() alone would also take "-5", "+5" and "1_000".
+        if not length.isdigit():
+            return Response(400, b"bad content-length")
+        length = int(length)
+        if length > MAX_BODY:
+            return Response(413, b"")
+        body = await reader.readexactly(length) if length else b""
+        path, _, query = target.partition("?")
+        return Request(method.upper(), path, query, headers, body)
+
+    async def _dispatch(self, request: Request) -> Response:
+        handler = self._routes.get((request.method, request.path))
+        if handler is None:
+            known = any(path == request.path for _, path in self._routes)
+            return Response(405 if known else 404, b"")
+        try:
+            return await handler(request)
+        except Exception:
+            logger.exception("Error handling %s %s", request.method, request.path)
+            return Response(500, b"")
+
+    @staticmethod
+    async def _write(writer: asyncio.StreamWriter, response: Response, keep_alive: bool) -> None:
+        head = (
+            f"HTTP/1.1 {response.status} {_REASONS.get(response.status, 'Unknown')}\r\n"
+            f"Content-Type: {response.content_type}\r\n"
+            f"Content-Length: {len(response.body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+        )
+        writer.write(head.encode("latin-1") + response.body)
+        await writer.drain()
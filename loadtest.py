@@ -0,0 +1,204 @@
+"""End-to-end conversation load test without Telegram.
+
+Simulated users send their messages straight to ``bot.start`` and
+``bot.handle_text`` through fake updates; replies are collected in memory.
+Every user runs scripted flows (client add, pickup, hours, planning, admin
+performance) in a random order, one message at a time, all users at once.
+The database is a throwaway one filled by :mod:`datagen`::
+
+    python loadtest.py --users 50 --rounds 5 --rows 100000
+
+Reported are latency percentiles per conversation state (or menu action for
+messages outside a flow) and the overall throughput in updates/sec. Outbox
+pacing is disabled unless ``--paced`` is given, so the numbers are the bot's
+own work rather than Telegram's flood limits.
+"""
+
+import argparse
+import asyncio
+import datetime
+import logging
+import os
+import random
+import tempfile
+import time
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Any, Callable
+
+import datagen
+import storage
+from bench_storage import summarize
+from translations import LANGUAGES, t
+
+logger = logging.getLogger(__name__)
+
+# Keeps simulated users clear of the ids datagen hands out.
+USER_ID_BASE = 1_000_000_000
+
+
+class FakeMessage:
+    def __init__(self, text: str, replies: list[str]) -> None:
+        self.text = text
+        self.document = None
+        self._replies = replies
+
+    async def reply_text(self, text: str, reply_markup: Any = None, **kwargs: Any) -> None:
+        self._replies.append(text)
+
+    async def reply_document(self, document: Any, **kwargs: Any) -> None:
+        self._replies.append(f"<document {kwargs.get('filename', '')}>")
+
+    async def reply_photo(self, photo: Any, **kwargs: Any) -> SimpleNamespace:
+        self._replies.append("<photo>")
+        return SimpleNamespace(photo=[])
+
+    async def reply_media_group(self, media: list, **kwargs: Any) -> list:
+        self._replies.append(f"<{len(media)} photos>")
+        return []
+
+
+class FakeUpdate:
+    def __init__(self, user_id: int, text: str, replies: list[str]) -> None:
+        self.message = FakeMessage(text, replies)
+        self.effective_user = SimpleNamespace(id=user_id)
+        self.effective_chat = SimpleNamespace(id=user_id)
+        self.callback_query = None
+
+
+class FakeContext:
+    def __init__(self) -> None:
+        self.user_data: dict = {}
+        self.chat_data: dict = {}
+
+
+def flow_scripts(lang: str, rnd: random.Random, clients: int, staff: list[str]) -> dict[str, list[str]]:
+    """The messages one user sends for each flow, as button texts in ``lang``."""
+    today = datetime.date.today().strftime("%d.%m.%Y")
+    city, postcode = rnd.choice(datagen.CITIES)
+    return {
+        "client_add": [
+            t(lang, "menu_clients"),
+            t(lang, "clients_menu_add"),
+            rnd.choice(datagen.LAST_NAMES),
+            f"{city} {postcode}",
+            rnd.choice(datagen.MISSING_PRODUCTS),
+            t(lang, "clients_remainder_enter"),
+            rnd.choice(datagen.REMAINDERS),
+            today,
+            t(lang, "confirm_save"),
+        ],
+        "pickup": [
+            t(lang, "menu_pickup"),
+            t(lang, "clients_menu_list_pickup"),
+            " ".join(str(rnd.randint(1, clients)) for _ in range(rnd.randint(1, 3))),
+            t(lang, "pickup_left"),
+            rnd.choice(datagen.REMAINDERS),
+            today,
+        ],
+        "hours": [t(lang, "menu_hours"), today, "08:00", "16:30", t(lang, "hours_break_yes")],
+        "planning": [t(lang, "menu_planning"), t(lang, "planning_outbound"), t(lang, "period_week")],
+        "admin_performance": [
+            t(lang, "menu_admin"),
+            t(lang, "admin_performance"),
+            rnd.choice(staff),
+            t(lang, "period_month"),
+        ],
+    }
+
+
+class LoadTest:
+    def __init__(self, bot: Any) -> None:
+        self.bot = bot
+        self.timings: dict[str, list[float]] = {}
+        self.updates = 0
+        self.replies = 0
+        self.errors = 0
+        self.unknown = 0
+        self.elapsed = 0.0
+
+    def label(self, context: FakeContext, lang: str, text: str) -> str:
+        state = context.user_data.get("state")
+        if state:
+            return state
+        handler = self.bot.actions.resolve(lang, text)
+        return handler.__name__ if handler else "unrouted"
+
+    async def send(
+        self, handler: Callable, label: str, user_id: int, lang: str, context: FakeContext, text: str
+    ) -> None:
+        replies: list[str] = []
+        started = time.perf_counter()
+        try:
+            await handler(FakeUpdate(user_id, text, replies), context)
+        except Exception:
+            self.errors += 1
+            logger.exception("Handler failed in %s on %r", label, text)
+        self.timings.setdefault(label, []).append(time.perf_counter() - started)
+        self.updates += 1
+        self.replies += len(replies)
+        # A scripted step the bot did not understand means the script is stale.
+        self.unknown += replies.count(t(lang, "unknown"))
+
+    async def run_user(self, index: int, rounds: int, seed: int, clients: int, staff: list[str]) -> None:
+        rnd = random.Random(seed + index)
+        user_id = USER_ID_BASE + index
+        lang = LANGUAGES[index % len(LANGUAGES)]
+        context = FakeContext()
+        await self.send(self.bot.start, "start", user_id, lang, context, "/start")
+        for _ in range(rounds):
+            scripts = list(flow_scripts(lang, rnd, clients, staff).values())
+            rnd.shuffle(scripts)
+            for script in scripts:
+                for text in script:
+                    label = self.label(context, lang, text)
+                    await self.send(self.bot.handle_text, label, user_id, lang, context, text)
+
+
+async def run(bot: Any, args: argparse.Namespace, clients: int) -> LoadTest:
+    staff = [row["name"] for row in storage.get_conn().execute("SELECT name FROM users LIMIT 100")]
+    for index in range(args.users):
+        storage.upsert_user(USER_ID_BASE + index, f"Load {index}", bot.ROLE_BOSS, LANGUAGES[index % len(LANGUAGES)])
+    test = LoadTest(bot)
+    started = time.perf_counter()
+    await asyncio.gather(
+        *(test.run_user(index, args.rounds, args.seed, clients, staff) for index in range(args.users))
+    )
+    test.elapsed = time.perf_counter() - started
+    return test
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--rounds", type=int, default=3, help="times each user runs every flow")
+    parser.add_argument("--rows", type=int, default=10_000, help="datagen rows in the throwaway database")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--paced", action="store_true", help="keep the outbox's Telegram rate limits")
+    args = parser.parse_args()
+
+    if not args.paced:
+        for name in ("OUTBOX_GLOBAL_RATE", "OUTBOX_CHAT_RATE", "OUTBOX_CHAT_BURST"):
+            os.environ[name] = "1e9"
+    # Imported late: the outbox reads its rate limits at import time.
+    import async_storage
+    import bot
+
+    with tempfile.TemporaryDirectory() as tmp:
+        storage.DB_PATH = Path(tmp) / "load.db"
+        clients = datagen.generate(args.rows, args.seed)["clients"]
+        test = asyncio.run(run(bot, args, clients))
+        async_storage.shutdown()
+        storage.close_all()
+
+    for label, samples in sorted(test.timings.items()):
+        print(summarize(label, samples))
+    print(
+        f"{test.updates} updates from {args.users} users in {test.elapsed:.2f}s: "
+        f"{test.updates / test.elapsed:.0f} updates/s, {test.replies} replies, "
+        f"{test.errors} errors, {test.unknown} not understood"
+    )
+
+
+if __name__ == "__main__":
+    main()
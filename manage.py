@@ -0,0 +1,74 @@
+"""Maintenance commands for the bot database.
+
+    python manage.py migrate
+    python manage.py rebuild-search
+    python manage.py rebuild-rollups
+    python manage.py import-catalog products products.csv
+    python manage.py import-photos products photos/
+"""
+
+import argparse
+import logging
+import re
+from pathlib import Path
+from typing import Iterator
+
+import catalog_import
+import storage
+
+
+PHOTO_SUFFIXES = {".jpg", ".jpeg", ".png", ".webp"}
+# "A00012.jpg", "A00012_2.jpg" -> "A00012"
+_PHOTO_INDEX = re.compile(r"_\d+$")
+
+
+def photo_article(stem: str, articles: set[str]) -> str:
+    """The article a photo file stem names; ``AB_2`` stays whole when it is an article."""
+    return stem if stem in articles else _PHOTO_INDEX.sub("", stem)
+
+
+def photo_files(paths: list[Path], articles: set[str]) -> Iterator[tuple[str, str]]:
+    """Yield ``(article, absolute path)`` for photo files, named by article."""
+    for path in paths:
+        files = sorted(path.iterdir()) if path.is_dir() else [path]
+        for file in files:
+            if file.suffix.lower() in PHOTO_SUFFIXES:
+                yield photo_article(file.stem, articles), str(file.resolve())
+
+
+def main() -> None:
+    logging.basicConfig(level=logging.INFO)
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("migrate", help="apply pending schema migrations")
+    sub.add_parser("rebuild-search", help="rebuild full-text search indexes from base tables")
+    sub.add_parser("rebuild-rollups", help="recompute daily and weekly hours rollups from raw entries")
+    import_parser = sub.add_parser("import-catalog", help="upsert products or stands by article from CSV/XLSX")
+    import_parser.add_argument("table", choices=sorted(storage.CATALOG_FIELDS))
+    import_parser.add_argument("path", type=Path)
+    photos_parser = sub.add_parser("import-photos", help="attach photo files named <article>[_N].jpg to catalog items")
+    photos_parser.add_argument("table", choices=sorted(storage.CATALOG_FIELDS))
+    photos_parser.add_argument("paths", type=Path, nargs="+", help="photo files or directories")
+    args = parser.parse_args()
+
+    version = storage.init_db()
+    if args.command == "migrate":
+        print(f"Schema version {version}")
+    elif args.command == "rebuild-search":
+        storage.rebuild_search_indexes()
+        print("Search indexes rebuilt")
+    elif args.command == "rebuild-rollups":
+        storage.rebuild_hours_rollups()
+        print("Hours rollups rebuilt")
+    elif args.command == "import-catalog":
+        counts = catalog_import.import_file(args.path, args.table)
+        print(f"Inserted {counts.inserted}, updated {counts.updated}, skipped {counts.skipped}")
+    elif args.command == "import-photos":
+        articles = {row["article"] for row in storage.list_catalog_items(args.table)}
+        added, unknown = storage.add_photos(args.table, photo_files(args.paths, articles))
+        print(f"Added {added} photo(s), {unknown} with unknown article")
+    storage.close_all()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+"""In-process metrics rendered in the Prometheus text format.
+
+Histograms and counters carry one label each and are safe to update from
+the database threads. Values that already live elsewhere (outbox and cache
+statistics) are read at scrape time through collector callbacks.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Iterator, TypeVar, Union
+
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# A plain value, or values by label value.
+Sample = Union[float, dict[str, float]]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, label: str, buckets: tuple[float, ...] = DEFAULT_BUCKETS) -> None:
+        self.name = name
+        self.help = help
+        self.label = label
+        self.buckets = buckets
+        # label value -> [bucket counts..., total count, sum]
+        self._series: dict[str, list[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, label: str, seconds: float) -> None:
+        with self._lock:
+            series = self._series.get(label)
+            if series is None:
+                series = self._series[label] = [0] * (len(self.buckets) + 1) + [0.0]
+            for index, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    series[index] += 1
+                    break
+            series[-2] += 1
+            series[-1] += seconds
+
+    @contextmanager
+    def time(self, label: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(label, time.perf_counter() - started)
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = {label: list(values) for label, values in self._series.items()}
+        for label, values in sorted(series.items()):
+            tag = f'{self.label}="{_escape(label)}"'
+            cumulative = 0
+            for bound, count in zip(self.buckets, values):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{tag},le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_bucket{{{tag},le="+Inf"}} {values[-2]}')
+            lines.append(f"{self.name}_sum{{{tag}}} {values[-1]:.6f}")
+            lines.append(f"{self.name}_count{{{tag}}} {values[-2]}")
+        return lines
+
+
+class Counter:
+    def __init__(self, name: str, help: str, label: str) -> None:
+        self.name = name
+        self.help = help
+        self.label = label
+        self._values: dict[str, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, label: str, amount: float = 1) -> None:
+        with self._lock:
+            self._values[label] = self._values.get(label, 0) + amount
+
+    def render(self) -> list[str]:
+        with self._lock:
+            values = dict(self._values)
+        return _render_sample(self.name, self.help, "counter", self.label, values)
+
+
+class Collector:
+    """A metric read from ``func`` at scrape time."""
+
+    def __init__(self, name: str, help: str, kind: str, func: Callable[[], Sample], label: str = "") -> None:
+        self.name = name
+        self.help = help
+        self.kind = kind
+        self.func = func
+        self.label = label
+
+    def render(self) -> list[str]:
+        return _render_sample(self.name, self.help, self.kind, self.label, self.func())
+
+
+def _render_sample(name: str, help: str, kind: str, label: str, sample: Sample) -> list[str]:
+    lines = [f"# HELP {name} {help}", f"# TYPE {name} {kind}"]
+    if isinstance(sample, dict):
+        for value_label, value in sorted(sample.items()):
+            lines.append(f'{name}{{{label}="{_escape(value_label)}"}} {_format(value)}')
+    else:
+        lines.append(f"{name} {_format(sample)}")
+    return lines
+
+
+Metric = TypeVar("Metric", Histogram, Counter, Collector)
+
+
+class Registry:
+    def __init__(self) -> None:
+        self._metrics: dict[str, Union[Histogram, Counter, Collector]] = {}
+
+    def _add(self, metric: Metric) -> Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name!r} is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def histogram(self, name: str, help: str, label: str) -> Histogram:
+        return self._add(Histogram(name, help, label))
+
+    def counter(self, name: str, help: str, label: str) -> Counter:
+        return self._add(Counter(name, help, label))
+
+    def collector(self, name: str, help: str, kind: str, func: Callable[[], Sample], label: str = "") -> Collector:
+        return self._add(Collector(name, help, kind, func, label))
+
+    def render(self) -> str:
+        lines: list[str] = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+handler_seconds = registry.histogram(
+    "bot_handler_seconds", "Time spent in a conversation state or menu action handler.", "handler"
+)
+handler_errors = registry.counter(
+    "bot_handler_errors_total", "Handler calls that raised, by state or menu action.", "handler"
+)
+errors = registry.counter("bot_errors_total", "Errors while processing updates, by source.", "source")
+storage_seconds = registry.histogram(
+    "bot_storage_call_seconds", "Storage calls from handlers, including the wait for a database thread.", "function"
+)
+sql_seconds = registry.histogram(
+    "bot_sql_statement_seconds", "SQLite statement execution up to the first row, by statement.", "statement"
+)
@@ -0,0 +1,299 @@
+"""Schema migrations keyed on ``PRAGMA user_version``.
+
+``MIGRATIONS[n]`` upgrades a database from version ``n`` to ``n + 1``. A step
+is either an SQL script or a callable taking the connection; each one runs in
+its own transaction together with the ``user_version`` bump, so a failed step
+leaves the database at the previous version. Append new steps, never edit or
+reorder applied ones.
+"""
+
+import logging
+import sqlite3
+from typing import Callable, Union
+
+logger = logging.getLogger(__name__)
+
+Step = Union[str, Callable[[sqlite3.Connection], None]]
+
+
+class SchemaTooNewError(RuntimeError):
+    pass
+
+
+BASELINE = """
+CREATE TABLE IF NOT EXISTS users (
+    user_id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    role TEXT NOT NULL,
+    lang TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS clients (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL,
+    city TEXT NOT NULL,
+    missing_product TEXT NOT NULL,
+    remainder TEXT,
+    date TEXT NOT NULL,
+    responsible TEXT NOT NULL,
+    ready_lier_date TEXT,
+    ready_lier_by TEXT,
+    processed_datetime TEXT,
+    processed_by TEXT
+);
+CREATE TABLE IF NOT EXISTS pickup_logs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    client_id INTEGER NOT NULL,
+    date TEXT NOT NULL,
+    action TEXT NOT NULL,
+    remainder TEXT,
+    responsible TEXT NOT NULL,
+    FOREIGN KEY (client_id) REFERENCES clients(id)
+);
+CREATE TABLE IF NOT EXISTS products (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    sort TEXT NOT NULL,
+    name TEXT NOT NULL,
+    article TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS stands (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    stand_name TEXT NOT NULL,
+    size TEXT NOT NULL,
+    article TEXT NOT NULL,
+    tiles_text TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS planning_outbound (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    date TEXT NOT NULL,
+    client TEXT NOT NULL,
+    city_index TEXT NOT NULL,
+    plan_text TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS planning_warehouse (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    date TEXT NOT NULL,
+    shift_names TEXT NOT NULL,
+    plan_text TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS hours (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id INTEGER NOT NULL,
+    date TEXT NOT NULL,
+    start_time TEXT NOT NULL,
+    end_time TEXT NOT NULL,
+    break_minutes INTEGER NOT NULL,
+    hours REAL NOT NULL,
+    FOREIGN KEY (user_id) REFERENCES users(user_id)
+);
+"""
+
+INDEXES = """
+CREATE INDEX IF NOT EXISTS idx_users_name ON users(name);
+CREATE INDEX IF NOT EXISTS idx_hours_user_date ON hours(user_id, date, hours);
+CREATE INDEX IF NOT EXISTS idx_pickup_logs_client ON pickup_logs(client_id);
+CREATE INDEX IF NOT EXISTS idx_clients_pickup ON clients(id)
+    WHERE remainder IS NOT NULL AND trim(remainder) != '';
+CREATE INDEX IF NOT EXISTS idx_planning_outbound_date ON planning_outbound(date);
+CREATE INDEX IF NOT EXISTS idx_planning_warehouse_date ON planning_warehouse(date);
+"""
+
+
+def fts_triggers(table: str, columns: list[str]) -> list[str]:
+    """Triggers keeping ``{table}_fts`` in sync with ``table``, one statement each."""
+    cols = ", ".join(columns)
+    new_values = ", ".join(f"new.{col}" for col in columns)
+    old_values = ", ".join(f"old.{col}" for col in columns)
+    return [
+        f"""CREATE TRIGGER IF NOT EXISTS {table}_fts_ai AFTER INSERT ON {table} BEGIN
+    INSERT INTO {table}_fts(rowid, {cols}) VALUES (new.id, {new_values});
+END""",
+        f"""CREATE TRIGGER IF NOT EXISTS {table}_fts_ad AFTER DELETE ON {table} BEGIN
+    INSERT INTO {table}_fts({table}_fts, rowid, {cols}) VALUES ('delete', old.id, {old_values});
+END""",
+        f"""CREATE TRIGGER IF NOT EXISTS {table}_fts_au AFTER UPDATE OF {cols} ON {table} BEGIN
+    INSERT INTO {table}_fts({table}_fts, rowid, {cols}) VALUES ('delete', old.id, {old_values});
+    INSERT INTO {table}_fts(rowid, {cols}) VALUES (new.id, {new_values});
+END""",
+    ]
+
+
+FTS_TRIGGER_SUFFIXES = ("ai", "ad", "au")
+
+
+def _fts_table(table: str, columns: list[str]) -> str:
+    """External-content trigram FTS5 table for ``table`` plus sync triggers."""
+    triggers = "".join(f"{trigger};\n" for trigger in fts_triggers(table, columns))
+    return f"""
+CREATE VIRTUAL TABLE IF NOT EXISTS {table}_fts USING fts5(
+    {", ".join(columns)}, content='{table}', content_rowid='id', tokenize='trigram'
+);
+{triggers}INSERT INTO {table}_fts({table}_fts) VALUES ('rebuild');
+"""
+
+
+SEARCH_COLUMNS = {
+    "clients": ["name", "city"],
+    "products": ["sort", "name", "article"],
+    "stands": ["stand_name", "size", "article", "tiles_text"],
+}
+
+FULL_TEXT_SEARCH = "".join(_fts_table(table, columns) for table, columns in SEARCH_COLUMNS.items())
+
+CATALOG_CHANGES = """
+CREATE TABLE IF NOT EXISTS catalog_changes (
+    seq INTEGER PRIMARY KEY AUTOINCREMENT,
+    table_name TEXT NOT NULL,
+    item_id INTEGER NOT NULL
+);
+""" + "".join(
+    f"""
+CREATE TRIGGER IF NOT EXISTS {table}_changes_ai AFTER INSERT ON {table} BEGIN
+    INSERT INTO catalog_changes (table_name, item_id) VALUES ('{table}', new.id);
+END;
+CREATE TRIGGER IF NOT EXISTS {table}_changes_au AFTER UPDATE ON {table} BEGIN
+    INSERT INTO catalog_changes (table_name, item_id) VALUES ('{table}', new.id);
+END;
+CREATE TRIGGER IF NOT EXISTS {table}_changes_ad AFTER DELETE ON {table} BEGIN
+    INSERT INTO catalog_changes (table_name, item_id) VALUES ('{table}', old.id);
+END;
+"""
+    for table in ("products", "stands")
+)
+
+CONVERSATION_DATA = """
+CREATE TABLE IF NOT EXISTS conversation_data (
+    kind TEXT NOT NULL,
+    key INTEGER NOT NULL,
+    data TEXT NOT NULL,
+    updated_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (kind, key)
+) WITHOUT ROWID;
+"""
+
+# Overtime: hours over DAILY_HOURS_LIMIT in a day, plus the remaining
+# (non-overtime) hours over WEEKLY_HOURS_LIMIT in an ISO week.
+DAILY_HOURS_LIMIT = 8
+WEEKLY_HOURS_LIMIT = 40
+
+REBUILD_HOURS_ROLLUPS = f"""
+DELETE FROM hours_daily;
+DELETE FROM hours_weekly;
+INSERT INTO hours_daily (user_id, date, hours, overtime)
+SELECT user_id, date, SUM(hours), MAX(SUM(hours) - {DAILY_HOURS_LIMIT}, 0)
+FROM hours
+GROUP BY user_id, date;
+INSERT INTO hours_weekly (user_id, week_start, hours, overtime, weekly_overtime)
+SELECT
+    user_id,
+    week_start,
+    SUM(hours),
+    SUM(overtime) + MAX(SUM(hours) - SUM(overtime) - {WEEKLY_HOURS_LIMIT}, 0),
+    MAX(SUM(hours) - SUM(overtime) - {WEEKLY_HOURS_LIMIT}, 0)
+FROM (
+    SELECT *, date(date, '-' || ((CAST(strftime('%w', date) AS INTEGER) + 6) % 7) || ' days') AS week_start
+    FROM hours_daily
+)
+GROUP BY user_id, week_start;
+"""
+
+HOURS_ROLLUPS = (
+    """
+CREATE TABLE IF NOT EXISTS hours_daily (
+    user_id INTEGER NOT NULL,
+    date TEXT NOT NULL,
+    hours REAL NOT NULL,
+    overtime REAL NOT NULL,
+    PRIMARY KEY (user_id, date)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS hours_weekly (
+    user_id INTEGER NOT NULL,
+    week_start TEXT NOT NULL,
+    hours REAL NOT NULL,
+    overtime REAL NOT NULL,
+    weekly_overtime REAL NOT NULL,
+    PRIMARY KEY (user_id, week_start)
+) WITHOUT ROWID;
+"""
+    + REBUILD_HOURS_ROLLUPS
+)
+
+ROLLUP_DATE_INDEXES = """
+CREATE INDEX IF NOT EXISTS idx_hours_daily_date ON hours_daily(date, hours, overtime);
+CREATE INDEX IF NOT EXISTS idx_hours_weekly_week ON hours_weekly(week_start, weekly_overtime);
+"""
+
+# Imports upsert catalog items by article; blank articles are allowed and
+# never conflict.
+CATALOG_ARTICLES = """
+CREATE UNIQUE INDEX IF NOT EXISTS idx_products_article ON products(article) WHERE article != '';
+CREATE UNIQUE INDEX IF NOT EXISTS idx_stands_article ON stands(article) WHERE article != '';
+"""
+
+PHOTOS = """
+CREATE TABLE IF NOT EXISTS photos (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    item_table TEXT NOT NULL CHECK (item_table IN ('products', 'stands')),
+    item_id INTEGER NOT NULL,
+    path TEXT,
+    file_id TEXT,
+    position INTEGER NOT NULL DEFAULT 0,
+    CHECK (path IS NOT NULL OR file_id IS NOT NULL)
+);
+CREATE INDEX IF NOT EXISTS idx_photos_item ON photos(item_table, item_id, position);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_photos_path ON photos(path) WHERE path IS NOT NULL;
+""" + "".join(
+    f"""
+CREATE TRIGGER IF NOT EXISTS {table}_photos_ad AFTER DELETE ON {table} BEGIN
+    DELETE FROM photos WHERE item_table = '{table}' AND item_id = old.id;
+END;
+"""
+    for table in ("products", "stands")
+)
+
+MIGRATIONS: list[Step] = [
+    BASELINE,
+    INDEXES,
+    FULL_TEXT_SEARCH,
+    CATALOG_CHANGES,
+    CONVERSATION_DATA,
+    HOURS_ROLLUPS,
+    ROLLUP_DATE_INDEXES,
+    CATALOG_ARTICLES,
+    PHOTOS,
+]
+
+LATEST_VERSION = len(MIGRATIONS)
+
+
+def current_version(conn: sqlite3.Connection) -> int:
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def _apply(conn: sqlite3.Connection, version: int, step: Step) -> None:
+    if conn.in_transaction:
+        conn.commit()
+    try:
+        if isinstance(step, str):
+            conn.executescript(f"BEGIN;\n{step}\nPRAGMA user_version = {version};\nCOMMIT;")
+        else:
+            conn.execute("BEGIN")
+            step(conn)
+            conn.execute(f"PRAGMA user_version = {version}")
+            conn.commit()
+    except Exception:
+        if conn.in_transaction:
+            conn.rollback()
+        raise
+
+
+def migrate(conn: sqlite3.Connection) -> int:
+    """Bring the schema up to ``LATEST_VERSION`` and return the version."""
+    version = current_version(conn)
+    if version > LATEST_VERSION:
+        raise SchemaTooNewError(
+            f"Database schema version {version} is newer than this code supports ({LATEST_VERSION})"
+        )
+    for number in range(version + 1, LATEST_VERSION + 1):
+        logger.info("Applying schema migration %s", number)
+        _apply(conn, number, MIGRATIONS[number - 1])
+    return LATEST_VERSION
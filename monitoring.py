@@ -0,0 +1,106 @@
+"""Service endpoints: ``/metrics`` for Prometheus and ``/healthz``.
+
+Served on their own port, separate from the webhook, so they can stay on
+localhost or a private network::
+
+    curl http://127.0.0.1:9100/metrics
+    curl -i http://127.0.0.1:9100/healthz
+
+``/healthz`` runs ``SELECT 1`` through the database thread pool and answers
+503 when that takes longer than ``HEALTHZ_MAX_DB_MS``, i.e. when the pool or
+the database is stuck.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import time
+from typing import Optional
+
+import async_storage
+import metrics
+import storage
+from httpserver import HTTPServer, Request, Response
+from outbox import outbox
+
+logger = logging.getLogger(__name__)
+
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+# Empty disables the endpoints.
+METRICS_PORT = os.getenv("METRICS_PORT", "9100")
+HEALTHZ_MAX_DB_MS = float(os.getenv("HEALTHZ_MAX_DB_MS", "500"))
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+_OUTBOX_COUNTERS = ("sent", "retries", "failed")
+
+
+def _outbox_latency() -> dict[str, float]:
+    stats = outbox.stats()
+    return {"0.5": stats["latency_p50"], "0.95": stats["latency_p95"]}
+
+
+metrics.registry.collector(
+    "bot_outbox_calls_total",
+    "Telegram API calls made by the outbox, by outcome.",
+    "counter",
+    lambda: {name: getattr(outbox, name) for name in _OUTBOX_COUNTERS},
+    "outcome",
+)
+metrics.registry.collector(
+    "bot_outbox_queue_depth", "API calls waiting in the outbox.", "gauge", lambda: outbox.queue_depth
+)
+metrics.registry.collector(
+    "bot_outbox_latency_seconds",
+    "Outbox queueing plus send time over the last 1000 calls.",
+    "gauge",
+    _outbox_latency,
+    "quantile",
+)
+metrics.registry.collector(
+    "bot_user_cache_lookups_total",
+    "User profile cache lookups, by result.",
+    "counter",
+    lambda: {name: storage.user_cache.stats()[name] for name in ("hits", "misses")},
+    "result",
+)
+metrics.registry.collector(
+    "bot_user_cache_size", "Profiles held in the user cache.", "gauge", lambda: storage.user_cache.stats()["size"]
+)
+
+
+def _ping() -> None:
+    storage.get_conn().execute("SELECT 1").fetchone()
+
+
+async def metrics_handler(request: Request) -> Response:
+    return Response(200, metrics.registry.render().encode(), PROMETHEUS_CONTENT_TYPE)
+
+
+async def healthz_handler(request: Request) -> Response:
+    started = time.perf_counter()
+    try:
+        await asyncio.wait_for(async_storage.run_sync(_ping), HEALTHZ_MAX_DB_MS / 1000)
+    except asyncio.TimeoutError:
+        status, db = 503, "timeout"
+    except Exception as exc:
+        logger.warning("Health check failed: %s", exc)
+        status, db = 503, "error"
+    else:
+        status, db = 200, "ok"
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    body = {"status": "ok" if status == 200 else "unavailable", "db": db, "db_ms": round(elapsed_ms, 2)}
+    return Response(status, json.dumps(body).encode(), "application/json")
+
+
+def build_server(host: str = METRICS_HOST, port: Optional[int] = None) -> Optional[HTTPServer]:
+    """The metrics server, or None when ``METRICS_PORT`` is empty."""
+    if port is None:
+        if not METRICS_PORT:
+            return None
+        port = int(METRICS_PORT)
+    server = HTTPServer(host, port)
+    server.route("GET", "/metrics", metrics_handler)
+    server.route("GET", "/healthz", healthz_handler)
+    return server
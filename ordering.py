@@ -0,0 +1,71 @@
+"""Concurrent update processing that keeps each user's updates in order.
+
+Updates from different users run in parallel, but one user's updates are
+handled strictly one after another, so multi-step flows in ``user_data``
+never see their steps interleaved.
+"""
+
+import asyncio
+import os
+from typing import Any, Awaitable, Hashable, Optional
+
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+UPDATE_CONCURRENCY = int(os.getenv("UPDATE_CONCURRENCY", "32"))
+UPDATE_BACKLOG = int(os.getenv("UPDATE_BACKLOG", "1024"))
+
+
+def ordering_key(update: object) -> Optional[Hashable]:
+    if not isinstance(update, Update):
+        return None
+    if update.effective_user is not None:
+        return ("user", update.effective_user.id)
+    if update.effective_chat is not None:
+        return ("chat", update.effective_chat.id)
+    return None
+
+
+class PerUserUpdateProcessor(BaseUpdateProcessor):
+    """Run at most ``concurrency`` handlers at once, one per user at a time.
+
+    The base class semaphore is acquired before :meth:`do_process_update`,
+    so an update waiting for its user's lock would hold a slot there. It is
+    therefore sized as the backlog of accepted updates, and the actual
+    concurrency limit is applied only once the user's lock is held; one busy
+    user can never occupy every slot.
+    """
+
+    def __init__(self, concurrency: int = UPDATE_CONCURRENCY, backlog: int = UPDATE_BACKLOG) -> None:
+        super().__init__(max(concurrency, backlog))
+        self.concurrency = concurrency
+        self._running = asyncio.BoundedSemaphore(concurrency)
+        # key -> (lock, number of updates holding or waiting for it)
+        self._locks: dict[Hashable, tuple[asyncio.Lock, int]] = {}
+
+    async def do_process_update(self, update: object, coroutine: Awaitable[Any]) -> None:
+        key = ordering_key(update)
+        if key is None:
+            async with self._running:
+                await coroutine
+            return
+        lock, users = self._locks.get(key, (None, 0))
+        if lock is None:
+            lock = asyncio.Lock()
+        self._locks[key] = (lock, users + 1)
+        try:
+            async with lock:
+                async with self._running:
+                    await coroutine
+        finally:
+            lock, users = self._locks[key]
+            if users == 1:
+                del self._locks[key]
+            else:
+                self._locks[key] = (lock, users - 1)
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        pass
@@ -0,0 +1,194 @@
+"""Outbound message pipeline.
+
+Every reply goes through :class:`Outbox`, which
+
+* splits text longer than Telegram's 4096-character limit at row (line)
+  boundaries,
+* sends one chat's messages strictly in order, one at a time,
+* paces sends with token buckets for the global and per-chat flood limits,
+* retries on ``RetryAfter`` (waiting as told) and on network errors (with
+  exponential backoff).
+"""
+
+import asyncio
+import functools
+import logging
+import os
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Optional
+
+from telegram.error import NetworkError, RetryAfter
+
+logger = logging.getLogger(__name__)
+
+MESSAGE_LIMIT = 4096
+
+OUTBOX_GLOBAL_RATE = float(os.getenv("OUTBOX_GLOBAL_RATE", "30"))
+OUTBOX_CHAT_RATE = float(os.getenv("OUTBOX_CHAT_RATE", "1"))
+OUTBOX_CHAT_BURST = float(os.getenv("OUTBOX_CHAT_BURST", "5"))
+OUTBOX_MAX_RETRIES = int(os.getenv("OUTBOX_MAX_RETRIES", "3"))
+
+# Send one chunk; the reply markup is attached to the last chunk only.
+SendFunc = Callable[[str, Optional[Any]], Awaitable[Any]]
+
+
+def split_message(text: str, limit: int = MESSAGE_LIMIT) -> list[str]:
+    """Split ``text`` into chunks of at most ``limit`` characters.
+
+    Lines are kept whole where possible; a single line longer than the limit
+    is cut into limit-sized pieces.
+    """
+    if len(text) <= limit:
+        return [text]
+    chunks: list[str] = []
+    current = ""
+    for line in text.split("\n"):
+        while len(line) > limit:
+            if current:
+                chunks.append(current)
+                current = ""
+            chunks.append(line[:limit])
+            line = line[limit:]
+        candidate = f"{current}\n{line}" if current else line
+        if len(candidate) > limit:
+            chunks.append(current)
+            current = line
+        else:
+            current = candidate
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+class TokenBucket:
+    def __init__(self, rate: float, capacity: float) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    @property
+    def full(self) -> bool:
+        self._refill()
+        return self._tokens >= self.capacity
+
+    async def acquire(self) -> None:
+        while True:
+            self._refill()
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return
+            await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class _ChatQueue:
+    def __init__(self) -> None:
+        # asyncio.Lock wakes waiters in FIFO order, which keeps chunks and
+        # replies of one chat in submission order.
+        self.lock = asyncio.Lock()
+        self.bucket = TokenBucket(OUTBOX_CHAT_RATE, OUTBOX_CHAT_BURST)
+        self.depth = 0
+
+
+class Outbox:
+    def __init__(self) -> None:
+        self._global = TokenBucket(OUTBOX_GLOBAL_RATE, OUTBOX_GLOBAL_RATE)
+        self._chats: dict[int, _ChatQueue] = {}
+        self._latencies: deque[float] = deque(maxlen=1000)
+        self.sent = 0
+        self.retries = 0
+        self.failed = 0
+
+    @property
+    def queue_depth(self) -> int:
+        return sum(chat.depth for chat in self._chats.values())
+
+    def _chat(self, chat_id: int) -> _ChatQueue:
+        chat = self._chats.get(chat_id)
+        if chat is None:
+            if len(self._chats) > 1000:
+                self._prune()
+            chat = self._chats[chat_id] = _ChatQueue()
+        return chat
+
+    def _prune(self) -> None:
+        for chat_id, chat in list(self._chats.items()):
+            if chat.depth == 0 and chat.bucket.full:
+                del self._chats[chat_id]
+
+    async def send(self, chat_id: int, send: SendFunc, text: str, reply_markup: Optional[Any] = None) -> None:
+        chunks = split_message(text)
+        last = len(chunks) - 1
+        calls = [
+            functools.partial(send, chunk, reply_markup if index == last else None)
+            for index, chunk in enumerate(chunks)
+        ]
+        await self.submit(chat_id, *calls)
+
+    async def submit(self, chat_id: int, *calls: Callable[[], Awaitable[Any]]) -> None:
+        """Run API calls for ``chat_id`` in order, paced and retried like text.
+
+        Each call must be safe to repeat, e.g. reopen a file it uploads.
+        """
+        pending = len(calls)
+        chat = self._chat(chat_id)
+        chat.depth += pending
+        queued = time.monotonic()
+        try:
+            async with chat.lock:
+                for call in calls:
+                    await chat.bucket.acquire()
+                    await self._global.acquire()
+                    await self._call_with_retry(call)
+                    pending -= 1
+                    chat.depth -= 1
+                    self._latencies.append(time.monotonic() - queued)
+        finally:
+            # Calls left over after a failed one are dropped.
+            chat.depth -= pending
+
+    async def _call_with_retry(self, call: Callable[[], Awaitable[Any]]) -> None:
+        for attempt in range(OUTBOX_MAX_RETRIES + 1):
+            try:
+                await call()
+                self.sent += 1
+                return
+            except RetryAfter as exc:
+                if attempt == OUTBOX_MAX_RETRIES:
+                    self.failed += 1
+                    raise
+                self.retries += 1
+                delay = exc.retry_after
+                delay = delay.total_seconds() if hasattr(delay, "total_seconds") else float(delay)
+                logger.warning("Flood limit hit, retrying in %.1fs", delay)
+                await asyncio.sleep(delay)
+            except NetworkError:
+                if attempt == OUTBOX_MAX_RETRIES:
+                    self.failed += 1
+                    raise
+                self.retries += 1
+                await asyncio.sleep(0.5 * 2**attempt)
+
+    def stats(self) -> dict[str, float]:
+        latencies = sorted(self._latencies)
+
+        def pct(value: float) -> float:
+            return latencies[min(len(latencies) - 1, int(value * len(latencies)))] if latencies else 0.0
+
+        return {
+            "queue_depth": self.queue_depth,
+            "sent": self.sent,
+            "retries": self.retries,
+            "failed": self.failed,
+            "latency_p50": pct(0.50),
+            "latency_p95": pct(0.95),
+        }
+
+
+outbox = Outbox()
@@ -0,0 +1,161 @@
+"""Keep ``user_data`` and ``chat_data`` in the bot's SQLite database.
+
+Flow state survives restarts and deploys. Nothing is loaded on startup: a
+user's or chat's data is read the first time an update for it arrives
+(``refresh_*_data`` is called before every handler). Writes are
+write-behind: the application hands over the data it touched every
+``PERSISTENCE_INTERVAL`` seconds, unchanged entries are skipped, and the
+rest goes to the database as one batch.
+
+Values are stored as JSON; sets (e.g. ``client_candidates``) are tagged so
+they come back as sets.
+"""
+
+import asyncio
+import json
+import logging
+import os
+from typing import Any, Optional
+
+from telegram.ext import BasePersistence, PersistenceInput
+
+import async_storage
+
+logger = logging.getLogger(__name__)
+
+PERSISTENCE_INTERVAL = float(os.getenv("PERSISTENCE_INTERVAL", "5"))
+
+_SET_TAG = "__set__"
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, (set, frozenset)):
+        return {_SET_TAG: list(value)}
+    raise TypeError(f"Cannot persist {type(value).__name__}")
+
+
+def _object_hook(obj: dict) -> Any:
+    if len(obj) == 1 and _SET_TAG in obj:
+        return set(obj[_SET_TAG])
+    return obj
+
+
+def dumps(data: dict) -> str:
+    return json.dumps(data, default=_default, ensure_ascii=False)
+
+
+def loads(raw: str) -> dict:
+    return json.loads(raw, object_hook=_object_hook)
+
+
+class SQLitePersistence(BasePersistence):
+    def __init__(self, update_interval: float = PERSISTENCE_INTERVAL) -> None:
+        super().__init__(
+            store_data=PersistenceInput(bot_data=False, callback_data=False),
+            update_interval=update_interval,
+        )
+        self._loaded: set[tuple[str, int]] = set()
+        # Last JSON written for each entry, to skip unchanged data.
+        self._saved: dict[tuple[str, int], str] = {}
+        self._dirty: dict[tuple[str, int], str] = {}
+        self._write_task: Optional[asyncio.Task] = None
+        self._write_lock = asyncio.Lock()
+
+    async def _restore(self, kind: str, key: int, data: dict) -> None:
+        ident = (kind, key)
+        if ident in self._loaded:
+            return
+        raw = await async_storage.load_conversation_data(kind, key)
+        if ident in self._loaded:
+            return
+        self._loaded.add(ident)
+        if raw is None:
+            return
+        self._saved[ident] = raw
+        for name, value in loads(raw).items():
+            data.setdefault(name, value)
+
+    def _mark(self, kind: str, key: int, data: dict) -> None:
+        ident = (kind, key)
+        if ident not in self._loaded:
+            # Never restored, so writing would clobber the stored state.
+            return
+        raw = dumps(data)
+        if self._saved.get(ident) == raw:
+            self._dirty.pop(ident, None)
+            return
+        self._dirty[ident] = raw
+        # The application updates all touched entries at once; the write
+        # task runs after them and stores the whole batch.
+        if self._write_task is None or self._write_task.done():
+            self._write_task = asyncio.create_task(self._write_dirty())
+
+    async def _write_dirty(self) -> None:
+        async with self._write_lock:
+            batch, self._dirty = self._dirty, {}
+            if not batch:
+                return
+            try:
+                await async_storage.save_conversation_data([(kind, key, raw) for (kind, key), raw in batch.items()])
+            except Exception:
+                logger.exception("Failed to persist %s conversation entries", len(batch))
+                for ident, raw in batch.items():
+                    self._dirty.setdefault(ident, raw)
+                return
+            self._saved.update(batch)
+
+    async def _drop(self, kind: str, key: int) -> None:
+        ident = (kind, key)
+        self._dirty.pop(ident, None)
+        self._saved.pop(ident, None)
+        await async_storage.delete_conversation_data(kind, key)
+
+    async def get_user_data(self) -> dict[int, dict]:
+        return {}
+
+    async def get_chat_data(self) -> dict[int, dict]:
+        return {}
+
+    async def get_bot_data(self) -> dict:
+        return {}
+
+    async def get_callback_data(self) -> None:
+        return None
+
+    async def get_conversations(self, name: str) -> dict:
+        return {}
+
+    async def update_conversation(self, name: str, key: tuple, new_state: Optional[object]) -> None:
+        pass
+
+    async def update_user_data(self, user_id: int, data: dict) -> None:
+        self._mark("user", user_id, data)
+
+    async def update_chat_data(self, chat_id: int, data: dict) -> None:
+        self._mark("chat", chat_id, data)
+
+    async def update_bot_data(self, data: dict) -> None:
+        pass
+
+    async def update_callback_data(self, data: object) -> None:
+        pass
+
+    async def drop_user_data(self, user_id: int) -> None:
+        await self._drop("user", user_id)
+
+    async def drop_chat_data(self, chat_id: int) -> None:
+        await self._drop("chat", chat_id)
+
+    async def refresh_user_data(self, user_id: int, user_data: dict) -> None:
+        await self._restore("user", user_id, user_data)
+
+    async def refresh_chat_data(self, chat_id: int, chat_data: dict) -> None:
+        await self._restore("chat", chat_id, chat_data)
+
+    async def refresh_bot_data(self, bot_data: dict) -> None:
+        pass
+
+    async def flush(self) -> None:
+        if self._write_task is not None:
+            await self._write_task
+        await self._write_dirty()
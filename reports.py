@@ -0,0 +1,28 @@
+"""Team performance report exported as CSV."""
+
+import csv
+import os
+import tempfile
+from pathlib import Path
+
+import storage
+
+TEAM_REPORT_COLUMNS = ("user_id", "name", "role", "hours", "days", "overtime")
+
+
+def write_team_report_csv(start: str, end: str) -> Path:
+    """Stream the team report for ``start``..``end`` into a temporary CSV file.
+
+    Rows go from the cursor to the file one at a time. Blocking; the caller
+    deletes the file when done.
+    """
+    fd, name = tempfile.mkstemp(prefix=f"team-report-{start}-{end}-", suffix=".csv")
+    # utf-8-sig so Excel detects the encoding of Cyrillic names.
+    with os.fdopen(fd, "w", newline="", encoding="utf-8-sig") as handle:
+        writer = csv.writer(handle)
+        writer.writerow(TEAM_REPORT_COLUMNS)
+        for row in storage.iter_team_hours(start, end):
+            writer.writerow(
+                (row["user_id"], row["name"], row["role"], f"{row['hours']:.2f}", row["days"], f"{row['overtime']:.2f}")
+            )
+    return Path(name)
@@ -0,0 +1,239 @@
+"""In-memory trigram similarity search for "похожие варианты".
+
+``TrigramIndex`` is an inverted index from trigrams to entries. Each entry is
+one text field of one item; an item's score is the best Jaccard similarity of
+any of its fields against the query (the same measure as PostgreSQL's
+``pg_trgm``). Posting lists are split by text size and walked from the
+rarest query trigram up. Of the ``n`` query trigrams the index knows, a text
+of ``|B|`` trigrams first reached at list ``p`` shares at most
+``s = min(n - p, |B|)``, so scores at most ``s / (|Q| + |B| - s)``; buckets
+whose bound is below the current k-th best score are skipped, which also
+drops every size outside ``[t·|Q|, |Q|/t]``. The walk stops once no bucket
+can qualify, or after ``MAX_CANDIDATES`` distinct texts. The rarest
+trigrams come first, so the cap mostly leaves out texts sharing only common
+trigrams with the query; past it the result is best effort, not exact.
+
+``CatalogIndex`` keeps one ``TrigramIndex`` per catalog table in sync with
+SQLite through the ``catalog_changes`` log filled by triggers.
+"""
+
+import heapq
+import re
+import threading
+from itertools import islice
+from operator import itemgetter
+from typing import Hashable, Iterable, Optional
+
+import storage
+
+_NON_WORD = re.compile(r"[\W_]+")
+
+# Distinct texts scored per search at most; keeps lookups well under a
+# millisecond on catalogs of tens of thousands of items. Best effort: the
+# best match usually shares the rare trigrams walked first and is scored
+# before the cap, but a match built only from common trigrams can be missed.
+MAX_CANDIDATES = 300
+
+
+def trigrams(text: str) -> frozenset[str]:
+    grams = set()
+    for word in _NON_WORD.sub(" ", text.casefold()).split():
+        padded = f"  {word} "
+        grams.update(padded[i : i + 3] for i in range(len(padded) - 2))
+    return frozenset(grams)
+
+
+class TrigramIndex:
+    """Trigram postings over distinct field texts, each mapped to its keys.
+
+    Low-cardinality fields (``sort``, ``size``) repeat the same text across
+    thousands of items; storing each distinct text once keeps those posting
+    lists short.
+    """
+
+    def __init__(self, threshold: float = 0.3, max_candidates: int = MAX_CANDIDATES) -> None:
+        self.threshold = threshold
+        self.max_candidates = max_candidates
+        # trigram -> text size -> text ids
+        self._postings: dict[str, dict[int, set[int]]] = {}
+        # trigram -> number of texts containing it
+        self._frequency: dict[str, int] = {}
+        self._text_ids: dict[frozenset[str], int] = {}
+        self._texts: dict[int, tuple[frozenset[str], set[Hashable]]] = {}
+        # text id -> its keys, largest first; filled lazily by search
+        self._ranked: dict[int, list[Hashable]] = {}
+        self._by_key: dict[Hashable, set[int]] = {}
+        self._next_text = 0
+
+    def __len__(self) -> int:
+        return len(self._by_key)
+
+    def add(self, key: Hashable, texts: Iterable[Optional[str]]) -> None:
+        self.remove(key)
+        text_ids = set()
+        for text in texts:
+            grams = trigrams(text or "")
+            if not grams:
+                continue
+            text_id = self._text_ids.get(grams)
+            if text_id is None:
+                text_id = self._next_text
+                self._next_text += 1
+                self._text_ids[grams] = text_id
+                self._texts[text_id] = (grams, set())
+                for gram in grams:
+                    self._postings.setdefault(gram, {}).setdefault(len(grams), set()).add(text_id)
+                    self._frequency[gram] = self._frequency.get(gram, 0) + 1
+            self._texts[text_id][1].add(key)
+            self._ranked.pop(text_id, None)
+            text_ids.add(text_id)
+        if text_ids:
+            self._by_key[key] = text_ids
+
+    def remove(self, key: Hashable) -> None:
+        for text_id in self._by_key.pop(key, ()):
+            grams, keys = self._texts[text_id]
+            keys.discard(key)
+            self._ranked.pop(text_id, None)
+            if keys:
+                continue
+            del self._texts[text_id]
+            del self._text_ids[grams]
+            for gram in grams:
+                buckets = self._postings[gram]
+                bucket = buckets[len(grams)]
+                bucket.discard(text_id)
+                if not bucket:
+                    del buckets[len(grams)]
+                if not buckets:
+                    del self._postings[gram]
+                self._frequency[gram] -= 1
+                if not self._frequency[gram]:
+                    del self._frequency[gram]
+
+    def _keys(self, text_id: int) -> list[Hashable]:
+        ranked = self._ranked.get(text_id)
+        if ranked is None:
+            ranked = self._ranked[text_id] = sorted(self._texts[text_id][1], reverse=True)
+        return ranked
+
+    def _kth_score(self, scores: dict[int, float], limit: int) -> float:
+        """Lower bound for the ``limit``-th best distinct key's score."""
+        keys: set[Hashable] = set()
+        top = heapq.nlargest(limit, scores.items(), key=itemgetter(1))
+        for text_id, _ in top:
+            keys.update(islice(self._texts[text_id][1], limit))
+        if len(keys) >= limit:
+            return top[-1][1]
+        return 0.0
+
+    def search(self, query: str, limit: int = 5) -> list[tuple[float, Hashable]]:
+        """Return up to ``limit`` ``(score, key)`` pairs, best first.
+
+        Ties go to the larger key, i.e. the newest row.
+        """
+        grams = trigrams(query)
+        if not grams:
+            return []
+        size = len(grams)
+        frequency = self._frequency
+        # Trigrams no text has cannot be shared, so they never widen the bound.
+        rarest = sorted((gram for gram in grams if gram in frequency), key=frequency.__getitem__)
+        texts = self._texts
+        threshold = self.threshold
+        scores: dict[int, float] = {}
+        seen: set[int] = set()
+        floor = threshold
+        for position, gram in enumerate(rarest):
+            # Texts first reached from here share at most ``remaining`` trigrams.
+            remaining = len(rarest) - position
+            if remaining / size < floor or len(seen) >= self.max_candidates:
+                break
+            scored = len(scores)
+            for text_size, ids in self._postings[gram].items():
+                shared = min(remaining, text_size)
+                if shared / (size + text_size - shared) < floor:
+                    continue
+                fresh = ids - seen
+                budget = self.max_candidates - len(seen)
+                if len(fresh) > budget:
+                    fresh = set(islice(fresh, budget))
+                seen |= fresh
+                for text_id in fresh:
+                    shared = len(grams & texts[text_id][0])
+                    score = shared / (size + text_size - shared)
+                    if score >= threshold:
+                        scores[text_id] = score
+                if len(seen) >= self.max_candidates:
+                    break
+            if len(scores) > scored:
+                floor = max(floor, self._kth_score(scores, limit))
+
+        results: list[tuple[float, Hashable]] = []
+        found: set[Hashable] = set()
+        for text_id in sorted(scores, key=scores.__getitem__, reverse=True):
+            for key in self._keys(text_id):
+                if key in found:
+                    continue
+                found.add(key)
+                results.append((scores[text_id], key))
+                if len(results) >= limit:
+                    return results
+        return results
+
+
+class CatalogIndex:
+    """Trigram indexes over ``products`` and ``stands``, kept in sync by seq."""
+
+    def __init__(self, threshold: float = 0.3) -> None:
+        self._threshold = threshold
+        self._indexes = {table: TrigramIndex(threshold) for table in storage.CATALOG_FIELDS}
+        self._last_seq = 0
+        self._lock = threading.Lock()
+
+    def load(self) -> None:
+        """Build both indexes from scratch; blocking, call from a DB thread."""
+        last_seq = storage.catalog_change_seq()
+        indexes = {}
+        for table, fields in storage.CATALOG_FIELDS.items():
+            index = TrigramIndex(self._threshold)
+            for row in storage.list_catalog_items(table):
+                index.add(row["id"], (row[field] for field in fields))
+            indexes[table] = index
+        with self._lock:
+            self._indexes = indexes
+            self._last_seq = last_seq
+        storage.prune_catalog_changes(last_seq)
+
+    def sync(self) -> None:
+        """Apply catalog changes logged since the last load or sync, then drop them from the log."""
+        changes, last_seq = storage.catalog_changes_since(self._last_seq)
+        if not changes:
+            return
+        fetched = {table: storage.list_catalog_items(table, ids) for table, ids in changes.items()}
+        with self._lock:
+            if last_seq <= self._last_seq:
+                return
+            for table, ids in changes.items():
+                for item_id in ids:
+                    self._indexes[table].remove(item_id)
+                for row in fetched[table]:
+                    self._indexes[table].add(row["id"], (row[field] for field in storage.CATALOG_FIELDS[table]))
+            self._last_seq = last_seq
+        storage.prune_catalog_changes(last_seq)
+
+    def similar(self, table: str, query: str, limit: int = 5) -> list[int]:
+        with self._lock:
+            return [item_id for _, item_id in self._indexes[table].search(query, limit)]
+
+
+catalog_index = CatalogIndex()
+
+
+def similar_items(table: str, query: str, limit: int = 5) -> list:
+    """Sync the shared index and return the best matching rows, best first."""
+    catalog_index.sync()
+    ids = catalog_index.similar(table, query, limit)
+    rank = {item_id: position for position, item_id in enumerate(ids)}
+    rows = storage.list_catalog_items(table, ids)
+    return sorted(rows, key=lambda row: rank[row["id"]])
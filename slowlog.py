@@ -0,0 +1,170 @@
+"""Slow-query log.
+
+Storage connections report every statement slower than ``SLOW_QUERY_MS``
+here. Each one is logged with its normalized SQL, the types of its bound
+parameters (never the values) and its duration; the first time a statement
+is slow its ``EXPLAIN QUERY PLAN`` is captured and logged too (scripts run
+by ``executescript`` are logged without one). Recent entries are kept in
+memory for the admin panel's top-N view.
+"""
+
+import logging
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Callable, Iterator, NamedTuple, Optional
+
+logger = logging.getLogger(__name__)
+
+# 0 disables the log.
+SLOW_QUERY_MS = float(os.getenv("SLOW_QUERY_MS", "100"))
+SLOW_QUERY_WINDOW = float(os.getenv("SLOW_QUERY_WINDOW", "3600"))
+SLOW_QUERY_KEEP = int(os.getenv("SLOW_QUERY_KEEP", "1000"))
+SLOW_QUERY_TOP = int(os.getenv("SLOW_QUERY_TOP", "10"))
+MAX_PLANS = 1024
+SQL_PREVIEW = 500
+
+# Seconds; compared against every statement's duration.
+threshold = SLOW_QUERY_MS / 1000 if SLOW_QUERY_MS > 0 else float("inf")
+
+# (params) -> EXPLAIN QUERY PLAN rows as (id, parent, notused, detail)
+Explain = Callable[[Any], list[tuple]]
+
+
+class SlowQuery(NamedTuple):
+    at: float
+    statement: str
+    shapes: str
+    seconds: float
+
+
+class SlowStatement(NamedTuple):
+    statement: str
+    count: int
+    max_seconds: float
+    total_seconds: float
+    # Parameter shapes of the slowest run.
+    shapes: str
+    plan: list[str]
+
+
+_entries: deque[SlowQuery] = deque(maxlen=SLOW_QUERY_KEEP)
+_plans: dict[str, list[str]] = {}
+_lock = threading.Lock()
+
+
+def _shape(value: Any) -> str:
+    if value is None:
+        return "null"
+    if isinstance(value, (str, bytes)):
+        return f"{type(value).__name__}({len(value)})"
+    return type(value).__name__
+
+
+def param_shapes(params: Any, many: bool = False) -> str:
+    if many:
+        if isinstance(params, (list, tuple)):
+            first = param_shapes(params[0]) if params else "()"
+            return f"{len(params)} × {first}"
+        return "many"
+    if not params:
+        return "()"
+    if isinstance(params, dict):
+        return "{" + ", ".join(f"{name}: {_shape(value)}" for name, value in params.items()) + "}"
+    return "(" + ", ".join(_shape(value) for value in params) + ")"
+
+
+def format_plan(rows: list[tuple]) -> list[str]:
+    """Indent plan rows by depth, like the sqlite3 shell."""
+    depth: dict[int, int] = {}
+    lines = []
+    for node_id, parent, _, detail in rows:
+        depth[node_id] = depth.get(parent, -1) + 1
+        lines.append("  " * depth[node_id] + detail)
+    return lines
+
+
+def _capture_plan(params: Any, many: bool, explain: Optional[Explain]) -> list[str]:
+    if explain is None:
+        return ["(script, no plan)"]
+    if many:
+        # A generator of rows is already consumed; only a list gives a sample.
+        if not isinstance(params, (list, tuple)) or not params:
+            return ["(plan unavailable)"]
+        params = params[0]
+    try:
+        return format_plan(explain(params)) or ["(no plan)"]
+    except Exception as exc:
+        return [f"(EXPLAIN failed: {exc})"]
+
+
+def record(statement: str, params: Any, seconds: float, explain: Optional[Explain], many: bool = False) -> None:
+    shapes = param_shapes(params, many)
+    with _lock:
+        plan = _plans.get(statement)
+    new_plan = plan is None
+    if new_plan:
+        plan = _capture_plan(params, many, explain)
+        with _lock:
+            if len(_plans) >= MAX_PLANS:
+                _plans.clear()
+            _plans[statement] = plan
+    with _lock:
+        _entries.append(SlowQuery(time.time(), statement, shapes, seconds))
+    if new_plan:
+        logger.warning("Slow query %.1fms params=%s: %s\n%s", seconds * 1000, shapes, statement, "\n".join(plan))
+    else:
+        logger.warning("Slow query %.1fms params=%s: %s", seconds * 1000, shapes, statement)
+
+
+@contextmanager
+def paused() -> Iterator[None]:
+    """Silence the log process-wide, e.g. around an offline bulk load."""
+    global threshold
+    saved, threshold = threshold, float("inf")
+    try:
+        yield
+    finally:
+        threshold = saved
+
+
+def top(limit: int = SLOW_QUERY_TOP, window: float = SLOW_QUERY_WINDOW) -> list[SlowStatement]:
+    """The ``limit`` statements with the slowest runs in the last ``window`` seconds."""
+    since = time.time() - window
+    with _lock:
+        entries = [entry for entry in _entries if entry.at >= since]
+        plans = dict(_plans)
+    grouped: dict[str, list[SlowQuery]] = {}
+    for entry in entries:
+        grouped.setdefault(entry.statement, []).append(entry)
+    statements = []
+    for statement, runs in grouped.items():
+        slowest = max(runs, key=lambda run: run.seconds)
+        statements.append(
+            SlowStatement(
+                statement,
+                len(runs),
+                slowest.seconds,
+                sum(run.seconds for run in runs),
+                slowest.shapes,
+                plans.get(statement, []),
+            )
+        )
+    statements.sort(key=lambda item: item.max_seconds, reverse=True)
+    return statements[:limit]
+
+
+def format_statement(index: int, item: SlowStatement) -> str:
+    statement = item.statement
+    if len(statement) > SQL_PREVIEW:
+        statement = statement[:SQL_PREVIEW] + "…"
+    lines = [
+        f"{index}. {item.max_seconds * 1000:.1f} ms max, {item.count}×, "
+        f"avg {item.total_seconds / item.count * 1000:.1f} ms",
+        statement,
+        f"params: {item.shapes}",
+        *item.plan,
+    ]
+    return "\n".join(lines)
@@ -1,95 +1,222 @@
+import datetime
+import functools
+import json
+import os
 import sqlite3
+import threading
+import time
+from collections import Counter
 from pathlib import Path
-from typing import Iterable, Optional
+from typing import Any, Callable, Iterable, Iterator, NamedTuple, Optional
+
+import metrics
+import migrations
+import slowlog
+from cache import MISSING, TTLCache
 
 DB_PATH = Path(__file__).resolve().parent / "data" / "bot.db"
 
+DB_SYNCHRONOUS = os.getenv("DB_SYNCHRONOUS", "NORMAL")
+DB_CACHE_SIZE = int(os.getenv("DB_CACHE_SIZE", "-16000"))
+DB_MMAP_SIZE = int(os.getenv("DB_MMAP_SIZE", str(64 * 1024 * 1024)))
+DB_BUSY_TIMEOUT_MS = int(os.getenv("DB_BUSY_TIMEOUT_MS", "5000"))
+DB_STATEMENT_CACHE = int(os.getenv("DB_STATEMENT_CACHE", "256"))
+PAGE_SIZE = int(os.getenv("PAGE_SIZE", "10"))
+USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "1024"))
+USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", "300"))
+
+_local = threading.local()
+_connections: list[sqlite3.Connection] = []
+_connections_lock = threading.Lock()
+_generation = 0
+
+# Profiles are read on every message but change rarely; writers below
+# invalidate their entry after committing.
+user_cache = TTLCache(USER_CACHE_SIZE, USER_CACHE_TTL)
+
+
+@functools.lru_cache(maxsize=1024)
+def _statement_label(sql: str) -> str:
+    return " ".join(sql.split())
+
+
+class _TimedConnection(sqlite3.Connection):
+    """Times statements into :data:`metrics.sql_seconds` and the slow-query log.
+
+    Only the execute call is measured: SQLite produces the first row there,
+    while the rest of a SELECT is stepped by the caller's fetches.
+    """
+
+    def execute(self, sql: str, *args: Any) -> sqlite3.Cursor:
+        started = time.perf_counter()
+        try:
+            return super().execute(sql, *args)
+        finally:
+            self._observe(sql, args[0] if args else (), time.perf_counter() - started)
+
+    def executemany(self, sql: str, *args: Any) -> sqlite3.Cursor:
+        started = time.perf_counter()
+        try:
+            return super().executemany(sql, *args)
+        finally:
+            self._observe(sql, args[0] if args else (), time.perf_counter() - started, many=True)
+
+    def executescript(self, script: str) -> sqlite3.Cursor:
+        started = time.perf_counter()
+        try:
+            return super().executescript(script)
+        finally:
+            seconds = time.perf_counter() - started
+            metrics.sql_seconds.observe("<script>", seconds)
+            if seconds >= slowlog.threshold:
+                # A script is several statements; EXPLAIN takes one.
+                slowlog.record(_statement_label(script), (), seconds, None)
+
+    def _observe(self, sql: str, params: Any, seconds: float, many: bool = False) -> None:
+        statement = _statement_label(sql)
+        metrics.sql_seconds.observe(statement, seconds)
+        if seconds >= slowlog.threshold:
+            slowlog.record(statement, params, seconds, functools.partial(self._explain, sql), many)
+
+    def _explain(self, sql: str, params: Any) -> list[tuple]:
+        # Untimed, so a slow plan lookup is not logged in turn.
+        return [tuple(row) for row in sqlite3.Connection.execute(self, f"EXPLAIN QUERY PLAN {sql}", params)]
+
+
+def _connect(path: Path) -> sqlite3.Connection:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(
+        path,
+        timeout=DB_BUSY_TIMEOUT_MS / 1000,
+        cached_statements=DB_STATEMENT_CACHE,
+        check_same_thread=False,
+        factory=_TimedConnection,
+    )
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode = WAL")
+    conn.execute(f"PRAGMA synchronous = {DB_SYNCHRONOUS}")
+    conn.execute(f"PRAGMA cache_size = {DB_CACHE_SIZE}")
+    conn.execute(f"PRAGMA mmap_size = {DB_MMAP_SIZE}")
+    conn.execute(f"PRAGMA busy_timeout = {DB_BUSY_TIMEOUT_MS}")
+    return conn
+
 
 def get_conn() -> sqlite3.Connection:
-    DB_PATH.parent.mkdir(parents=True, exist_ok=True)
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
+    """Return this thread's long-lived connection, opening it on first use.
+
+    Callers keep using ``with get_conn() as conn`` for a transaction scope;
+    the block commits or rolls back but leaves the connection open.
+    """
+    conn = getattr(_local, "conn", None)
+    if conn is not None and _local.key == (_generation, DB_PATH):
+        return conn
+    conn = _connect(DB_PATH)
+    with _connections_lock:
+        _connections.append(conn)
+        _local.key = (_generation, DB_PATH)
+    _local.conn = conn
     return conn
 
 
-def init_db() -> None:
+def close_all() -> None:
+    """Close every pooled connection; threads reconnect lazily afterwards."""
+    global _generation
+    with _connections_lock:
+        for conn in _connections:
+            conn.close()
+        _connections.clear()
+        _generation += 1
+    user_cache.clear()
+
+
+def init_db() -> int:
+    """Apply pending schema migrations; call once at startup."""
+    return migrations.migrate(get_conn())
+
+
+# The trigram tokenizer needs at least three characters to match anything.
+# Shorter queries find nothing: a substring LIKE would scan the whole table.
+FTS_MIN_QUERY = 3
+
+# bm25() column weights, in migrations.SEARCH_COLUMNS order.
+SEARCH_WEIGHTS = {
+    "clients": (2.0, 1.0),
+    "products": (1.0, 2.0, 3.0),
+    "stands": (2.0, 1.0, 3.0, 1.0),
+}
+
+
+def _fts_phrase(query: str) -> str:
+    return '"' + query.replace('"', '""') + '"'
+
+
+class Page(NamedTuple):
+    rows: list[sqlite3.Row]
+    # Pass back as ``after`` to fetch the following page; None on the last.
+    next_cursor: Optional[list]
+
+
+def _page(rows: list[sqlite3.Row], limit: int, cursor_of: Callable[[sqlite3.Row], list]) -> Page:
+    if len(rows) > limit:
+        return Page(rows[:limit], cursor_of(rows[limit - 1]))
+    return Page(rows, None)
+
+
+def _search(table: str, query: str, after: Optional[list], limit: int) -> Page:
+    """One page of matches, keyset-paginated on (bm25 score, id DESC)."""
+    if len(query) < FTS_MIN_QUERY:
+        return Page([], None)
     with get_conn() as conn:
-        conn.executescript(
-            """
-            CREATE TABLE IF NOT EXISTS users (
-                user_id INTEGER PRIMARY KEY,
-                name TEXT NOT NULL,
-                role TEXT NOT NULL,
-                lang TEXT NOT NULL
-            );
-            CREATE TABLE IF NOT EXISTS clients (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                name TEXT NOT NULL,
-                city TEXT NOT NULL,
-                missing_product TEXT NOT NULL,
-                remainder TEXT,
-                date TEXT NOT NULL,
-                responsible TEXT NOT NULL,
-                ready_lier_date TEXT,
-                ready_lier_by TEXT,
-                processed_datetime TEXT,
-                processed_by TEXT
-            );
-            CREATE TABLE IF NOT EXISTS pickup_logs (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                client_id INTEGER NOT NULL,
-                date TEXT NOT NULL,
-                action TEXT NOT NULL,
-                remainder TEXT,
-                responsible TEXT NOT NULL,
-                FOREIGN KEY (client_id) REFERENCES clients(id)
-            );
-            CREATE TABLE IF NOT EXISTS products (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                sort TEXT NOT NULL,
-                name TEXT NOT NULL,
-                article TEXT NOT NULL
-            );
-            CREATE TABLE IF NOT EXISTS stands (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                stand_name TEXT NOT NULL,
-                size TEXT NOT NULL,
-                article TEXT NOT NULL,
-                tiles_text TEXT NOT NULL
-            );
-            CREATE TABLE IF NOT EXISTS planning_outbound (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                date TEXT NOT NULL,
-                client TEXT NOT NULL,
-                city_index TEXT NOT NULL,
-                plan_text TEXT NOT NULL
-            );
-            CREATE TABLE IF NOT EXISTS planning_warehouse (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                date TEXT NOT NULL,
-                shift_names TEXT NOT NULL,
-                plan_text TEXT NOT NULL
-            );
-            CREATE TABLE IF NOT EXISTS hours (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER NOT NULL,
-                date TEXT NOT NULL,
-                start_time TEXT NOT NULL,
-                end_time TEXT NOT NULL,
-                break_minutes INTEGER NOT NULL,
-                hours REAL NOT NULL,
-                FOREIGN KEY (user_id) REFERENCES users(user_id)
-            );
-            """
-        )
+        weights = ", ".join(str(w) for w in SEARCH_WEIGHTS[table])
+        keyset = ""
+        params = [_fts_phrase(query)]
+        if after is not None:
+            keyset = "WHERE score > ? OR (score = ? AND id < ?)"
+            params += [after[0], after[0], after[1]]
+        rows = conn.execute(
+            f"""
+            SELECT * FROM (
+                SELECT t.*, bm25({table}_fts, {weights}) AS score FROM {table}_fts
+                JOIN {table} t ON t.id = {table}_fts.rowid
+                WHERE {table}_fts MATCH ?
+            )
+            {keyset}
+            ORDER BY score, id DESC
+            LIMIT ?
+            """,
+            [*params, limit + 1],
+        ).fetchall()
+        return _page(rows, limit, lambda row: [row["score"], row["id"]])
+
+
+def rebuild_search_indexes() -> None:
+    """Rebuild the FTS tables from their base tables in one transaction.
+
+    Safe while the bot is running: WAL readers keep seeing the old index
+    until the rebuild commits.
+    """
+    with get_conn() as conn:
+        for table in migrations.SEARCH_COLUMNS:
+            conn.execute(f"INSERT INTO {table}_fts({table}_fts) VALUES ('rebuild')")
 
 
 def get_user(user_id: int) -> Optional[sqlite3.Row]:
+    cached = user_cache.get(user_id)
+    if cached is not MISSING:
+        return cached
+    return load_user(user_id)
+
+
+def load_user(user_id: int) -> Optional[sqlite3.Row]:
+    """Read the profile from the database and refresh its cache entry."""
+    generation = user_cache.generation
     with get_conn() as conn:
-        return conn.execute(
+        row = conn.execute(
             "SELECT * FROM users WHERE user_id = ?",
             (user_id,),
         ).fetchone()
+    user_cache.set(user_id, row, generation)
+    return row
 
 
 def upsert_user(user_id: int, name: str, role: str, lang: str) -> None:
@@ -105,6 +232,7 @@ def upsert_user(user_id: int, name: str, role: str, lang: str) -> None:
             """,
             (user_id, name, role, lang),
         )
+    user_cache.invalidate(user_id)
 
 
 def update_user_role(user_id: int, role: str) -> None:
@@ -113,6 +241,7 @@ def update_user_role(user_id: int, role: str) -> None:
             "UPDATE users SET role = ? WHERE user_id = ?",
             (role, user_id),
         )
+    user_cache.invalidate(user_id)
 
 
 def update_user_lang(user_id: int, lang: str) -> None:
@@ -121,6 +250,7 @@ def update_user_lang(user_id: int, lang: str) -> None:
             "UPDATE users SET lang = ? WHERE user_id = ?",
             (lang, user_id),
         )
+    user_cache.invalidate(user_id)
 
 
 def create_client(data: dict) -> int:
@@ -135,17 +265,8 @@ def create_client(data: dict) -> int:
         return cur.lastrowid
 
 
-def search_clients(query: str) -> Iterable[sqlite3.Row]:
-    like = f"%{query.lower()}%"
-    with get_conn() as conn:
-        return conn.execute(
-            """
-            SELECT * FROM clients
-            WHERE lower(name) LIKE ? OR lower(city) LIKE ?
-            ORDER BY id DESC
-            """,
-            (like, like),
-        ).fetchall()
+def search_clients(query: str, after: Optional[list] = None, limit: int = PAGE_SIZE) -> Page:
+    return _search("clients", query, after, limit)
 
 
 def get_client(client_id: int) -> Optional[sqlite3.Row]:
@@ -199,46 +320,282 @@ def add_pickup_log(client_id: int, date: str, action: str, remainder: Optional[s
         )
 
 
-def list_pickup_clients() -> Iterable[sqlite3.Row]:
+def record_pickup(
+    client_ids: Iterable[int], date: str, action: str, remainder: Optional[str], responsible: str
+) -> int:
+    """Set the remainder of ``client_ids`` and log the pickup in one transaction.
+
+    Unknown ids are skipped; returns the number of clients recorded.
+    """
+    ids = json.dumps(list(client_ids))
     with get_conn() as conn:
-        return conn.execute(
+        cursor = conn.execute(
+            "UPDATE clients SET remainder = ? WHERE id IN (SELECT value FROM json_each(?))",
+            (remainder, ids),
+        )
+        conn.execute(
             """
+            INSERT INTO pickup_logs (client_id, date, action, remainder, responsible)
+            SELECT id, ?, ?, ?, ? FROM clients WHERE id IN (SELECT value FROM json_each(?))
+            """,
+            (date, action, remainder, responsible, ids),
+        )
+        return cursor.rowcount
+
+
+def list_pickup_clients(after: Optional[list] = None, limit: int = PAGE_SIZE) -> Page:
+    keyset = "AND id < ?" if after is not None else ""
+    params = [after[0]] if after is not None else []
+    with get_conn() as conn:
+        rows = conn.execute(
+            f"""
             SELECT * FROM clients
-            WHERE remainder IS NOT NULL AND trim(remainder) != ''
+            WHERE remainder IS NOT NULL AND trim(remainder) != '' {keyset}
             ORDER BY id DESC
-            """
+            LIMIT ?
+            """,
+            [*params, limit + 1],
         ).fetchall()
+    return _page(rows, limit, lambda row: [row["id"]])
+
+
+def search_products(query: str, after: Optional[list] = None, limit: int = PAGE_SIZE) -> Page:
+    return _search("products", query, after, limit)
+
+
+def search_stands(query: str, after: Optional[list] = None, limit: int = PAGE_SIZE) -> Page:
+    return _search("stands", query, after, limit)
 
 
-def search_products(query: str) -> Iterable[sqlite3.Row]:
-    like = f"%{query.lower()}%"
+CATALOG_FIELDS = {
+    "products": ("sort", "name", "article"),
+    "stands": ("stand_name", "size", "article", "tiles_text"),
+}
+
+
+def list_catalog_items(table: str, ids: Optional[Iterable[int]] = None) -> list[sqlite3.Row]:
+    if table not in CATALOG_FIELDS:
+        raise ValueError("Invalid catalog table")
     with get_conn() as conn:
+        if ids is None:
+            return conn.execute(f"SELECT * FROM {table}").fetchall()
         return conn.execute(
-            """
-            SELECT * FROM products
-            WHERE lower(sort) LIKE ? OR lower(name) LIKE ? OR lower(article) LIKE ?
-            ORDER BY id DESC
-            """,
-            (like, like, like),
+            f"SELECT * FROM {table} WHERE id IN (SELECT value FROM json_each(?))",
+            (json.dumps(list(ids)),),
         ).fetchall()
 
 
-def search_stands(query: str) -> Iterable[sqlite3.Row]:
-    like = f"%{query.lower()}%"
+# Catalog name column per table; rows without it (or an article) are skipped on import.
+CATALOG_NAME_FIELDS = {"products": "name", "stands": "stand_name"}
+IMPORT_BATCH_SIZE = 500
+
+
+class ImportCounts(NamedTuple):
+    inserted: int
+    updated: int
+    skipped: int
+
+
+def upsert_catalog_items(table: str, items: Iterable[dict]) -> ImportCounts:
+    """Insert or update catalog items by ``article`` in one transaction.
+
+    ``items`` is consumed in batches, so it can be a streaming reader. Items
+    without an article or name, and items identical to the stored row, are
+    skipped; a later duplicate article in the input wins over an earlier one
+    and is counted once, against the row stored before the import.
+    The FTS triggers are dropped for the duration and the table's search
+    index is rebuilt once at the end.
+    """
+    if table not in CATALOG_FIELDS:
+        raise ValueError("Invalid catalog table")
+    fields = CATALOG_FIELDS[table]
+    columns = ", ".join(fields)
+    placeholders = ", ".join(f":{field}" for field in fields)
+    updates = ", ".join(f"{field} = excluded.{field}" for field in fields if field != "article")
+    upsert = f"""
+        INSERT INTO {table} ({columns}) VALUES ({placeholders})
+        ON CONFLICT (article) WHERE article != '' DO UPDATE SET {updates}
+    """
+    totals: Counter[str] = Counter()
+    conn = get_conn()
+    if conn.in_transaction:
+        conn.commit()
+    with conn:
+        conn.execute("BEGIN IMMEDIATE")
+        for suffix in migrations.FTS_TRIGGER_SUFFIXES:
+            conn.execute(f"DROP TRIGGER IF EXISTS {table}_fts_{suffix}")
+        batch: dict[str, dict] = {}
+        # article -> (row stored before the import, how it was counted)
+        outcomes: dict[str, tuple[Optional[sqlite3.Row], str]] = {}
+        for item in items:
+            row = {field: str(item.get(field) or "").strip() for field in fields}
+            if not row["article"] or not row[CATALOG_NAME_FIELDS[table]]:
+                totals["skipped"] += 1
+                continue
+            if row["article"] in batch or row["article"] in outcomes:
+                totals["skipped"] += 1
+            batch[row["article"]] = row
+            if len(batch) >= IMPORT_BATCH_SIZE:
+                _upsert_catalog_batch(conn, table, upsert, batch, totals, outcomes)
+                batch = {}
+        if batch:
+            _upsert_catalog_batch(conn, table, upsert, batch, totals, outcomes)
+        conn.execute(f"INSERT INTO {table}_fts({table}_fts) VALUES ('rebuild')")
+        for trigger in migrations.fts_triggers(table, migrations.SEARCH_COLUMNS[table]):
+            conn.execute(trigger)
+    return ImportCounts(totals["inserted"], totals["updated"], totals["skipped"])
+
+
+def _upsert_catalog_batch(
+    conn: sqlite3.Connection,
+    table: str,
+    upsert: str,
+    batch: dict[str, dict],
+    totals: Counter[str],
+    outcomes: dict[str, tuple[Optional[sqlite3.Row], str]],
+) -> None:
+    fields = CATALOG_FIELDS[table]
+    existing = {
+        row["article"]: row
+        for row in conn.execute(
+            # ``article != ''`` lets SQLite use the partial unique index.
+            f"SELECT * FROM {table} WHERE article != '' AND article IN (SELECT value FROM json_each(?))",
+            (json.dumps(list(batch)),),
+        )
+    }
+
+    def same(stored: Optional[sqlite3.Row], row: dict) -> bool:
+        return stored is not None and all((stored[field] or "") == row[field] for field in fields)
+
+    changed = []
+    for article, row in batch.items():
+        current = existing.get(article)
+        # A duplicate from an earlier batch is recounted against the original row.
+        original, earlier = outcomes.get(article, (current, None))
+        if original is None:
+            outcome = "inserted"
+        elif same(original, row):
+            outcome = "skipped"
+        else:
+            outcome = "updated"
+        if earlier is not None:
+            totals[earlier] -= 1
+        totals[outcome] += 1
+        outcomes[article] = (original, outcome)
+        if not same(current, row):
+            changed.append(row)
+    conn.executemany(upsert, changed)
+
+
+def add_photos(table: str, photos: Iterable[tuple[str, str]]) -> tuple[int, int]:
+    """Attach local photo files given as ``(article, path)``.
+
+    Paths already registered are left alone. Returns ``(added, unknown
+    articles)``; the Telegram ``file_id`` is filled in on first send.
+    """
+    if table not in CATALOG_FIELDS:
+        raise ValueError("Invalid catalog table")
+    added = unknown = 0
+    with get_conn() as conn:
+        for article, path in photos:
+            item = conn.execute(f"SELECT id FROM {table} WHERE article != '' AND article = ?", (article,)).fetchone()
+            if item is None:
+                unknown += 1
+                continue
+            cursor = conn.execute(
+                """
+                INSERT INTO photos (item_table, item_id, path, position)
+                SELECT ?, ?, ?, COALESCE(MAX(position) + 1, 0)
+                FROM photos WHERE item_table = ? AND item_id = ?
+                ON CONFLICT (path) WHERE path IS NOT NULL DO NOTHING
+                """,
+                (table, item["id"], path, table, item["id"]),
+            )
+            added += cursor.rowcount
+    return added, unknown
+
+
+def list_photos(table: str, item_ids: Iterable[int]) -> list[sqlite3.Row]:
     with get_conn() as conn:
         return conn.execute(
             """
-            SELECT * FROM stands
-            WHERE lower(stand_name) LIKE ? OR lower(size) LIKE ? OR lower(article) LIKE ? OR lower(tiles_text) LIKE ?
-            ORDER BY id DESC
+            SELECT * FROM photos
+            WHERE item_table = ? AND item_id IN (SELECT value FROM json_each(?))
+            ORDER BY item_id, position, id
             """,
-            (like, like, like, like),
+            (table, json.dumps(list(item_ids))),
         ).fetchall()
 
 
-def list_planning(table: str, start: str, end: str) -> Iterable[sqlite3.Row]:
-    if table not in {"planning_outbound", "planning_warehouse"}:
+def set_photo_file_ids(file_ids: Iterable[tuple[str, int]]) -> None:
+    """Store Telegram ``file_id``s given as ``(file_id, photo id)``."""
+    with get_conn() as conn:
+        conn.executemany("UPDATE photos SET file_id = ? WHERE id = ?", file_ids)
+
+
+def catalog_change_seq() -> int:
+    with get_conn() as conn:
+        row = conn.execute("SELECT MAX(seq) AS seq FROM catalog_changes").fetchone()
+    return row["seq"] or 0
+
+
+def catalog_changes_since(seq: int) -> tuple[dict[str, set[int]], int]:
+    """Return ``({table: changed ids}, newest seq)`` for changes after ``seq``."""
+    changes: dict[str, set[int]] = {}
+    last_seq = seq
+    with get_conn() as conn:
+        rows = conn.execute(
+            "SELECT seq, table_name, item_id FROM catalog_changes WHERE seq > ? ORDER BY seq",
+            (seq,),
+        ).fetchall()
+    for row in rows:
+        changes.setdefault(row["table_name"], set()).add(row["item_id"])
+        last_seq = row["seq"]
+    return changes, last_seq
+
+
+def prune_catalog_changes(seq: int) -> None:
+    with get_conn() as conn:
+        conn.execute("DELETE FROM catalog_changes WHERE seq <= ?", (seq,))
+
+
+def load_conversation_data(kind: str, key: int) -> Optional[str]:
+    with get_conn() as conn:
+        row = conn.execute("SELECT data FROM conversation_data WHERE kind = ? AND key = ?", (kind, key)).fetchone()
+    return row["data"] if row else None
+
+
+def save_conversation_data(rows: Iterable[tuple[str, int, str]]) -> None:
+    """Upsert ``(kind, key, json)`` rows in one transaction."""
+    with get_conn() as conn:
+        conn.executemany(
+            """
+            INSERT INTO conversation_data (kind, key, data) VALUES (?, ?, ?)
+            ON CONFLICT (kind, key) DO UPDATE SET data = excluded.data, updated_at = CURRENT_TIMESTAMP
+            """,
+            rows,
+        )
+
+
+def delete_conversation_data(kind: str, key: int) -> None:
+    with get_conn() as conn:
+        conn.execute("DELETE FROM conversation_data WHERE kind = ? AND key = ?", (kind, key))
+
+
+PLANNING_FIELDS = {
+    "planning_outbound": ("date", "client", "city_index", "plan_text"),
+    "planning_warehouse": ("date", "shift_names", "plan_text"),
+}
+
+
+def _planning_fields(table: str) -> tuple[str, ...]:
+    if table not in PLANNING_FIELDS:
         raise ValueError("Invalid planning table")
+    return PLANNING_FIELDS[table]
+
+
+def list_planning(table: str, start: str, end: str) -> Iterable[sqlite3.Row]:
+    _planning_fields(table)
     with get_conn() as conn:
         return conn.execute(
             f"""
@@ -250,7 +607,43 @@ def list_planning(table: str, start: str, end: str) -> Iterable[sqlite3.Row]:
         ).fetchall()
 
 
+def add_planning(table: str, entries: Iterable[tuple]) -> int:
+    """Insert planning entries (values in ``PLANNING_FIELDS`` order) in one transaction."""
+    fields = _planning_fields(table)
+    with get_conn() as conn:
+        cursor = conn.executemany(
+            f"INSERT INTO {table} ({', '.join(fields)}) VALUES ({', '.join('?' * len(fields))})",
+            entries,
+        )
+        return cursor.rowcount
+
+
+def update_planning(table: str, entries: Iterable[tuple]) -> int:
+    """Overwrite planning entries given as ``(id, *values)``; returns rows changed."""
+    fields = _planning_fields(table)
+    with get_conn() as conn:
+        cursor = conn.executemany(
+            f"UPDATE {table} SET {', '.join(f'{field} = ?' for field in fields)} WHERE id = ?",
+            [(*values, entry_id) for entry_id, *values in entries],
+        )
+        return cursor.rowcount
+
+
+def delete_planning(table: str, ids: Iterable[int]) -> int:
+    _planning_fields(table)
+    with get_conn() as conn:
+        cursor = conn.execute(
+            f"DELETE FROM {table} WHERE id IN (SELECT value FROM json_each(?))",
+            (json.dumps(list(ids)),),
+        )
+        return cursor.rowcount
+
+
 def add_hours(user_id: int, date: str, start: str, end: str, break_minutes: int, hours: float) -> None:
+    """Insert an hours entry and update the daily and weekly rollups with it."""
+    day = datetime.date.fromisoformat(date)
+    week_start = day - datetime.timedelta(days=day.weekday())
+    week_end = week_start + datetime.timedelta(days=6)
     with get_conn() as conn:
         conn.execute(
             """
@@ -259,17 +652,117 @@ def add_hours(user_id: int, date: str, start: str, end: str, break_minutes: int,
             """,
             (user_id, date, start, end, break_minutes, hours),
         )
+        conn.execute(
+            f"""
+            INSERT INTO hours_daily (user_id, date, hours, overtime)
+            VALUES (?, ?, ?, MAX(? - {migrations.DAILY_HOURS_LIMIT}, 0))
+            ON CONFLICT (user_id, date) DO UPDATE SET
+                hours = hours + excluded.hours,
+                overtime = MAX(hours + excluded.hours - {migrations.DAILY_HOURS_LIMIT}, 0)
+            """,
+            (user_id, date, hours, hours),
+        )
+        # At most seven daily rows per week, so recompute the week from them.
+        conn.execute(
+            f"""
+            INSERT INTO hours_weekly (user_id, week_start, hours, overtime, weekly_overtime)
+            SELECT
+                user_id,
+                ?,
+                SUM(hours),
+                SUM(overtime) + MAX(SUM(hours) - SUM(overtime) - {migrations.WEEKLY_HOURS_LIMIT}, 0),
+                MAX(SUM(hours) - SUM(overtime) - {migrations.WEEKLY_HOURS_LIMIT}, 0)
+            FROM hours_daily
+            WHERE user_id = ? AND date BETWEEN ? AND ?
+            GROUP BY user_id
+            ON CONFLICT (user_id, week_start) DO UPDATE SET
+                hours = excluded.hours,
+                overtime = excluded.overtime,
+                weekly_overtime = excluded.weekly_overtime
+            """,
+            (week_start.isoformat(), user_id, week_start.isoformat(), week_end.isoformat()),
+        )
 
 
-def sum_hours_by_user(name: str, start: str, end: str) -> float:
+class HoursTotal(NamedTuple):
+    hours: float
+    overtime: float
+
+
+def sum_hours_by_user(name: str, start: str, end: str) -> HoursTotal:
+    """Hours and overtime for ``start``..``end`` from the rollup tables.
+
+    Daily overtime counts on its day; the weekly (over 40h) part counts in the
+    period that contains the week's last day, so it is never split or counted
+    twice across consecutive periods.
+    """
     with get_conn() as conn:
-        row = conn.execute(
+        daily = conn.execute(
             """
-            SELECT SUM(hours) as total
-            FROM hours
-            JOIN users ON users.user_id = hours.user_id
-            WHERE users.name = ? AND date BETWEEN ? AND ?
+            SELECT SUM(hours_daily.hours) AS hours, SUM(hours_daily.overtime) AS overtime
+            FROM hours_daily
+            JOIN users ON users.user_id = hours_daily.user_id
+            WHERE users.name = ? AND hours_daily.date BETWEEN ? AND ?
             """,
             (name, start, end),
         ).fetchone()
-    return row["total"] or 0.0
+        weekly = conn.execute(
+            """
+            SELECT SUM(hours_weekly.weekly_overtime) AS overtime
+            FROM hours_weekly
+            JOIN users ON users.user_id = hours_weekly.user_id
+            WHERE users.name = ? AND hours_weekly.week_start BETWEEN date(?, '-6 days') AND date(?, '-6 days')
+            """,
+            (name, start, end),
+        ).fetchone()
+    return HoursTotal(daily["hours"] or 0.0, (daily["overtime"] or 0.0) + (weekly["overtime"] or 0.0))
+
+
+_TEAM_HOURS_SQL = """
+WITH daily AS (
+    SELECT user_id, SUM(hours) AS hours, COUNT(*) AS days, SUM(overtime) AS overtime
+    FROM hours_daily
+    WHERE date BETWEEN :start AND :end
+    GROUP BY user_id
+),
+weekly AS (
+    SELECT user_id, SUM(weekly_overtime) AS overtime
+    FROM hours_weekly
+    WHERE week_start BETWEEN date(:start, '-6 days') AND date(:end, '-6 days')
+    GROUP BY user_id
+)
+SELECT
+    users.user_id,
+    users.name,
+    users.role,
+    COALESCE(daily.hours, 0) AS hours,
+    COALESCE(daily.days, 0) AS days,
+    COALESCE(daily.overtime, 0) + COALESCE(weekly.overtime, 0) AS overtime
+FROM (SELECT user_id FROM daily UNION SELECT user_id FROM weekly WHERE overtime > 0) AS ids
+CROSS JOIN users ON users.user_id = ids.user_id
+LEFT JOIN daily ON daily.user_id = ids.user_id
+LEFT JOIN weekly ON weekly.user_id = ids.user_id
+ORDER BY users.name, users.user_id
+"""
+
+
+def team_hours(start: str, end: str) -> list[sqlite3.Row]:
+    """Per-employee hours, days worked and overtime for ``start``..``end``.
+
+    Overtime is attributed as in :func:`sum_hours_by_user`.
+    """
+    return list(iter_team_hours(start, end))
+
+
+def iter_team_hours(start: str, end: str) -> Iterator[sqlite3.Row]:
+    """Like :func:`team_hours`, but yields rows straight from the cursor."""
+    with get_conn() as conn:
+        yield from conn.execute(_TEAM_HOURS_SQL, {"start": start, "end": end})
+
+
+def rebuild_hours_rollups() -> None:
+    """Recompute ``hours_daily`` and ``hours_weekly`` from raw entries."""
+    conn = get_conn()
+    if conn.in_transaction:
+        conn.commit()
+    conn.executescript(f"BEGIN;\n{migrations.REBUILD_HOURS_ROLLUPS}\nCOMMIT;")
@@ -0,0 +1,17 @@
+import sys
+from pathlib import Path
+
+import pytest
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import storage  # noqa: E402
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    """A fresh, migrated database for the test."""
+    monkeypatch.setattr(storage, "DB_PATH", tmp_path / "bot.db")
+    storage.init_db()
+    yield storage.get_conn()
+    storage.close_all()
@@ -0,0 +1,51 @@
+import pytest
+
+import storage
+from catalog_import import ImportFormatError, read_items
+
+
+def product(article: str, name: str) -> dict:
+    return {"sort": "tile", "name": name, "article": article}
+
+
+@pytest.mark.parametrize("batch_size", [500, 1])
+def test_duplicate_article_counts_once(db, monkeypatch, batch_size):
+    monkeypatch.setattr(storage, "IMPORT_BATCH_SIZE", batch_size)
+    storage.upsert_catalog_items("products", [product("A1", "Marmo"), product("A2", "Pietra")])
+
+    counts = storage.upsert_catalog_items(
+        "products",
+        [
+            product("A3", "Ardesia"),
+            product("A3", "Ardesia Nera"),
+            product("A1", "Marmo"),
+            product("A1", "Marmo Bianco"),
+            product("A2", "Pietra Grigia"),
+            product("A2", "Pietra"),
+        ],
+    )
+
+    assert counts == storage.ImportCounts(inserted=1, updated=1, skipped=4)
+    names = {row["article"]: row["name"] for row in db.execute("SELECT article, name FROM products")}
+    assert names == {"A1": "Marmo Bianco", "A2": "Pietra", "A3": "Ardesia Nera"}
+
+
+def test_non_utf8_csv_is_a_format_error(tmp_path):
+    path = tmp_path / "products.csv"
+    path.write_bytes("sort;name;article\ntile;Café crème;A1\n".encode("cp1252"))
+    with pytest.raises(ImportFormatError) as info:
+        list(read_items(path, "products"))
+    assert info.value.key == "catalog_error_encoding"
+
+
+def test_truncated_xlsx_is_a_format_error(tmp_path):
+    openpyxl = pytest.importorskip("openpyxl")
+    path = tmp_path / "products.xlsx"
+    workbook = openpyxl.Workbook()
+    workbook.active.append(["sort", "name", "article"])
+    workbook.active.append(["tile", "Marmo", "A1"])
+    workbook.save(path)
+    path.write_bytes(path.read_bytes()[: path.stat().st_size // 2])
+    with pytest.raises(ImportFormatError) as info:
+        list(read_items(path, "products"))
+    assert info.value.key == "catalog_error_xlsx"
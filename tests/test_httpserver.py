@@ -0,0 +1,70 @@
+import asyncio
+
+import pytest
+
+from httpserver import MAX_BODY, HTTPServer, Response
+
+
+async def echo(request):
+    return Response(200, request.body)
+
+
+def exchange(*chunks: bytes, pause: float = 0.0) -> bytes:
+    """Send ``chunks`` to a fresh server, ``pause`` seconds apart; return all it answers."""
+
+    async def main() -> bytes:
+        server = HTTPServer("127.0.0.1", 0, idle_timeout=0.5, request_timeout=0.3)
+        server.route("POST", "/echo", echo)
+        await server.start()
+        try:
+            port = server.sockets[0].getsockname()[1]
+            reader, writer = await asyncio.open_connection("127.0.0.1", port)
+            for chunk in chunks:
+                writer.write(chunk)
+                await writer.drain()
+                await asyncio.sleep(pause)
+            answer = await asyncio.wait_for(reader.read(), 2)
+            writer.close()
+            return answer
+        finally:
+            await server.stop()
+
+    return asyncio.run(main())
+
+
+def request(length: str, body: bytes = b"", connection: str = "close") -> bytes:
+    return (
+        f"POST /echo HTTP/1.1\r\nContent-Length: {length}\r\nConnection: {connection}\r\n\r\n".encode() + body
+    )
+
+
+def test_echo():
+    assert exchange(request("5", b"hello")).startswith(b"HTTP/1.1 200 OK")
+
+
+def test_keep_alive():
+    answer = exchange(request("1", b"a", "keep-alive"), request("1", b"b"))
+    assert answer.count(b"HTTP/1.1 200 OK") == 2
+
+
+@pytest.mark.parametrize("length", ["-5", "abc", "+5", ""])
+def test_bad_content_length(length):
+    assert exchange(request(length, b"hello")).startswith(b"HTTP/1.1 400 Bad Request")
+
+
+def test_body_too_large():
+    assert exchange(request(str(MAX_BODY + 1))).startswith(b"HTTP/1.1 413 Payload Too Large")
+
+
+def test_slow_headers_time_out():
+    answer = exchange(b"POST /echo HTTP/1.1\r\n", b"Content-Length: 5\r\n", pause=0.4)
+    assert answer.startswith(b"HTTP/1.1 408 Request Timeout")
+
+
+def test_short_body_times_out():
+    answer = exchange(request("10", b"hello"), pause=0.4)
+    assert answer.startswith(b"HTTP/1.1 408 Request Timeout")
+
+
+def test_idle_connection_is_closed():
+    assert exchange(b"", pause=0.6) == b""
@@ -0,0 +1,17 @@
+from pathlib import Path
+
+import manage
+import storage
+
+
+def test_photo_suffix_is_kept_when_stem_is_an_article(db, tmp_path):
+    storage.upsert_catalog_items(
+        "products", [{"sort": "tile", "name": "Marmo", "article": article} for article in ("AB", "AB_2")]
+    )
+    for name in ("AB.jpg", "AB_2.jpg", "AB_3.jpg", "notes.txt"):
+        (tmp_path / name).write_bytes(b"")
+    articles = {row["article"] for row in storage.list_catalog_items("products")}
+
+    found = [(Path(path).name, article) for article, path in manage.photo_files([tmp_path], articles)]
+
+    assert found == [("AB.jpg", "AB"), ("AB_2.jpg", "AB_2"), ("AB_3.jpg", "AB")]
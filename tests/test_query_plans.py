@@ -0,0 +1,33 @@
+import pytest
+
+from check_query_plans import full_scans
+
+TABLES = {"clients", "pickup_logs"}
+
+
+def plan(conn, sql: str) -> list[str]:
+    return [row["detail"] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}")]
+
+
+@pytest.mark.parametrize(
+    "sql",
+    [
+        "SELECT * FROM clients WHERE city LIKE '%x%'",
+        "SELECT * FROM clients c WHERE c.city LIKE '%x%'",
+        "SELECT * FROM clients AS c WHERE c.city LIKE '%x%'",
+        "SELECT * FROM pickup_logs p JOIN clients AS c ON c.id = p.client_id WHERE c.city LIKE '%x%'",
+    ],
+)
+def test_aliased_full_scan_is_reported(db, sql):
+    assert full_scans(plan(db, sql), TABLES, sql)
+
+
+def test_lookup_is_not_reported(db):
+    sql = "SELECT * FROM clients c WHERE c.id = 1"
+    assert not full_scans(plan(db, sql), TABLES, sql)
+
+
+def test_old_plan_format():
+    sql = "SELECT * FROM clients AS c"
+    assert full_scans(["SCAN TABLE clients AS c"], TABLES, sql)
+    assert not full_scans(["SCAN TABLE recent AS r"], TABLES, "WITH recent AS (SELECT 1) SELECT * FROM recent AS r")
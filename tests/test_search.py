@@ -0,0 +1,30 @@
+import storage
+
+
+def client(name: str) -> dict:
+    return {
+        "name": name,
+        "city": "Lier 2500",
+        "missing_product": "tiles",
+        "remainder": "",
+        "date": "2026-01-01",
+        "responsible": "test",
+    }
+
+
+def test_search_matches_substring(db):
+    storage.create_client(client("Janssens BV"))
+    storage.create_client(client("Peeters"))
+    assert [row["name"] for row in storage.search_clients("ssen").rows] == ["Janssens BV"]
+
+
+def test_short_query_runs_no_statement(db):
+    storage.create_client(client("Janssens BV"))
+    statements: list[str] = []
+    db.set_trace_callback(statements.append)
+    try:
+        page = storage.search_clients("ja")
+    finally:
+        db.set_trace_callback(None)
+    assert page == storage.Page([], None)
+    assert statements == []
@@ -0,0 +1,73 @@
+import similarity
+import storage
+from datagen import catalog_rows, search_queries
+from similarity import CatalogIndex, TrigramIndex, trigrams
+
+def brute_force(rows: list[tuple[frozenset, ...]], query: str, limit: int = 5, threshold: float = 0.3) -> list[float]:
+    """Best scores over ``rows`` of precomputed field trigrams."""
+    grams = trigrams(query)
+    best = []
+    for row in rows:
+        score = 0.0
+        for text_grams in row:
+            if text_grams:
+                shared = len(grams & text_grams)
+                score = max(score, shared / (len(grams) + len(text_grams) - shared))
+        if score >= threshold:
+            best.append(score)
+    return sorted(best, reverse=True)[:limit]
+
+
+def build(rows: list[tuple[str, ...]], **kwargs) -> TrigramIndex:
+    index = TrigramIndex(**kwargs)
+    for key, row in enumerate(rows):
+        index.add(key, row)
+    return index
+
+
+def grams(rows: list[tuple[str, ...]]) -> list[tuple[frozenset, ...]]:
+    return [tuple(trigrams(text) for text in row) for row in rows]
+
+
+def test_search_without_candidate_cap_is_exact():
+    rows = catalog_rows(2000)
+    index = build(rows, max_candidates=len(rows) * 3)
+    row_grams = grams(rows)
+    for query in search_queries(rows, 100):
+        found = [round(score, 9) for score, _ in index.search(query)]
+        assert found == [round(score, 9) for score in brute_force(row_grams, query)], query
+
+
+def test_search_finds_best_match_with_default_cap():
+    # Well past MAX_CANDIDATES distinct texts, so the cap cuts the walk short.
+    rows = catalog_rows(3000)
+    index = build(rows)
+    row_grams = grams(rows)
+    for query in search_queries(rows, 50):
+        expected = brute_force(row_grams, query, limit=1)
+        found = index.search(query, limit=1)
+        assert [round(score, 9) for score, _ in found] == [round(score, 9) for score in expected], query
+
+
+def test_remove_drops_key_and_unused_texts():
+    index = TrigramIndex()
+    index.add(1, ("Marmo Bianco", "vloertegel"))
+    index.add(2, ("Pietra Grigia", "vloertegel"))
+    index.remove(1)
+    assert [key for _, key in index.search("marmo bianco")] == []
+    assert [key for _, key in index.search("vloertegel")] == [2]
+    assert len(index) == 1
+
+
+def test_sync_applies_and_prunes_catalog_changes(db, monkeypatch):
+    storage.upsert_catalog_items("products", [{"sort": "tile", "name": "Marmo Bianco", "article": "A1"}])
+    index = CatalogIndex()
+    monkeypatch.setattr(similarity, "catalog_index", index)
+    index.load()
+    storage.upsert_catalog_items("products", [{"sort": "tile", "name": "Pietra Grigia", "article": "A2"}])
+    assert db.execute("SELECT count(*) FROM catalog_changes").fetchone()[0] == 1
+
+    rows = similarity.similar_items("products", "pietra grigia")
+
+    assert [row["article"] for row in rows] == ["A2"]
+    assert db.execute("SELECT count(*) FROM catalog_changes").fetchone()[0] == 0
@@ -0,0 +1,15 @@
+from collections import deque
+
+import slowlog
+
+
+def test_slow_script_is_logged_without_plan(db, monkeypatch):
+    monkeypatch.setattr(slowlog, "threshold", 0.0)
+    monkeypatch.setattr(slowlog, "_entries", deque(maxlen=10))
+    monkeypatch.setattr(slowlog, "_plans", {})
+
+    db.executescript("BEGIN;\nSELECT 1;\nCOMMIT;")
+
+    [item] = slowlog.top()
+    assert item.statement == "BEGIN; SELECT 1; COMMIT;"
+    assert item.plan == ["(script, no plan)"]
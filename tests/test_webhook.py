@@ -0,0 +1,56 @@
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+
+import webhook
+from httpserver import Request
+
+UPDATE = json.dumps({"update_id": 1}).encode()
+
+
+def post(headers: dict[str, str], body: bytes = UPDATE) -> Request:
+    return Request("POST", webhook.WEBHOOK_PATH, "", headers, body)
+
+
+def handle(request: Request):
+    async def main():
+        app = SimpleNamespace(bot=None, update_queue=asyncio.Queue())
+        response = await webhook.update_handler(app, "s3cret")(request)
+        return response, app.update_queue.qsize()
+
+    return asyncio.run(main())
+
+
+def test_request_without_secret_header_is_forbidden():
+    response, queued = handle(post({}))
+    assert response.status == 403
+    assert queued == 0
+
+
+def test_request_with_wrong_secret_is_forbidden():
+    response, queued = handle(post({webhook.SECRET_HEADER: "guess"}))
+    assert response.status == 403
+    assert queued == 0
+
+
+def test_request_with_secret_is_queued():
+    response, queued = handle(post({webhook.SECRET_HEADER: "s3cret"}))
+    assert response.status == 200
+    assert queued == 1
+
+
+def test_secret_is_required(monkeypatch):
+    monkeypatch.setattr(webhook, "WEBHOOK_SECRET", None)
+    monkeypatch.setattr(webhook, "WEBHOOK_URL", None)
+    with pytest.raises(RuntimeError):
+        webhook.webhook_secret()
+
+
+def test_secret_is_generated_when_registering(monkeypatch):
+    monkeypatch.setattr(webhook, "WEBHOOK_SECRET", None)
+    monkeypatch.setattr(webhook, "WEBHOOK_URL", "https://example.org")
+    secret = webhook.webhook_secret()
+    assert len(secret) >= 32
+    assert secret != webhook.webhook_secret()
@@ -1,3 +1,5 @@
+from typing import Callable, Iterable, Optional
+
 LANGUAGES = ["ru", "nl", "fr", "en"]
 
 TRANSLATIONS = {
@@ -44,13 +46,15 @@ TRANSLATIONS = {
         "clients_ready_date": "Введите дату готовности в Lier (ДД.ММ.ГГГГ):",
         "clients_processed_date": "Введите дату обработки (ДД.ММ.ГГГГ):",
         "clients_processed_time": "Введите время (HH:MM):",
-        "pickup_query": "Введите имя или город клиента:",
-        "pickup_choose": "Введите ID клиента:",
+        "pickup_query": "Введите имя или город клиента или откройте список на забор:",
+        "pickup_choose": "Введите ID клиента (несколько — через пробел или запятую):",
         "pickup_all": "✅ Забрал всё",
         "pickup_left": "✍️ Осталось что-то",
         "pickup_left_prompt": "Введите новый текст остатка:",
         "pickup_date": "Введите дату (ДД.ММ.ГГГГ):",
         "pickup_list_empty": "Список на забор пуст.",
+        "pickup_saved": "Сохранено, клиентов: {count}.",
+        "pickup_partial": "Сохранено клиентов: {count} из {total}, остальные не найдены.",
         "planning_type_prompt": "Выберите раздел планинга:",
         "planning_outbound": "🚚 Выезд",
         "planning_warehouse": "🏭 Склад",
@@ -77,10 +81,44 @@ TRANSLATIONS = {
         "admin_performance_user": "Введите имя сотрудника:",
         "admin_performance_period": "Выберите период:",
         "admin_performance_date": "Введите дату (ДД.ММ.ГГГГ):",
-        "admin_performance_result": "Часы за период: {hours:.2f}",
+        "admin_performance_result": "Часы за период: {hours:.2f}\nПереработка: {overtime:.2f}",
+        "admin_team_report": "📋 Отчёт по команде",
+        "team_report_result": "Отчёт по команде за {start} — {end}:\nСотрудник | Часы | Дни | Переработка\n{rows}",
+        "team_report_empty": "За этот период часов нет.",
+        "admin_planning": "🗓 Редактор планинга",
+        "planning_edit_action": "Что сделать с планингом?",
+        "planning_add": "➕ Добавить",
+        "planning_edit": "✏️ Изменить",
+        "planning_delete": "🗑 Удалить",
+        "planning_format_outbound": "ДД.ММ.ГГГГ; клиент; город+индекс; план",
+        "planning_format_warehouse": "ДД.ММ.ГГГГ; имена смены; план",
+        "planning_add_prompt": "Отправьте записи одним сообщением, по одной на строку:\n{format}",
+        "planning_edit_prompt": "Отправьте исправленные записи с ID, по одной на строку:\nID; {format}",
+        "planning_delete_prompt": "Введите ID записей через пробел или запятую:",
+        "planning_invalid_lines": "Ошибки в строках: {lines}. Ничего не сохранено. Формат строки:\n{format}",
+        "planning_added": "Добавлено записей: {count}.",
+        "planning_updated": "Изменено записей: {count}.",
+        "planning_deleted": "Удалено записей: {count}.",
+        "admin_catalog_import": "📥 Импорт каталога",
+        "admin_slow_queries": "🐢 Медленные запросы",
+        "slow_queries_header": "Самые медленные запросы за {minutes} мин (порог {threshold} мс):",
+        "slow_queries_empty": "За последние {minutes} мин медленных запросов не было (порог {threshold} мс).",
+        "catalog_import_table": "Что импортируем?",
+        "catalog_import_file": "Пришлите файл CSV или XLSX. Первая строка — заголовки: {columns}. Записи сопоставляются по артикулу.",
+        "catalog_import_done": "Импорт завершён: добавлено {inserted}, обновлено {updated}, пропущено {skipped}.",
+        "catalog_import_error": "Не удалось импортировать файл: {error}",
+        "catalog_error_encoding": "файл должен быть CSV в кодировке UTF-8.",
+        "catalog_error_csv": "повреждённый CSV ({error}).",
+        "catalog_error_xlsx": "это не корректный файл .xlsx.",
+        "catalog_error_openpyxl": "для XLSX на сервере нужен пакет openpyxl, пришлите CSV.",
+        "catalog_error_type": "неподдерживаемый тип файла {kind}.",
+        "catalog_error_columns": "нет столбцов {columns}.",
         "products_search": "Введите запрос для поиска продукции:",
         "stands_search": "Введите запрос для поиска стендов:",
         "search_results": "Результаты:\n{results}",
+        "similar_results": "Точных совпадений нет. Похожие варианты:\n{results}",
+        "page_expired": "Список устарел, повторите поиск.",
+        "search_too_short": "Для поиска введите не меньше {count} символов.",
     },
     "nl": {
         "greeting": "Hoi! Hello!",
@@ -125,13 +163,15 @@ TRANSLATIONS = {
         "clients_ready_date": "Voer datum in voor Lier (DD.MM.JJJJ):",
         "clients_processed_date": "Voer verwerkingsdatum in (DD.MM.JJJJ):",
         "clients_processed_time": "Voer tijd in (HH:MM):",
-        "pickup_query": "Voer klantnaam of stad in:",
-        "pickup_choose": "Voer klant-ID in:",
+        "pickup_query": "Voer klantnaam of stad in, of open de ophaallijst:",
+        "pickup_choose": "Voer klant-ID in (meerdere gescheiden door spaties of komma's):",
         "pickup_all": "✅ Alles opgehaald",
         "pickup_left": "✍️ Iets over",
         "pickup_left_prompt": "Voer nieuwe restanttekst in:",
         "pickup_date": "Voer datum in (DD.MM.JJJJ):",
         "pickup_list_empty": "Ophaallijst is leeg.",
+        "pickup_saved": "Opgeslagen, klanten: {count}.",
+        "pickup_partial": "Opgeslagen voor {count} van {total} klanten, de rest is niet gevonden.",
         "planning_type_prompt": "Kies planningstype:",
         "planning_outbound": "🚚 Uitrij",
         "planning_warehouse": "🏭 Magazijn",
@@ -158,10 +198,44 @@ TRANSLATIONS = {
         "admin_performance_user": "Voer naam van medewerker in:",
         "admin_performance_period": "Kies periode:",
         "admin_performance_date": "Voer datum in (DD.MM.JJJJ):",
-        "admin_performance_result": "Uren voor periode: {hours:.2f}",
+        "admin_performance_result": "Uren voor periode: {hours:.2f}\nOveruren: {overtime:.2f}",
+        "admin_team_report": "📋 Teamrapport",
+        "team_report_result": "Teamrapport {start} — {end}:\nMedewerker | Uren | Dagen | Overuren\n{rows}",
+        "team_report_empty": "Geen uren in deze periode.",
+        "admin_planning": "🗓 Planning bewerken",
+        "planning_edit_action": "Wat wilt u met de planning doen?",
+        "planning_add": "➕ Toevoegen",
+        "planning_edit": "✏️ Wijzigen",
+        "planning_delete": "🗑 Verwijderen",
+        "planning_format_outbound": "DD.MM.JJJJ; klant; stad+postcode; plan",
+        "planning_format_warehouse": "DD.MM.JJJJ; namen ploeg; plan",
+        "planning_add_prompt": "Stuur de regels in één bericht, één per regel:\n{format}",
+        "planning_edit_prompt": "Stuur de gewijzigde regels met ID, één per regel:\nID; {format}",
+        "planning_delete_prompt": "Voer de ID's in, gescheiden door spaties of komma's:",
+        "planning_invalid_lines": "Fouten in regels: {lines}. Niets opgeslagen. Formaat:\n{format}",
+        "planning_added": "Regels toegevoegd: {count}.",
+        "planning_updated": "Regels gewijzigd: {count}.",
+        "planning_deleted": "Regels verwijderd: {count}.",
+        "admin_catalog_import": "📥 Catalogus importeren",
+        "admin_slow_queries": "🐢 Trage queries",
+        "slow_queries_header": "Traagste queries van de laatste {minutes} min (drempel {threshold} ms):",
+        "slow_queries_empty": "Geen trage queries in de laatste {minutes} min (drempel {threshold} ms).",
+        "catalog_import_table": "Wat wilt u importeren?",
+        "catalog_import_file": "Stuur een CSV- of XLSX-bestand. Eerste rij: kolomnamen {columns}. Records worden op artikelnummer gekoppeld.",
+        "catalog_import_done": "Import klaar: {inserted} toegevoegd, {updated} bijgewerkt, {skipped} overgeslagen.",
+        "catalog_import_error": "Bestand kon niet worden geïmporteerd: {error}",
+        "catalog_error_encoding": "het bestand moet een UTF-8 CSV zijn.",
+        "catalog_error_csv": "ongeldige CSV ({error}).",
+        "catalog_error_xlsx": "geen geldig .xlsx-bestand.",
+        "catalog_error_openpyxl": "voor XLSX is het pakket openpyxl nodig op de server, stuur een CSV.",
+        "catalog_error_type": "niet-ondersteund bestandstype {kind}.",
+        "catalog_error_columns": "ontbrekende kolommen {columns}.",
         "products_search": "Voer zoekopdracht voor producten in:",
         "stands_search": "Voer zoekopdracht voor stands in:",
         "search_results": "Resultaten:\n{results}",
+        "similar_results": "Geen exacte treffers. Vergelijkbare resultaten:\n{results}",
+        "page_expired": "Deze lijst is verlopen, zoek opnieuw.",
+        "search_too_short": "Voer minstens {count} tekens in om te zoeken.",
     },
     "fr": {
         "greeting": "Hoi! Hello!",
@@ -206,13 +280,15 @@ TRANSLATIONS = {
         "clients_ready_date": "Entrez la date Lier (JJ.MM.AAAA) :",
         "clients_processed_date": "Entrez la date de traitement (JJ.MM.AAAA) :",
         "clients_processed_time": "Entrez l’heure (HH:MM) :",
-        "pickup_query": "Entrez le nom ou la ville :",
-        "pickup_choose": "Entrez l’ID du client :",
+        "pickup_query": "Entrez le nom ou la ville, ou ouvrez la liste d’enlèvement :",
+        "pickup_choose": "Entrez l’ID du client (plusieurs séparés par des espaces ou des virgules) :",
         "pickup_all": "✅ Tout enlevé",
         "pickup_left": "✍️ Reste quelque chose",
         "pickup_left_prompt": "Entrez le nouveau reste :",
         "pickup_date": "Entrez la date (JJ.MM.AAAA) :",
         "pickup_list_empty": "Liste d’enlèvement vide.",
+        "pickup_saved": "Enregistré, clients : {count}.",
+        "pickup_partial": "Enregistré pour {count} clients sur {total}, les autres sont introuvables.",
         "planning_type_prompt": "Choisissez le planning :",
         "planning_outbound": "🚚 Sortie",
         "planning_warehouse": "🏭 Entrepôt",
@@ -239,10 +315,44 @@ TRANSLATIONS = {
         "admin_performance_user": "Entrez le nom de l’employé :",
         "admin_performance_period": "Choisissez une période :",
         "admin_performance_date": "Entrez la date (JJ.MM.AAAA) :",
-        "admin_performance_result": "Heures pour la période : {hours:.2f}",
+        "admin_performance_result": "Heures pour la période : {hours:.2f}\nHeures supplémentaires : {overtime:.2f}",
+        "admin_team_report": "📋 Rapport d'équipe",
+        "team_report_result": "Rapport d'équipe {start} — {end} :\nEmployé | Heures | Jours | Heures supp.\n{rows}",
+        "team_report_empty": "Aucune heure pour cette période.",
+        "admin_planning": "🗓 Modifier le planning",
+        "planning_edit_action": "Que faire avec le planning ?",
+        "planning_add": "➕ Ajouter",
+        "planning_edit": "✏️ Modifier",
+        "planning_delete": "🗑 Supprimer",
+        "planning_format_outbound": "JJ.MM.AAAA; client; ville+code postal; plan",
+        "planning_format_warehouse": "JJ.MM.AAAA; noms de l'équipe; plan",
+        "planning_add_prompt": "Envoyez les entrées en un seul message, une par ligne :\n{format}",
+        "planning_edit_prompt": "Envoyez les entrées corrigées avec leur ID, une par ligne :\nID; {format}",
+        "planning_delete_prompt": "Entrez les ID séparés par des espaces ou des virgules :",
+        "planning_invalid_lines": "Erreurs aux lignes : {lines}. Rien n'a été enregistré. Format :\n{format}",
+        "planning_added": "Entrées ajoutées : {count}.",
+        "planning_updated": "Entrées modifiées : {count}.",
+        "planning_deleted": "Entrées supprimées : {count}.",
+        "admin_catalog_import": "📥 Importer le catalogue",
+        "admin_slow_queries": "🐢 Requêtes lentes",
+        "slow_queries_header": "Requêtes les plus lentes des {minutes} dernières min (seuil {threshold} ms) :",
+        "slow_queries_empty": "Aucune requête lente ces {minutes} dernières min (seuil {threshold} ms).",
+        "catalog_import_table": "Que voulez-vous importer ?",
+        "catalog_import_file": "Envoyez un fichier CSV ou XLSX. Première ligne : les colonnes {columns}. Les lignes sont associées par article.",
+        "catalog_import_done": "Import terminé : {inserted} ajoutés, {updated} mis à jour, {skipped} ignorés.",
+        "catalog_import_error": "Impossible d'importer le fichier : {error}",
+        "catalog_error_encoding": "le fichier doit être un CSV en UTF-8.",
+        "catalog_error_csv": "CSV invalide ({error}).",
+        "catalog_error_xlsx": "fichier .xlsx invalide.",
+        "catalog_error_openpyxl": "l'import XLSX nécessite le paquet openpyxl sur le serveur, envoyez un CSV.",
+        "catalog_error_type": "type de fichier non pris en charge {kind}.",
+        "catalog_error_columns": "colonnes manquantes {columns}.",
         "products_search": "Entrez une recherche de produits :",
         "stands_search": "Entrez une recherche de stands :",
         "search_results": "Résultats :\n{results}",
+        "similar_results": "Aucun résultat exact. Résultats similaires :\n{results}",
+        "page_expired": "Cette liste a expiré, relancez la recherche.",
+        "search_too_short": "Saisissez au moins {count} caractères pour la recherche.",
     },
     "en": {
         "greeting": "Hoi! Hello!",
@@ -287,13 +397,15 @@ TRANSLATIONS = {
         "clients_ready_date": "Enter Lier ready date (DD.MM.YYYY):",
         "clients_processed_date": "Enter processed date (DD.MM.YYYY):",
         "clients_processed_time": "Enter time (HH:MM):",
-        "pickup_query": "Enter client name or city:",
-        "pickup_choose": "Enter client ID:",
+        "pickup_query": "Enter client name or city, or open the pickup list:",
+        "pickup_choose": "Enter client ID (several separated by spaces or commas):",
         "pickup_all": "✅ Picked up all",
         "pickup_left": "✍️ Something left",
         "pickup_left_prompt": "Enter new remainder text:",
         "pickup_date": "Enter date (DD.MM.YYYY):",
         "pickup_list_empty": "Pickup list is empty.",
+        "pickup_saved": "Saved, clients: {count}.",
+        "pickup_partial": "Saved for {count} of {total} clients; the others were not found.",
         "planning_type_prompt": "Choose planning section:",
         "planning_outbound": "🚚 Outbound",
         "planning_warehouse": "🏭 Warehouse",
@@ -320,10 +432,44 @@ TRANSLATIONS = {
         "admin_performance_user": "Enter employee name:",
         "admin_performance_period": "Choose period:",
         "admin_performance_date": "Enter date (DD.MM.YYYY):",
-        "admin_performance_result": "Hours for period: {hours:.2f}",
+        "admin_performance_result": "Hours for period: {hours:.2f}\nOvertime: {overtime:.2f}",
+        "admin_team_report": "📋 Team report",
+        "team_report_result": "Team report {start} — {end}:\nEmployee | Hours | Days | Overtime\n{rows}",
+        "team_report_empty": "No hours in this period.",
+        "admin_planning": "🗓 Edit planning",
+        "planning_edit_action": "What do you want to do with the planning?",
+        "planning_add": "➕ Add",
+        "planning_edit": "✏️ Edit",
+        "planning_delete": "🗑 Delete",
+        "planning_format_outbound": "DD.MM.YYYY; client; city+postcode; plan",
+        "planning_format_warehouse": "DD.MM.YYYY; shift names; plan",
+        "planning_add_prompt": "Send the entries in one message, one per line:\n{format}",
+        "planning_edit_prompt": "Send the corrected entries with their ID, one per line:\nID; {format}",
+        "planning_delete_prompt": "Enter the IDs separated by spaces or commas:",
+        "planning_invalid_lines": "Errors on lines: {lines}. Nothing was saved. Line format:\n{format}",
+        "planning_added": "Entries added: {count}.",
+        "planning_updated": "Entries updated: {count}.",
+        "planning_deleted": "Entries deleted: {count}.",
+        "admin_catalog_import": "📥 Import catalog",
+        "admin_slow_queries": "🐢 Slow queries",
+        "slow_queries_header": "Slowest queries in the last {minutes} min (threshold {threshold} ms):",
+        "slow_queries_empty": "No slow queries in the last {minutes} min (threshold {threshold} ms).",
+        "catalog_import_table": "What do you want to import?",
+        "catalog_import_file": "Send a CSV or XLSX file. First row: the columns {columns}. Rows are matched by article.",
+        "catalog_import_done": "Import finished: {inserted} added, {updated} updated, {skipped} skipped.",
+        "catalog_import_error": "Could not import the file: {error}",
+        "catalog_error_encoding": "the file must be a UTF-8 CSV.",
+        "catalog_error_csv": "malformed CSV ({error}).",
+        "catalog_error_xlsx": "not a valid .xlsx file.",
+        "catalog_error_openpyxl": "XLSX import needs the openpyxl package on the server; send a CSV instead.",
+        "catalog_error_type": "unsupported file type {kind}.",
+        "catalog_error_columns": "missing columns {columns}.",
         "products_search": "Enter product search query:",
         "stands_search": "Enter stand search query:",
         "search_results": "Results:\n{results}",
+        "similar_results": "No exact matches. Similar items:\n{results}",
+        "page_expired": "This list has expired, please search again.",
+        "search_too_short": "Enter at least {count} characters to search.",
     },
 }
 
@@ -331,3 +477,42 @@ TRANSLATIONS = {
 def t(lang: str, key: str) -> str:
     lang = lang if lang in TRANSLATIONS else "ru"
     return TRANSLATIONS[lang].get(key, TRANSLATIONS["ru"].get(key, key))
+
+
+_reload_callbacks: list[Callable[[], None]] = []
+
+
+def on_reload(callback: Callable[[], None]) -> Callable[[], None]:
+    """Register ``callback`` to run after :func:`reload_translations`."""
+    _reload_callbacks.append(callback)
+    return callback
+
+
+def reload_translations(translations: dict[str, dict[str, str]]) -> None:
+    TRANSLATIONS.clear()
+    TRANSLATIONS.update(translations)
+    for callback in _reload_callbacks:
+        callback()
+
+
+class ReverseIndex:
+    """Maps translated button text back to its key.
+
+    Built once from the current ``TRANSLATIONS``; build a new one after
+    :func:`reload_translations`. ``lookup`` tries the user's language first
+    and then every language, so a keyboard sent before a language switch
+    keeps working.
+    """
+
+    def __init__(self, keys: Iterable[str]) -> None:
+        self._by_lang: dict[str, dict[str, str]] = {lang: {} for lang in LANGUAGES}
+        self._any_lang: dict[str, str] = {}
+        for lang in LANGUAGES:
+            for key in keys:
+                text = t(lang, key)
+                self._by_lang[lang].setdefault(text, key)
+                self._any_lang.setdefault(text, key)
+
+    def lookup(self, lang: str, text: str) -> Optional[str]:
+        key = self._by_lang.get(lang, {}).get(text)
+        return key if key is not None else self._any_lang.get(text)
@@ -0,0 +1,116 @@
+"""Webhook deployment mode.
+
+Telegram POSTs each update as JSON to ``WEBHOOK_PATH``; the handler checks
+the secret token header, decodes the update and puts it on the
+application's update queue, so handlers run exactly as under polling.
+
+The secret is mandatory: without it anyone reaching the port could post
+updates as any user. When ``WEBHOOK_URL`` is set and ``WEBHOOK_SECRET`` is
+not, a random secret is generated and registered with Telegram on start;
+otherwise the bot refuses to start.
+
+Recorded updates can be replayed locally without Telegram::
+
+    curl -X POST -H 'X-Telegram-Bot-Api-Secret-Token: s3cret' \\
+         -d @update.json http://127.0.0.1:8080/telegram
+"""
+
+import asyncio
+import hmac
+import json
+import logging
+import os
+import secrets
+import signal
+
+from telegram import Update
+from telegram.ext import Application
+
+from httpserver import HTTPServer, Request, Response, RouteHandler
+
+logger = logging.getLogger(__name__)
+
+# TLS ends at the reverse proxy, which reaches the bot on localhost.
+WEBHOOK_HOST = os.getenv("WEBHOOK_HOST", "127.0.0.1")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8080"))
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/telegram")
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET") or None
+# Public HTTPS base URL; when set, the webhook is registered with Telegram on start.
+WEBHOOK_URL = os.getenv("WEBHOOK_URL") or None
+
+SECRET_HEADER = "x-telegram-bot-api-secret-token"
+
+
+def webhook_secret() -> str:
+    """``WEBHOOK_SECRET``, or a fresh one when the bot registers the webhook itself."""
+    if WEBHOOK_SECRET:
+        return WEBHOOK_SECRET
+    if WEBHOOK_URL:
+        logger.info("WEBHOOK_SECRET is not set; registering the webhook with a generated secret")
+        return secrets.token_urlsafe(32)
+    raise RuntimeError("WEBHOOK_SECRET is required in webhook mode unless WEBHOOK_URL is set")
+
+
+def update_handler(app: Application, secret: str) -> RouteHandler:
+    expected = secret.encode()
+
+    async def handle(request: Request) -> Response:
+        if not hmac.compare_digest(request.headers.get(SECRET_HEADER, "").encode(), expected):
+            return Response(403)
+        try:
+            data = json.loads(request.body)
+            if not isinstance(data, dict):
+                raise ValueError("update must be a JSON object")
+            update = Update.de_json(data, app.bot)
+        except (ValueError, TypeError, KeyError):
+            return Response(400, b"invalid update")
+        await app.update_queue.put(update)
+        return Response(200)
+
+    return handle
+
+
+def build_server(app: Application, secret: str, host: str = WEBHOOK_HOST, port: int = WEBHOOK_PORT) -> HTTPServer:
+    server = HTTPServer(host, port)
+    server.route("POST", WEBHOOK_PATH, update_handler(app, secret))
+    return server
+
+
+async def serve(app: Application, server: HTTPServer, stop: asyncio.Event, secret: str) -> None:
+    """Run ``app`` behind ``server`` until ``stop`` is set, then shut down.
+
+    Mirrors the start/stop sequence of ``Application.run_polling``.
+    """
+    await app.initialize()
+    try:
+        if app.post_init:
+            await app.post_init(app)
+        await server.start()
+        await app.start()
+        if WEBHOOK_URL:
+            await app.bot.set_webhook(
+                WEBHOOK_URL.rstrip("/") + WEBHOOK_PATH,
+                secret_token=secret,
+                allowed_updates=Update.ALL_TYPES,
+            )
+        await stop.wait()
+    finally:
+        await server.stop()
+        if app.running:
+            await app.stop()
+        if app.post_stop:
+            await app.post_stop(app)
+        await app.shutdown()
+        if app.post_shutdown:
+            await app.post_shutdown(app)
+
+
+def run_webhook(app: Application, secret: str) -> None:
+    async def main() -> None:
+        stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, stop.set)
+        await serve(app, build_server(app, secret), stop, secret)
+
+    asyncio.run(main())